@@ -10,13 +10,23 @@ from config import settings
 from db import init_db
 from error.exceptions import UserFriendlyError
 
+from .dependencies.db import LAST_WRITE_HEADER
+from .middlewares.compression import CompressionMiddleware
+from .middlewares.metrics import MetricsMiddleware
+from .middlewares.profiling import ProfilingMiddleware
+from .middlewares.query_timing import QueryTimingMiddleware
+from .middlewares.read_your_writes import ReadYourWritesMiddleware
 from .routes import error
+from .routes.admin import admin
+from .routes.metrics import metrics
 from .routes.oauth import oath
 from .routes.permission import permission
 from .routes.project import project
+from .routes.sync import sync
 from .routes.tag import tag
 from .routes.todo_category import todo_category
 from .routes.todo_item import todo_item
+from .routes.todo_item.todo_item import NEXT_CURSOR_HEADER
 from .routes.todo_item_comment import todo_item_comment
 from .routes.user import user
 
@@ -48,11 +58,43 @@ def create_app():
     app.include_router(todo_item_comment.router)
     app.include_router(error.router)
     app.include_router(tag.router)
+    app.include_router(sync.router)
+    app.include_router(admin.router)
+
+    if settings.METRICS_ENABLED:
+        app.include_router(metrics.router)
 
     app.openapi_version = (
         "3.0.0"  # TODO: bump to 3.1.0 when openapi-tools code generator supports it
     )
 
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+            media_types=settings.COMPRESSION_MEDIA_TYPES,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+        )
+
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
+
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # added after the metrics so it runs first, the metrics count the queries that it tracks
+    if settings.QUERY_TIMING_ENABLED:
+        app.add_middleware(
+            QueryTimingMiddleware,
+            slowest_count=settings.QUERY_TIMING_SLOWEST_COUNT,
+        )
+
+    # it only tracks the writes when there is a read replica
+    app.add_middleware(
+        ReadYourWritesMiddleware, window_seconds=settings.READ_YOUR_WRITES_SECONDS
+    )
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.ALLOWED_ORIGINS,
@@ -60,6 +102,7 @@ def create_app():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag", LAST_WRITE_HEADER],
     )
 
     init_db()
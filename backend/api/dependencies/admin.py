@@ -0,0 +1,42 @@
+import hmac
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from config import settings
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def check_bearer_token(
+    credentials: HTTPAuthorizationCredentials | None, token: str | None
+):
+    """rejects the request unless it sent the token, every request is rejected when the token is
+    None
+    """
+
+    if (
+        token is None
+        or credentials is None
+        or not hmac.compare_digest(credentials.credentials.encode(), token.encode())
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def check_admin_token(
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(_bearer)],
+):
+    check_bearer_token(credentials, settings.ADMIN_TOKEN)
+
+
+def check_metrics_token(
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(_bearer)],
+):
+    # the metrics are open unless a token is set
+    if settings.METRICS_TOKEN is not None:
+        check_bearer_token(credentials, settings.METRICS_TOKEN)
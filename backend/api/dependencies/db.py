@@ -1,13 +1,171 @@
-from fastapi import logger
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Annotated, Concatenate
 
-from db import SessionLocal
+from fastapi import Depends, Request, logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
+from config import settings
+from db import AsyncSessionLocal, ReadAsyncSessionLocal, ReadSessionLocal, SessionLocal
 
-def get_db():
-    db = SessionLocal()
+_ASYNC_SESSION_INFO_KEY = "async_session"
+# the username of the request's user, it's set by `get_current_user`
+USERNAME_INFO_KEY = "username"
+
+# the time (unix timestamp) of a client's last write, the responses of the requests that wrote
+# something send it as a cookie and a header and the client sends either of them back, so the
+# marker reaches every worker instead of staying in the process that handled the write
+LAST_WRITE_COOKIE = "last_write_at"
+LAST_WRITE_HEADER = "X-Last-Write-At"
+
+
+class RequestWrites:
+    """the last commit of the user's session in a request (see `track_writes`)"""
+
+    def __init__(self):
+        self.last_write_at: float | None = None
+
+
+_request_writes: ContextVar[RequestWrites | None] = ContextVar(
+    "request_writes", default=None
+)
+
+
+def get_sync_db():
+    yield from open_sync_db(SessionLocal)
+
+
+async def get_async_db():
+    async for db in open_async_db(AsyncSessionLocal):
+        yield db
+
+
+# every route depends on `get_db`, so overriding it replaces the database of the whole api
+get_db = get_async_db if settings.SQLALCHEMY_ASYNC else get_sync_db
+
+
+def has_read_replica():
+    return (
+        ReadAsyncSessionLocal if settings.SQLALCHEMY_ASYNC else ReadSessionLocal
+    ) is not None
+
+
+@contextmanager
+def track_writes() -> Iterator[RequestWrites]:
+    """records the commits of the user's session inside it, including the ones of the sync routes
+    that run in the threadpool (they get a copy of the context)
+    """
+
+    writes = RequestWrites()
+    token = _request_writes.set(writes)
+    try:
+        yield writes
+    finally:
+        _request_writes.reset(token)
+
+
+def get_sync_read_db(request: Request, db: Annotated[Session, Depends(get_db)]):
+    if ReadSessionLocal is None or _has_written_recently(request):
+        yield db
+        return
+
+    yield from open_sync_db(ReadSessionLocal)
+
+
+async def get_async_read_db(request: Request, db: Annotated[Session, Depends(get_db)]):
+    if ReadAsyncSessionLocal is None or _has_written_recently(request):
+        yield db
+        return
+
+    async for read_db in open_async_db(ReadAsyncSessionLocal):
+        yield read_db
+
+
+# the read only routes depend on `get_read_db`, it's the read replica if one is configured and the
+# user hasn't written anything in the last READ_YOUR_WRITES_SECONDS, otherwise it's `get_db`
+get_read_db = get_async_read_db if settings.SQLALCHEMY_ASYNC else get_sync_read_db
+
+
+async def run_db[
+    **P, TResult
+](
+    db: Session,
+    fn: Callable[Concatenate[Session, P], TResult],
+    # the arguments of `fn` may be named `db` or `fn` as well
+    /,
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> TResult:
+    """runs a sync function that uses the session without blocking the event loop
+
+    the function runs in the async session's greenlet if the session belongs to an async engine,
+    otherwise it runs in the threadpool
+    """
+
+    async_db: AsyncSession | None = db.info.get(_ASYNC_SESSION_INFO_KEY)
+
+    if async_db is None:
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+
+    return await async_db.run_sync(fn, *args, **kwargs)
+
+
+def open_sync_db(session_local: sessionmaker[Session]):
+    """yields a session of the given sessionmaker and closes it afterwards"""
+
+    db = session_local()
     try:
         yield db
     except Exception as ex:
         logger.logger.error(ex)
     finally:
         db.close()
+
+
+async def open_async_db(session_local: async_sessionmaker[AsyncSession] | None):
+    """yields the sync session of an async session of the given sessionmaker
+
+    the routes and cruds work with the sync session of the async session, their code runs in the
+    async session's greenlet (see `run_db` and `DbRoute`) and only their queries are awaited
+    """
+
+    if session_local is None:
+        raise RuntimeError("SQLALCHEMY_ASYNC is enabled but no async engine is created")
+
+    async_db = session_local()
+    db = async_db.sync_session
+    db.info[_ASYNC_SESSION_INFO_KEY] = async_db
+    try:
+        yield db
+    except Exception as ex:
+        logger.logger.error(ex)
+    finally:
+        await async_db.close()
+
+
+def _has_written_recently(request: Request):
+    # a forged value can only choose the primary
+    last_write_at = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(
+        LAST_WRITE_COOKIE
+    )
+
+    try:
+        return (
+            time.time() - float(last_write_at or "") < settings.READ_YOUR_WRITES_SECONDS
+        )
+    except ValueError:
+        return False
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_write(session: Session):
+    writes = _request_writes.get()
+    if writes is None or session.info.get(USERNAME_INFO_KEY) is None:
+        return
+
+    writes.last_write_at = time.time()
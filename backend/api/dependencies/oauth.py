@@ -5,10 +5,12 @@ from fastapi.security import OAuth2PasswordBearer
 from joserfc import errors, jwt
 from sqlalchemy.orm import Session
 
-from api.dependencies.db import get_db
+from api.dependencies.db import USERNAME_INFO_KEY, get_db, run_db
 from config import settings
 from db.schemas.oath_token import TokenData
+from db.schemas.user import UserPrincipal
 from db.utils.user_crud import get_user_by_username
+from db.utils.user_principal_cache import cache_principal, get_cached_principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/oauth/token")
 
@@ -16,7 +18,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/oauth/token")
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[Session, Depends(get_db)],
-):
+) -> UserPrincipal:
+    principal = get_cached_principal(token)
+    if principal is not None:
+        db.info[USERNAME_INFO_KEY] = principal.username
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -33,9 +40,13 @@ async def get_current_user(
     except errors.JoseError:
         raise credentials_exception
 
-    user = get_user_by_username(db, username=token_data.username)
+    user = await run_db(db, get_user_by_username, token_data.username)
 
     if user is None:
         raise credentials_exception
 
-    return user
+    principal = UserPrincipal.model_validate(user)
+    cache_principal(token, payload.claims, principal)
+    db.info[USERNAME_INFO_KEY] = principal.username
+
+    return principal
@@ -0,0 +1,13 @@
+from typing import Annotated
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from api.dependencies.db import get_db
+from db.utils.shared.permission_context import PermissionContext
+
+
+def get_permission_context(db: Annotated[Session, Depends(get_db)]):
+    """binds a permission cache to the request's session, so repeated permission checks of
+    the same projects in a request are answered from memory"""
+    return PermissionContext.bind(db)
@@ -0,0 +1,56 @@
+import hashlib
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+
+from api.dependencies.db import get_read_db, run_db
+from api.dependencies.oauth import get_current_user
+from db.schemas.user import UserPrincipal
+from db.utils.project_versions import get_project_version
+
+
+async def check_project_etag(
+    project_id: int,
+    request: Request,
+    response: Response,
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_read_db)],
+):
+    """answers with 304 if the client's copy of the project (`If-None-Match`) is still up to date,
+    otherwise it sets the `ETag` of the response and the route runs as usual
+
+    the version of the project is bumped by every crud that changes it (see
+    db.utils.project_versions), so checking it is a single lookup instead of building the response
+    """
+
+    version = await run_db(db, get_project_version, project_id, current_user.id)
+
+    if version is None:
+        # the route raises the appropriate error
+        return
+
+    # the same version looks different to different users and routes
+    variant = hashlib.blake2b(
+        f"{current_user.id}:{request.url.path}?{request.url.query}".encode(),
+        digest_size=8,
+    ).hexdigest()
+    etag = f'W/"{project_id}.{version}.{variant}"'
+
+    if _matches(request.headers.get("If-None-Match"), etag):
+        raise HTTPException(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+
+    response.headers["ETag"] = etag
+
+
+def _matches(if_none_match: str | None, etag: str):
+    if if_none_match is None:
+        return False
+
+    # If-None-Match uses the weak comparison
+    candidates = {
+        candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")
+    }
+    return "*" in candidates or etag.removeprefix("W/") in candidates
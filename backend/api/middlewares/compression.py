@@ -0,0 +1,199 @@
+import threading
+import zlib
+from collections.abc import Sequence
+from typing import Protocol, TypedDict
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is used without it
+    zstandard = None
+
+
+class CompressionStats(TypedDict):
+    # the number of responses that were compressed
+    responses: int
+    uncompressed_bytes: int
+    compressed_bytes: int
+
+
+class _Compressor(Protocol):
+    def compress(self, data: bytes, /) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+_stats_lock = threading.Lock()
+_stats: CompressionStats = {
+    "responses": 0,
+    "uncompressed_bytes": 0,
+    "compressed_bytes": 0,
+}
+
+
+class CompressionMiddleware:
+    """compresses the responses of the allowed media types that are at least `minimum_size` bytes
+
+    zstd is used when the zstandard package is installed and the client accepts it, otherwise gzip.
+    streamed responses are compressed chunk by chunk as they're sent, so they aren't buffered
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int,
+        media_types: Sequence[str],
+        gzip_level: int,
+        zstd_level: int,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.media_types = media_types
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = _select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressionResponder(self, encoding, send).run(scope, receive)
+
+    def create_compressor(self, encoding: str) -> _Compressor:
+        if encoding == "zstd" and zstandard is not None:
+            return zstandard.ZstdCompressor(level=self.zstd_level).compressobj()
+
+        # wbits of 16 + MAX_WBITS writes the gzip header and trailer
+        return zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def is_compressible(self, headers: Headers):
+        if "content-encoding" in headers:
+            return False
+
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return any(
+            media_type == allowed
+            or (allowed.endswith("/*") and media_type.startswith(allowed[:-1]))
+            for allowed in self.media_types
+        )
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Message | None = None
+        self.compressor: _Compressor | None = None
+        # the response is passed through once it's known that it won't be compressed
+        self.passthrough = False
+        self.uncompressed_bytes = 0
+        self.compressed_bytes = 0
+
+    async def run(self, scope: Scope, receive: Receive):
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.passthrough = not self.middleware.is_compressible(
+                Headers(raw=message["headers"])
+            )
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._flush_start()
+            await self.send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.compressor is None:
+            # small responses aren't worth compressing
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._flush_start()
+                await self.send(message)
+                return
+
+            self.compressor = self.middleware.create_compressor(self.encoding)
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.flush()
+
+        self.uncompressed_bytes += len(body)
+        self.compressed_bytes += len(chunk)
+
+        if self.start_message is not None:
+            # the length is only known when the whole body came in a single message
+            self._set_compressed_headers(len(chunk) if not more_body else None)
+            await self._flush_start()
+
+        # the compressor may hold the data back until it has enough of it
+        if chunk or not more_body:
+            await self.send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+
+        if not more_body:
+            _record(self.uncompressed_bytes, self.compressed_bytes)
+
+    def _set_compressed_headers(self, content_length: int | None):
+        assert self.start_message is not None
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is not None:
+            headers["Content-Length"] = str(content_length)
+        elif "content-length" in headers:
+            del headers["Content-Length"]
+        self.start_message["headers"] = headers.raw
+
+    async def _flush_start(self):
+        if self.start_message is None:
+            return
+
+        start_message, self.start_message = self.start_message, None
+        await self.send(start_message)
+
+
+def _select_encoding(accept_encoding: str):
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, parameters = part.strip().partition(";")
+        quality = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith("q="):
+            try:
+                quality = float(parameters[2:])
+            except ValueError:
+                quality = 0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in ("zstd", "gzip") if zstandard is not None else ("gzip",):
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+
+    return None
+
+
+def _record(uncompressed_bytes: int, compressed_bytes: int):
+    with _stats_lock:
+        _stats["responses"] += 1
+        _stats["uncompressed_bytes"] += uncompressed_bytes
+        _stats["compressed_bytes"] += compressed_bytes
+
+
+def get_compression_stats() -> CompressionStats:
+    with _stats_lock:
+        return _stats.copy()
@@ -0,0 +1,113 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.middlewares.query_timing import get_route_name
+from db.db import get_tracked_queries, track_queries
+
+# the upper bounds (in seconds) of the latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+@dataclass
+class RouteMetrics:
+    # the number of requests that took at most LATENCY_BUCKETS[i] seconds (not cumulative), the
+    # last one counts the slower requests
+    latency_buckets: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1)
+    )
+    latency_sum: float = 0
+    responses: defaultdict[int, int] = field(default_factory=lambda: defaultdict(int))
+    queries: int = 0
+    query_duration: float = 0
+
+
+_metrics_lock = threading.Lock()
+# keyed by (route, method)
+_metrics: dict[tuple[str, str], RouteMetrics] = {}
+
+
+class MetricsMiddleware:
+    """records the latency, status and query count of the requests of each route, the metrics are
+    served in the text exposition format by the metrics route
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+            await send(message)
+
+        # the queries are already tracked when the query timing is enabled
+        tracked_queries = get_tracked_queries()
+        with (
+            nullcontext(tracked_queries)
+            if tracked_queries is not None
+            else track_queries(slowest_count=0)
+        ) as stats:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                _record(
+                    # the paths of the unmatched requests would add a series per path
+                    get_route_name(scope) or "unmatched",
+                    scope["method"],
+                    status_code,
+                    time.perf_counter() - start_time,
+                    stats.count,
+                    stats.duration,
+                )
+
+
+def _record(
+    route: str,
+    method: str,
+    status_code: int,
+    duration: float,
+    queries: int,
+    query_duration: float,
+):
+    with _metrics_lock:
+        metrics = _metrics.get((route, method))
+        if metrics is None:
+            metrics = _metrics[route, method] = RouteMetrics()
+
+        metrics.latency_buckets[bisect_left(LATENCY_BUCKETS, duration)] += 1
+        metrics.latency_sum += duration
+        metrics.responses[status_code] += 1
+        metrics.queries += queries
+        metrics.query_duration += query_duration
+
+
+def get_route_metrics() -> dict[tuple[str, str], RouteMetrics]:
+    """a copy of the metrics of each (route, method)"""
+
+    with _metrics_lock:
+        return {
+            key: RouteMetrics(
+                latency_buckets=metrics.latency_buckets.copy(),
+                latency_sum=metrics.latency_sum,
+                responses=metrics.responses.copy(),
+                queries=metrics.queries,
+                query_duration=metrics.query_duration,
+            )
+            for key, metrics in _metrics.items()
+        }
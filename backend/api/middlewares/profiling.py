@@ -0,0 +1,145 @@
+import cProfile
+import datetime
+import hmac
+import io
+import marshal
+import pstats
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Literal
+
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.middlewares.query_timing import get_route_name
+from config import settings
+from db.schemas.request_profile import RequestProfile
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAMETER = "profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+type ProfileFormat = Literal["pstats", "text"]
+
+# cProfile can't run twice at the same time, the other requests aren't profiled meanwhile
+_profiling_lock = threading.Lock()
+
+_profiles_lock = threading.Lock()
+# the latest profiles, the oldest ones are dropped first
+_profiles: deque[tuple[RequestProfile, cProfile.Profile]] = deque(
+    maxlen=settings.PROFILING_MAX_PROFILES
+)
+
+
+class ProfilingMiddleware:
+    """runs the requests that send ADMIN_TOKEN in the X-Profile header (or the `profile` query
+    parameter) under cProfile and keeps the profile for the admin routes
+
+    the response is the route's usual response with an X-Profile-Id header. cProfile profiles
+    every thread of the process since python 3.12, so the sync routes running in the threadpool are
+    included, and so is whatever the other requests ran meanwhile
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or not _is_profiling_requested(scope)
+            or not _profiling_lock.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # another profiler (a debugger for instance) is already running
+                await self.app(scope, receive, send)
+                return
+
+            await self._profile(scope, receive, send, profiler)
+        finally:
+            _profiling_lock.release()
+
+    async def _profile(
+        self, scope: Scope, receive: Receive, send: Send, profiler: cProfile.Profile
+    ):
+        profile_id = uuid.uuid4().hex
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_profile_id(message: Message):
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile_id)
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.disable()
+            profile = RequestProfile(
+                id=profile_id,
+                method=scope["method"],
+                path=scope["path"],
+                route=get_route_name(scope),
+                status_code=status_code,
+                duration_ms=round((time.perf_counter() - start_time) * 1000, 3),
+                created_date=datetime.datetime.now(datetime.UTC),
+            )
+            with _profiles_lock:
+                _profiles.append((profile, profiler))
+
+
+def get_profiles() -> list[RequestProfile]:
+    """the kept profiles, the latest one first"""
+
+    with _profiles_lock:
+        return [profile for profile, _ in reversed(_profiles)]
+
+
+def dump_profile(profile_id: str, format: ProfileFormat, limit: int = 50):
+    """the profile as a pstats file (which `python -m pstats`, snakeviz or flameprof read), or as
+    text with the `limit` functions that took the most cumulative time, None if it isn't kept
+    """
+
+    with _profiles_lock:
+        profiler = next(
+            (profiler for profile, profiler in _profiles if profile.id == profile_id),
+            None,
+        )
+
+    if profiler is None:
+        return None
+
+    if format == "pstats":
+        # the same as Profile.dump_stats, without a file
+        profiler.create_stats()
+        return marshal.dumps(getattr(profiler, "stats"))
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue().encode()
+
+
+def _is_profiling_requested(scope: Scope):
+    token = settings.ADMIN_TOKEN
+    if token is None:
+        return False
+
+    requested_token = Headers(scope=scope).get(PROFILE_HEADER) or QueryParams(
+        scope["query_string"]
+    ).get(PROFILE_QUERY_PARAMETER)
+
+    return requested_token is not None and hmac.compare_digest(
+        requested_token.encode(), token.encode()
+    )
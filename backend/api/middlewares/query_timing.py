@@ -0,0 +1,93 @@
+import logging
+import time
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from db.db import QueryStats, track_queries
+
+_logger = logging.getLogger(__name__)
+
+
+class QueryTimingMiddleware:
+    """counts and times the sql statements of each request
+
+    the totals are sent in the `Server-Timing` header and every request logs a line with them and
+    its `slowest_count` slowest statements, which is how the routes that query once per item show up
+    """
+
+    def __init__(self, app: ASGIApp, slowest_count: int):
+        self.app = app
+        self.slowest_count = slowest_count
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        with track_queries(self.slowest_count) as stats:
+
+            async def send_with_timing(message: Message):
+                nonlocal status_code
+
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = MutableHeaders(scope=message)
+                    # the statements of a streamed body run after the headers are sent, those are
+                    # only in the log line
+                    headers.append(
+                        "Server-Timing",
+                        _format_server_timing(stats, time.perf_counter() - start_time),
+                    )
+
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                _log_request(
+                    scope, status_code, stats, time.perf_counter() - start_time
+                )
+
+
+def get_route_name(scope: Scope):
+    """the operation id of the route that handled the request, None if it wasn't an api route"""
+
+    route = scope.get("route")
+    return route.unique_id if isinstance(route, APIRoute) else None
+
+
+def _format_server_timing(stats: QueryStats, duration: float):
+    return (
+        f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+        f"app;dur={duration * 1000:.1f}"
+    )
+
+
+def _log_request(scope: Scope, status_code: int, stats: QueryStats, duration: float):
+    route = get_route_name(scope) or scope["path"]
+    _logger.info(
+        "%s %s %s %.1fms %d queries %.1fms in db",
+        scope["method"],
+        route,
+        status_code,
+        duration * 1000,
+        stats.count,
+        stats.duration * 1000,
+        extra={
+            "method": scope["method"],
+            "route": route,
+            "status_code": status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "query_count": stats.count,
+            "query_duration_ms": round(stats.duration * 1000, 3),
+            "slowest_queries": [
+                {"duration_ms": round(slow_duration * 1000, 3), "statement": statement}
+                for slow_duration, statement in stats.slowest
+            ],
+        },
+    )
@@ -0,0 +1,49 @@
+import math
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.dependencies.db import (
+    LAST_WRITE_COOKIE,
+    LAST_WRITE_HEADER,
+    has_read_replica,
+    track_writes,
+)
+
+
+class ReadYourWritesMiddleware:
+    """sends the time of the request's write back to the client when there is a read replica
+
+    the time is set as a cookie that expires with the read-your-writes window and as a header for
+    the clients that don't keep cookies (they send it back in the same header), while either of
+    them is recent the read only routes of the client query the primary (see `get_read_db`)
+    """
+
+    def __init__(self, app: ASGIApp, window_seconds: float):
+        self.app = app
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not has_read_replica():
+            await self.app(scope, receive, send)
+            return
+
+        with track_writes() as writes:
+
+            async def send_with_last_write(message: Message):
+                if (
+                    message["type"] == "http.response.start"
+                    and writes.last_write_at is not None
+                ):
+                    last_write_at = f"{writes.last_write_at:.3f}"
+                    headers = MutableHeaders(scope=message)
+                    headers.append(LAST_WRITE_HEADER, last_write_at)
+                    headers.append(
+                        "Set-Cookie",
+                        f"{LAST_WRITE_COOKIE}={last_write_at}; "
+                        f"Max-Age={math.ceil(self.window_seconds)}; Path=/; HttpOnly; SameSite=lax",
+                    )
+
+                await send(message)
+
+            await self.app(scope, receive, send_with_last_write)
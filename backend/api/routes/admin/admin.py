@@ -0,0 +1,63 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from starlette.status import HTTP_200_OK
+
+from api.dependencies.admin import check_admin_token
+from api.middlewares.profiling import ProfileFormat, dump_profile, get_profiles
+from db.schemas.request_profile import RequestProfile
+from db.schemas.slow_query import SlowQuery
+from db.utils.slow_query_log import clear_slow_queries, get_slow_queries
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(check_admin_token)],
+    include_in_schema=False,
+)
+
+
+@router.get("/slow-queries", response_model=list[SlowQuery])
+def slow_queries():
+    """the statements that took longer than SLOW_QUERY_THRESHOLD_MS, the latest one first"""
+
+    return get_slow_queries()
+
+
+@router.delete("/slow-queries")
+def clear():
+    clear_slow_queries()
+    return Response(status_code=HTTP_200_OK)
+
+
+@router.get("/profiles", response_model=list[RequestProfile])
+def profiles():
+    """the profiled requests, the latest one first"""
+
+    return get_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+def profile(
+    profile_id: str,
+    format: Annotated[ProfileFormat, Query()] = "pstats",
+    limit: Annotated[int, Query(gt=0)] = 50,
+):
+    """the profile as a pstats file, or as text with the `limit` functions that took the most
+    cumulative time
+    """
+
+    dumped = dump_profile(profile_id, format, limit)
+    if dumped is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+        )
+
+    if format == "text":
+        return Response(dumped, media_type="text/plain; charset=utf-8")
+
+    return Response(
+        dumped,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+    )
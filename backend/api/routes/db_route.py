@@ -0,0 +1,168 @@
+import functools
+import inspect
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from api.dependencies.db import run_db
+from config import settings
+from db.utils.slow_query_log import route_queries
+
+# the routers' routes are copied into the app with the already wrapped endpoints
+_RENDERS_JSON = "_renders_json"
+
+
+class DbRoute(APIRoute):
+    """runs the sync endpoints in the greenlet of the request's async session when SQLALCHEMY_ASYNC
+    is enabled, otherwise the endpoints run in the threadpool as usual
+
+    the responses lazy load relationships of the returned models, so they are validated against the
+    response model before leaving the greenlet
+
+    with FAST_JSON_RESPONSES the json responses are validated and dumped to bytes by pydantic in a
+    single pass, instead of FastAPI validating them, converting them to python objects and encoding
+    those with the json module
+
+    the slow queries of the requests are attributed to the route's operation id
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        response_model = kwargs.get("response_model")
+        if isinstance(response_model, DefaultPlaceholder):
+            response_model = response_model.value
+
+        if settings.SQLALCHEMY_ASYNC and not inspect.iscoroutinefunction(endpoint):
+            endpoint = _run_in_db_session(endpoint, response_model)
+
+        if (
+            settings.FAST_JSON_RESPONSES
+            and response_model is not None
+            and _is_json_response_class(kwargs.get("response_class"))
+            and not getattr(endpoint, _RENDERS_JSON, False)
+        ):
+            endpoint = _render_json(endpoint, response_model, kwargs.get("status_code"))
+
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def handle_with_route_name(request: Request):
+            # the sync endpoints and dependencies get a copy of the context in the threadpool
+            with route_queries(self.unique_id):
+                return await handler(request)
+
+        return handle_with_route_name
+
+
+def _run_in_db_session(endpoint: Callable[..., Any], response_model: Any):
+    adapter = TypeAdapter(response_model) if response_model is not None else None
+
+    def run(_: Session, **kwargs: Any):
+        result = endpoint(**kwargs)
+
+        if adapter is None or isinstance(result, Response):
+            return result
+
+        return adapter.validate_python(result, from_attributes=True)
+
+    # the wrapper keeps the signature of the endpoint, so its dependencies are resolved the same way
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs: Any):
+        db = next(
+            (value for value in kwargs.values() if isinstance(value, Session)), None
+        )
+
+        if db is None:
+            return await run_in_threadpool(endpoint, **kwargs)
+
+        return await run_db(db, run, **kwargs)
+
+    return wrapper
+
+
+def _is_json_response_class(response_class: Any):
+    if isinstance(response_class, DefaultPlaceholder):
+        response_class = response_class.value
+
+    return response_class is None or response_class is JSONResponse
+
+
+def _render_json(
+    endpoint: Callable[..., Any], response_model: Any, status_code: int | None
+):
+    adapter = TypeAdapter(response_model)
+    signature = inspect.signature(endpoint)
+
+    # the headers and status code that the endpoint (or its dependencies) set on the response are
+    # copied to the rendered response, FastAPI injects it into the parameter typed as Response
+    response_parameter = next(
+        (
+            parameter.name
+            for parameter in signature.parameters.values()
+            if inspect.isclass(parameter.annotation)
+            and issubclass(parameter.annotation, Response)
+        ),
+        None,
+    )
+    injects_response = response_parameter is None
+    if response_parameter is None:
+        response_parameter = "fast_json_response"
+        signature = signature.replace(
+            parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(
+                    response_parameter,
+                    inspect.Parameter.KEYWORD_ONLY,
+                    annotation=Response,
+                ),
+            ]
+        )
+
+    def render(result: Any, response: Response):
+        if isinstance(result, Response):
+            return result
+
+        rendered = Response(
+            content=adapter.dump_json(
+                adapter.validate_python(result, from_attributes=True), by_alias=True
+            ),
+            status_code=response.status_code or status_code or 200,
+            media_type=JSONResponse.media_type,
+        )
+        rendered.headers.raw.extend(response.headers.raw)
+        return rendered
+
+    def pop_response(kwargs: dict[str, Any]) -> Response:
+        if injects_response:
+            return kwargs.pop(response_parameter)
+        return kwargs[response_parameter]
+
+    # async endpoints are rendered on the event loop, sync ones in the threadpool with the endpoint
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(**kwargs: Any):
+            response = pop_response(kwargs)
+            return render(await endpoint(**kwargs), response)
+
+        wrapper = async_wrapper
+    else:
+
+        @functools.wraps(endpoint)
+        def sync_wrapper(**kwargs: Any):
+            response = pop_response(kwargs)
+            return render(endpoint(**kwargs), response)
+
+        wrapper = sync_wrapper
+
+    setattr(wrapper, "__signature__", signature)
+    setattr(wrapper, _RENDERS_JSON, True)
+    return wrapper
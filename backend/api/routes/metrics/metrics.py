@@ -0,0 +1,246 @@
+from collections.abc import Iterable
+
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy import Engine, QueuePool
+
+import db
+from api.dependencies.admin import check_metrics_token
+from api.middlewares.compression import get_compression_stats
+from api.middlewares.metrics import LATENCY_BUCKETS, get_route_metrics
+from db.utils.password_hasher import get_password_hashing_stats
+from db.utils.user_principal_cache import get_principal_cache_stats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+type _Labels = dict[str, str]
+type _Sample = tuple[str, _Labels, float]
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(check_metrics_token)],
+)
+
+
+@router.get("", include_in_schema=False)
+def metrics():
+    """the metrics of this process in the prometheus text exposition format"""
+
+    lines: list[str] = []
+    _write_route_metrics(lines)
+    _write_pool_metrics(lines)
+    _write_process_metrics(lines)
+    return Response("\n".join(lines) + "\n", media_type=CONTENT_TYPE)
+
+
+def _write_route_metrics(lines: list[str]):
+    route_metrics = sorted(get_route_metrics().items())
+
+    latency_samples: list[_Sample] = []
+    for (route, method), route_metric in route_metrics:
+        labels = {"route": route, "method": method}
+        count = 0
+        for bound, bucket in zip(LATENCY_BUCKETS, route_metric.latency_buckets):
+            count += bucket
+            latency_samples.append(("_bucket", labels | {"le": str(bound)}, count))
+        count += route_metric.latency_buckets[-1]
+        latency_samples.append(("_bucket", labels | {"le": "+Inf"}, count))
+        latency_samples.append(("_sum", labels, route_metric.latency_sum))
+        latency_samples.append(("_count", labels, count))
+
+    _write(
+        lines,
+        "http_request_duration_seconds",
+        "histogram",
+        "the time it took to respond, by route",
+        latency_samples,
+    )
+    _write(
+        lines,
+        "http_responses_total",
+        "counter",
+        "the responses of each route by status",
+        (
+            ("", {"route": route, "method": method, "status": str(status_code)}, count)
+            for (route, method), route_metric in route_metrics
+            for status_code, count in sorted(route_metric.responses.items())
+        ),
+    )
+    _write(
+        lines,
+        "db_queries_total",
+        "counter",
+        "the sql statements that the requests of each route executed",
+        (
+            ("", {"route": route, "method": method}, route_metric.queries)
+            for (route, method), route_metric in route_metrics
+        ),
+    )
+    _write(
+        lines,
+        "db_query_duration_seconds_total",
+        "counter",
+        "the time the requests of each route spent executing sql statements",
+        (
+            ("", {"route": route, "method": method}, route_metric.query_duration)
+            for (route, method), route_metric in route_metrics
+        ),
+    )
+
+
+def _write_pool_metrics(lines: list[str]):
+    pools: list[tuple[_Labels, QueuePool]] = []
+    for database, params in [("primary", db.params), ("replica", db.read_params)]:
+        if params is None:
+            continue
+
+        engines: list[tuple[str, Engine | None]] = [
+            ("sync", params["engine"]),
+            (
+                "async",
+                (
+                    params["async_engine"].sync_engine
+                    if params["async_engine"] is not None
+                    else None
+                ),
+            ),
+        ]
+        for engine_type, engine in engines:
+            # in-memory sqlite databases don't have a pool to size
+            if engine is not None and isinstance(engine.pool, QueuePool):
+                pools.append(
+                    ({"database": database, "engine": engine_type}, engine.pool)
+                )
+
+    for name, help, value in [
+        ("db_pool_size", "the connections the pool keeps open", QueuePool.size),
+        (
+            "db_pool_checked_out",
+            "the connections that are in use",
+            QueuePool.checkedout,
+        ),
+        (
+            "db_pool_checked_in",
+            "the idle connections in the pool",
+            QueuePool.checkedin,
+        ),
+        (
+            "db_pool_overflow",
+            "the connections that were opened beyond the size of the pool, negative while the "
+            "pool isn't full yet",
+            QueuePool.overflow,
+        ),
+    ]:
+        _write(
+            lines,
+            name,
+            "gauge",
+            help,
+            (("", labels, value(pool)) for labels, pool in pools),
+        )
+
+
+def _write_process_metrics(lines: list[str]):
+    hashing = get_password_hashing_stats()
+    _write(
+        lines,
+        "password_hashing_workers",
+        "gauge",
+        "the threads that hash passwords",
+        [("", {}, hashing["max_workers"])],
+    )
+    _write(
+        lines,
+        "password_hashing_queued",
+        "gauge",
+        "the passwords that are waiting for a free worker",
+        [("", {}, hashing["queued"])],
+    )
+    _write(
+        lines,
+        "password_hashing_running",
+        "gauge",
+        "the passwords that are being hashed or verified",
+        [("", {}, hashing["running"])],
+    )
+    _write(
+        lines,
+        "password_hashing_rejected_total",
+        "counter",
+        "the requests that were rejected because the hashing queue was full",
+        [("", {}, hashing["rejected"])],
+    )
+
+    auth_cache = get_principal_cache_stats()
+    _write(
+        lines,
+        "auth_cache_hits_total",
+        "counter",
+        "the authenticated requests whose user was cached",
+        [("", {}, auth_cache["hits"])],
+    )
+    _write(
+        lines,
+        "auth_cache_misses_total",
+        "counter",
+        "the authenticated requests whose user wasn't cached",
+        [("", {}, auth_cache["misses"])],
+    )
+    _write(
+        lines,
+        "auth_cache_entries",
+        "gauge",
+        "the users that are cached",
+        [("", {}, auth_cache["size"])],
+    )
+
+    compression = get_compression_stats()
+    _write(
+        lines,
+        "compressed_responses_total",
+        "counter",
+        "the responses that were compressed",
+        [("", {}, compression["responses"])],
+    )
+    _write(
+        lines,
+        "compression_uncompressed_bytes_total",
+        "counter",
+        "the size of the compressed responses before compressing them",
+        [("", {}, compression["uncompressed_bytes"])],
+    )
+    _write(
+        lines,
+        "compression_compressed_bytes_total",
+        "counter",
+        "the size of the compressed responses",
+        [("", {}, compression["compressed_bytes"])],
+    )
+
+
+def _write(
+    lines: list[str], name: str, type: str, help: str, samples: Iterable[_Sample]
+):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {type}")
+    for suffix, labels, value in samples:
+        lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+
+def _format_labels(labels: _Labels):
+    if len(labels) == 0:
+        return ""
+
+    return (
+        "{"
+        + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+        + "}"
+    )
+
+
+def _escape_label(value: str):
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_value(value: float):
+    return str(value) if isinstance(value, float) else str(int(value))
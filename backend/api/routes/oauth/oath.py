@@ -5,12 +5,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
-from api.dependencies.db import get_db
+from api.dependencies.db import get_db, run_db
+from api.routes.db_route import DbRoute
 from config import settings
 from db.schemas.oath_token import Token
 from db.utils.oatuh import authenticate_user, create_access_token
 
-router = APIRouter(prefix="/oauth", tags=["OAuth"])
+router = APIRouter(prefix="/oauth", tags=["OAuth"], route_class=DbRoute)
 
 
 @router.post("/token", response_model=Token)
@@ -18,7 +19,7 @@ async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: Annotated[Session, Depends(get_db)],
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await run_db(db, authenticate_user, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
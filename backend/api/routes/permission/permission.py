@@ -6,22 +6,29 @@ from sqlalchemy.orm import Session
 
 from api.dependencies.db import get_db
 from api.dependencies.oauth import get_current_user
-from db.models.user import User
+from api.dependencies.permission import get_permission_context
+from api.routes.db_route import DbRoute
 from db.schemas.project import (
     PartialUserWithPermission,
     Project,
     ProjectUpdateUserPermissions,
 )
+from db.schemas.user import UserPrincipal
 from db.utils import project_crud
 
-router = APIRouter(prefix="/permissions", tags=["permissions"])
+router = APIRouter(
+    prefix="/permissions",
+    tags=["permissions"],
+    dependencies=[Depends(get_permission_context)],
+    route_class=DbRoute,
+)
 
 
 @router.put(path="/{project_id}", response_model=PartialUserWithPermission)
 def update(
     project_id: int,
     permissions: ProjectUpdateUserPermissions,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     updated_project = project_crud.update_user_permissions(
@@ -1,12 +1,17 @@
+import asyncio
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from starlette.status import HTTP_200_OK
 
-from api.dependencies.db import get_db
+from api.dependencies.db import get_db, get_read_db, run_db
 from api.dependencies.oauth import get_current_user
-from db.models.user import User
+from api.dependencies.permission import get_permission_context
+from api.dependencies.project_version import check_project_etag
+from api.routes.db_route import DbRoute
+from config import settings
 from db.schemas.project import (
     Project,
     ProjectAttachAssociation,
@@ -14,15 +19,23 @@ from db.schemas.project import (
     ProjectCreate,
     ProjectUpdate,
 )
+from db.schemas.project_event import ProjectEventType
+from db.schemas.user import UserPrincipal
 from db.utils import project_crud
+from db.utils.event_broker import get_event_broker
 
-router = APIRouter(prefix="/projects", tags=["projects"])
+router = APIRouter(
+    prefix="/projects",
+    tags=["projects"],
+    dependencies=[Depends(get_permission_context)],
+    route_class=DbRoute,
+)
 
 
 @router.post("/", response_model=Project)
 def create_for_user(
     project: ProjectCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     return project_crud.create(db=db, project=project, user_id=current_user.id)
@@ -32,7 +45,7 @@ def create_for_user(
 def update(
     project_id: int,
     patch: ProjectUpdate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     return project_crud.update(db, project_id, patch, current_user.id)
@@ -44,7 +57,7 @@ def update(
 def attach_to_user(
     project_id: int,
     association: ProjectAttachAssociation,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     return project_crud.attach_to_user(db, project_id, association, current_user.id)
@@ -53,7 +66,7 @@ def attach_to_user(
 @router.delete(path="/{project_id}/users/me")
 def detach_from_self(
     project_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     project_crud.detach_from_user(db, project_id, current_user.id, current_user.id)
@@ -64,18 +77,22 @@ def detach_from_self(
 def detach_from_user(
     project_id: int,
     user_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     project_crud.detach_from_user(db, project_id, user_id, current_user.id)
     return Response(status_code=HTTP_200_OK)
 
 
-@router.get("/{project_id}", response_model=Project)
+@router.get(
+    "/{project_id}",
+    response_model=Project,
+    dependencies=[Depends(check_project_etag)],
+)
 def filter(
     project_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_read_db)],
 ):
     project = project_crud.get_project(db, project_id, current_user.id)
     return project
@@ -83,8 +100,63 @@ def filter(
 
 @router.get("/", response_model=list[Project])
 def list(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_read_db)],
 ):
     projects = project_crud.get_projects(db, current_user.id)
     return projects
+
+
+@router.get(
+    "/{project_id}/events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def events(
+    project_id: int,
+    request: Request,
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_db)],
+):
+    """streams the changes of the project as server-sent events, the `event` of each message is its
+    `ProjectEventType` and the `data` is the `ProjectEvent` as json
+    """
+
+    await run_db(
+        db,
+        project_crud.validate_project_belongs_to_user,
+        project_id,
+        current_user.id,
+        None,
+    )
+
+    return StreamingResponse(
+        _stream_events(request, project_id, current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _stream_events(request: Request, project_id: int, user_id: int):
+    subscription = get_event_broker().subscribe(project_id)
+    try:
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(
+                    subscription.get(), settings.EVENT_STREAM_KEEPALIVE_SECONDS
+                )
+            except TimeoutError:
+                # keeps the proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+
+            yield f"event: {event.type}\ndata: {event.model_dump_json()}\n\n"
+
+            # the access is only checked when subscribing, so the stream ends with the access
+            if (
+                event.type == ProjectEventType.USER_DETACHED
+                and event.data["user_id"] == user_id
+            ):
+                return
+    finally:
+        subscription.close()
@@ -0,0 +1,32 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from api.dependencies.db import get_read_db
+from api.dependencies.oauth import get_current_user
+from api.dependencies.permission import get_permission_context
+from api.routes.db_route import DbRoute
+from db.schemas.sync import SyncChanges
+from db.schemas.user import UserPrincipal
+from db.utils import sync_crud
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["sync"],
+    dependencies=[Depends(get_permission_context)],
+    route_class=DbRoute,
+)
+
+
+@router.get("/", response_model=SyncChanges)
+def changes(
+    since: Annotated[int, Query(ge=0)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_read_db)],
+):
+    """returns what changed in the user's projects after the `since` version, the `version` of the
+    response is the `since` of the next call
+    """
+
+    return sync_crud.get_changes(db, since, current_user.id)
@@ -4,9 +4,10 @@ from fastapi import APIRouter, Depends, Path, Query, Response
 from sqlalchemy.orm import Session
 from starlette.status import HTTP_200_OK
 
-from api.dependencies.db import get_db
+from api.dependencies.db import get_db, get_read_db
 from api.dependencies.oauth import get_current_user
-from db.models.user import User
+from api.dependencies.permission import get_permission_context
+from api.routes.db_route import DbRoute
 from db.schemas.tag import (
     TAG_MAX_LENGTH,
     TAG_MIN_LENGTH,
@@ -17,16 +18,22 @@ from db.schemas.tag import (
     TagUpdate,
 )
 from db.schemas.todo_item import TodoItem
+from db.schemas.user import UserPrincipal
 from db.utils import tag_crud
 
-router = APIRouter(prefix="/tags", tags=["tags"])
+router = APIRouter(
+    prefix="/tags",
+    tags=["tags"],
+    dependencies=[Depends(get_permission_context)],
+    route_class=DbRoute,
+)
 tag_name_validator = Path(min_length=TAG_MIN_LENGTH, max_length=TAG_MAX_LENGTH)
 
 
 @router.post("/", response_model=Tag)
 def create(
     tag: TagCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     return tag_crud.create(db, tag, current_user.id)
@@ -36,7 +43,7 @@ def create(
 def update(
     tag_name: Annotated[str, tag_name_validator],
     tag: TagUpdate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     return tag_crud.edit(db, tag_name, tag, current_user.id)
@@ -46,7 +53,7 @@ def update(
 def attach_to_todo(
     tag_name: Annotated[str, tag_name_validator],
     association: TagAttachToTodo,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     return tag_crud.attach_tag_to_todo(db, tag_name, association, current_user.id)
@@ -56,7 +63,7 @@ def attach_to_todo(
 def detach_from_todo(
     tag_name: Annotated[str, tag_name_validator],
     todo_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     tag_crud.detach_tag_from_todo(db, tag_name, todo_id, current_user.id)
@@ -67,7 +74,7 @@ def detach_from_todo(
 def delete(
     tag_name: Annotated[str, tag_name_validator],
     tag: TagDelete,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     tag_crud.delete(db, tag_name, tag, current_user.id)
@@ -76,8 +83,8 @@ def delete(
 
 @router.get(path="/", response_model=list[TodoItem])
 def search(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_read_db)],
     name: Annotated[str, Query()],
     project_id: Annotated[int | None, Query()] = None,
 ):
@@ -4,24 +4,32 @@ from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
 from starlette.status import HTTP_200_OK
 
-from api.dependencies.db import get_db
+from api.dependencies.db import get_db, get_read_db
 from api.dependencies.oauth import get_current_user
-from db.models.user import User
+from api.dependencies.permission import get_permission_context
+from api.dependencies.project_version import check_project_etag
+from api.routes.db_route import DbRoute
 from db.schemas.todo_category import (
     TodoCategory,
     TodoCategoryAttachAssociation,
     TodoCategoryCreate,
     TodoCategoryUpdate,
 )
+from db.schemas.user import UserPrincipal
 from db.utils import todo_category_crud
 
-router = APIRouter(prefix="/todo-categories", tags=["todo-categories"])
+router = APIRouter(
+    prefix="/todo-categories",
+    tags=["todo-categories"],
+    dependencies=[Depends(get_permission_context)],
+    route_class=DbRoute,
+)
 
 
 @router.post("/", response_model=TodoCategory)
 def create_for_user(
     category: TodoCategoryCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     return todo_category_crud.create(db, category, current_user.id)
@@ -31,7 +39,7 @@ def create_for_user(
 def attach_to_project(
     category_id: int,
     association: TodoCategoryAttachAssociation,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     return todo_category_crud.attach_to_project(
@@ -43,7 +51,7 @@ def attach_to_project(
 def detach_from_project(
     category_id: int,
     project_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     todo_category_crud.detach_from_project(db, category_id, project_id, current_user.id)
@@ -55,7 +63,7 @@ def detach_from_project(
 def update(
     category_id: int,
     category: TodoCategoryUpdate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
 
@@ -71,13 +79,18 @@ def update(
     return db_items
 
 
-@router.get("/", response_model=list[TodoCategory])
+@router.get(
+    "/",
+    response_model=list[TodoCategory],
+    dependencies=[Depends(check_project_etag)],
+)
 def search(
     project_id: Annotated[int, Query()],
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_read_db)],
+    ordered: Annotated[bool, Query()] = False,
 ):
     items = todo_category_crud.get_categories_for_project(
-        db, project_id, current_user.id
+        db, project_id, current_user.id, ordered
     )
     return items
@@ -4,37 +4,58 @@ from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.orm import Session
 from starlette.status import HTTP_200_OK
 
-from api.dependencies.db import get_db
+from api.dependencies.db import get_db, get_read_db
 from api.dependencies.oauth import get_current_user
-from db.models.user import User
+from api.dependencies.permission import get_permission_context
+from api.routes.db_route import DbRoute
 from db.schemas.todo_item import (
     SearchTodoStatus,
     TodoItem,
     TodoItemAddDependency,
+    TodoItemBulkUpdateOrder,
     TodoItemCreate,
     TodoItemPartialDependency,
+    TodoItemSearchFilters,
     TodoItemUpdate,
 )
+from db.schemas.user import UserPrincipal
 from db.utils import todo_item_crud
 
-router = APIRouter(prefix="/todo-items", tags=["todo-items"])
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+router = APIRouter(
+    prefix="/todo-items",
+    tags=["todo-items"],
+    dependencies=[Depends(get_permission_context)],
+    route_class=DbRoute,
+)
 
 
 @router.post("/", response_model=TodoItem)
 def create_for_user(
     todo: TodoItemCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     result = todo_item_crud.create(db, todo, current_user.id)
     return result
 
 
+@router.patch(path="/order:batch")
+def bulk_update_order(
+    bulk_order: TodoItemBulkUpdateOrder,
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_db)],
+):
+    todo_item_crud.bulk_update_order(db, bulk_order, current_user.id)
+    return Response(status_code=HTTP_200_OK)
+
+
 @router.patch(path="/{todo_id}", response_model=TodoItem)
 def update(
     todo_id: int,
     todo: TodoItemUpdate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     if todo.item is not None:
@@ -47,7 +68,7 @@ def update(
 @router.delete(path="/{todo_id}")
 def remove(
     todo_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     todo_item_crud.remove(db, todo_id, current_user.id)
@@ -58,7 +79,7 @@ def remove(
 def add_todo_item_dependency(
     todo_id: int,
     dependency: TodoItemAddDependency,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     dependency.ensure_different_todo_ids(todo_id)
@@ -69,7 +90,7 @@ def add_todo_item_dependency(
 def remove_todo_item_dependency(
     todo_id: int,
     dependent_todo_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     todo_item_crud.remove_todo_dependency(
@@ -80,13 +101,31 @@ def remove_todo_item_dependency(
 
 @router.get("/", response_model=list[TodoItem])
 def search(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_db)],
+    response: Response,
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_read_db)],
     project_id: Annotated[int, Query()],
     category_id: Annotated[int, Query()],
+    filters: Annotated[TodoItemSearchFilters, Depends()],
     status: Annotated[SearchTodoStatus, Query()] = SearchTodoStatus.ALL,
+    ordered: Annotated[bool, Query()] = False,
+    after_id: Annotated[int | None, Query()] = None,
+    limit: Annotated[int | None, Query(ge=1, le=500)] = None,
 ):
-    items = todo_item_crud.get_todos_for_user(
-        db, project_id, category_id, status, current_user.id
+    items, next_cursor = todo_item_crud.get_todos_for_user(
+        db,
+        project_id,
+        category_id,
+        status,
+        current_user.id,
+        ordered,
+        filters,
+        after_id,
+        limit,
     )
+
+    if next_cursor is not None:
+        # the next page is requested with `after_id` set to this cursor
+        response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+
     return items
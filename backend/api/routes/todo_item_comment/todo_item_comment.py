@@ -4,24 +4,31 @@ from fastapi import APIRouter, Depends, Response
 from sqlalchemy.orm import Session
 from starlette.status import HTTP_200_OK
 
-from api.dependencies.db import get_db
+from api.dependencies.db import get_db, get_read_db
 from api.dependencies.oauth import get_current_user
-from db.models.user import User
+from api.dependencies.permission import get_permission_context
+from api.routes.db_route import DbRoute
 from db.schemas.todo_item_comment import (
     TodoComment,
     TodoCommentCreate,
     TodoCommentUpdate,
 )
+from db.schemas.user import UserPrincipal
 from db.utils import todo_item_comment_crud
 
-router = APIRouter(prefix="/todo-items", tags=["todo-item-comments"])
+router = APIRouter(
+    prefix="/todo-items",
+    tags=["todo-item-comments"],
+    dependencies=[Depends(get_permission_context)],
+    route_class=DbRoute,
+)
 
 
 @router.post("/{todo_id}/comments", response_model=TodoComment)
 def create(
     todo_id: int,
     comment: TodoCommentCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     result = todo_item_comment_crud.create(db, todo_id, comment, current_user.id)
@@ -33,7 +40,7 @@ def update(
     todo_id: int,
     comment_id: int,
     comment: TodoCommentUpdate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     return todo_item_comment_crud.edit(
@@ -45,7 +52,7 @@ def update(
 def delete(
     todo_id: int,
     comment_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
 ):
     todo_item_comment_crud.delete(db, todo_id, comment_id, current_user.id)
@@ -55,7 +62,7 @@ def delete(
 @router.get(path="/{todo_id}/comments/", response_model=list[TodoComment])
 def list(
     todo_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_read_db)],
 ):
     return todo_item_comment_crud.list(db, todo_id, current_user.id)
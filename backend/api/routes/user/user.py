@@ -5,11 +5,12 @@ from sqlalchemy.orm import Session
 
 from api.dependencies.db import get_db
 from api.dependencies.oauth import get_current_user
-from db.schemas.user import User, UserCreate
+from api.routes.db_route import DbRoute
+from db.schemas.user import User, UserCreate, UserPrincipal
 from db.utils import user_crud
 from error.exceptions import ErrorCode, UserFriendlyError
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=DbRoute)
 
 
 @router.post("/signup", response_model=User)
@@ -25,6 +26,7 @@ def signup(user: UserCreate, db: Annotated[Session, Depends(get_db)]):
 
 @router.get("/me", response_model=User)
 def info(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_db)],
 ):
-    return current_user
+    return user_crud.get_user(db, current_user.id)
@@ -0,0 +1,287 @@
+"""fills a fresh database with a board-shaped dataset for the load tests, the same seed always
+generates the same data
+
+    python -m benchmarks.data --database-url sqlite:///benchmark.db --users 20 --projects 40
+
+every user's password is BENCHMARK_PASSWORD, the database is emptied first
+"""
+
+import argparse
+import random
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from typing import Any, Literal
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from db.db import get_db_params, init_database
+
+# the relationships of the models are resolved once every model is imported
+from db.models import todo_category_action
+from db.models.base import Base
+from db.models.project import Project
+from db.models.project_user_association import ProjectUserAssociation
+from db.models.tag import Tag
+from db.models.todo_category import TodoCategory
+from db.models.todo_category_order import TodoCategoryOrder
+from db.models.todo_category_project_association import TodoCategoryProjectAssociation
+from db.models.todo_item import TodoItem
+from db.models.todo_item_comments import TodoItemComment
+from db.models.todo_item_dependency import TodoItemDependency
+from db.models.todo_item_order import TodoItemOrder
+from db.models.todo_item_tag_association import TodoItemTagAssociation
+from db.models.user import User
+from db.models.user_project_permission import Permission, UserProjectPermission
+from db.utils.order_migration import migrate_orders_to_backend
+from db.utils.password_hasher import hash_password
+from db.utils.project_counters import recompute_project_counters
+
+BENCHMARK_PASSWORD = "benchmark-password"
+
+# the rows are inserted in batches of this size
+_BATCH_SIZE = 5_000
+
+
+@dataclass
+class DatasetConfig:
+    users: int = 20
+    projects: int = 40
+    # every project is shared with this many users besides its owner
+    members_per_project: int = 2
+    categories_per_project: int = 5
+    items_per_category: int = 40
+    tags_per_project: int = 10
+    max_tags_per_item: int = 3
+    # the share of the items that depend on an earlier item of their project
+    dependency_ratio: float = 0.2
+    max_comments_per_item: int = 3
+    # the share of the items (without dependencies) that are done
+    done_ratio: float = 0.3
+    seed: int = 0
+
+
+def generate(db: Session, config: DatasetConfig):
+    """inserts the dataset through the models, the ids start from 1 so the database must be empty
+
+    the orders are stored as linked lists, `create_database` converts them to the rank backend
+    when it's asked to. this commits the changes
+    """
+
+    rng = random.Random(config.seed)
+    # bcrypt is slow on purpose, every user gets the same hash
+    password = hash_password(BENCHMARK_PASSWORD)
+
+    rows: dict[type[Base], list[dict[str, Any]]] = {
+        model: []
+        for model in [
+            User,
+            Project,
+            ProjectUserAssociation,
+            UserProjectPermission,
+            Tag,
+            TodoCategory,
+            TodoCategoryProjectAssociation,
+            TodoCategoryOrder,
+            TodoItem,
+            TodoItemOrder,
+            TodoItemTagAssociation,
+            TodoItemDependency,
+            TodoItemComment,
+        ]
+    }
+
+    user_ids = list(range(1, config.users + 1))
+    rows[User] = [
+        {"id": id, "username": f"user{id}", "password": password} for id in user_ids
+    ]
+
+    category_id = 0
+    todo_id = 0
+    tag_id = 0
+    association_id = 0
+    for project_id in range(1, config.projects + 1):
+        rows[Project].append(
+            {
+                "id": project_id,
+                "title": f"project {project_id}",
+                "description": _sentence(rng),
+            }
+        )
+
+        owner_id = user_ids[(project_id - 1) % len(user_ids)]
+        members = rng.sample(
+            [id for id in user_ids if id != owner_id],
+            min(config.members_per_project, len(user_ids) - 1),
+        )
+        for user_id in [owner_id, *members]:
+            association_id += 1
+            rows[ProjectUserAssociation].append(
+                {"id": association_id, "user_id": user_id, "project_id": project_id}
+            )
+            rows[UserProjectPermission].append(
+                {
+                    "project_user_association_id": association_id,
+                    "permission": Permission.ALL,
+                }
+            )
+
+        tag_ids = list(range(tag_id + 1, tag_id + config.tags_per_project + 1))
+        rows[Tag].extend(
+            {"id": id, "name": f"tag-{index}", "project_id": project_id}
+            for index, id in enumerate(tag_ids)
+        )
+        tag_id += config.tags_per_project
+
+        category_ids = list(
+            range(category_id + 1, category_id + config.categories_per_project + 1)
+        )
+        category_id += config.categories_per_project
+        rows[TodoCategory].extend(
+            {"id": id, "title": f"category {id}", "description": _sentence(rng)}
+            for id in category_ids
+        )
+        rows[TodoCategoryProjectAssociation].extend(
+            {"category_id": id, "project_id": project_id} for id in category_ids
+        )
+        rows[TodoCategoryOrder].extend(
+            {
+                "project_id": project_id,
+                "category_id": id,
+                "left_id": left,
+                "right_id": right,
+            }
+            for id, left, right in _linked_list(category_ids)
+        )
+
+        project_todo_ids: list[int] = []
+        for list_category_id in category_ids:
+            todo_ids = list(range(todo_id + 1, todo_id + config.items_per_category + 1))
+            todo_id += config.items_per_category
+
+            for id in todo_ids:
+                depends_on = (
+                    rng.choice(project_todo_ids)
+                    if project_todo_ids and rng.random() < config.dependency_ratio
+                    else None
+                )
+                is_done = depends_on is None and rng.random() < config.done_ratio
+                comments_count = rng.randint(0, config.max_comments_per_item)
+                rows[TodoItem].append(
+                    {
+                        "id": id,
+                        "title": f"todo item {id}",
+                        "description": _sentence(rng),
+                        "category_id": list_category_id,
+                        "marked_as_done_by_user_id": owner_id if is_done else None,
+                        "comments_count": comments_count,
+                    }
+                )
+                rows[TodoItemTagAssociation].extend(
+                    {"todo_id": id, "tag_id": tag}
+                    for tag in rng.sample(
+                        tag_ids,
+                        rng.randint(0, min(config.max_tags_per_item, len(tag_ids))),
+                    )
+                )
+                if depends_on is not None:
+                    rows[TodoItemDependency].append(
+                        {"todo_id": id, "dependant_todo_id": depends_on}
+                    )
+                rows[TodoItemComment].extend(
+                    {"todo_id": id, "message": _sentence(rng)}
+                    for _ in range(comments_count)
+                )
+
+            rows[TodoItemOrder].extend(
+                {"todo_id": id, "left_id": left, "right_id": right}
+                for id, left, right in _linked_list(todo_ids)
+            )
+            project_todo_ids.extend(todo_ids)
+
+    for model, model_rows in rows.items():
+        for start in range(0, len(model_rows), _BATCH_SIZE):
+            db.execute(insert(model), model_rows[start : start + _BATCH_SIZE])
+
+    # the done and pending counters of the projects are derived from the inserted items
+    recompute_project_counters(db)
+    db.commit()
+
+    return {model.__tablename__: len(model_rows) for model, model_rows in rows.items()}
+
+
+def _linked_list(ids: Sequence[int]):
+    """(id, left_id, right_id) of the ids in their order"""
+
+    return [
+        (
+            id,
+            ids[index - 1] if index > 0 else None,
+            ids[index + 1] if index + 1 < len(ids) else None,
+        )
+        for index, id in enumerate(ids)
+    ]
+
+
+_WORDS = "move the card to review after the tests pass and ask for feedback".split()
+
+
+def _sentence(rng: random.Random):
+    return " ".join(rng.choices(_WORDS, k=rng.randint(4, 10)))
+
+
+def create_database(
+    database_url: str,
+    config: DatasetConfig,
+    ordering_backend: Literal["linked_list", "rank"] = "linked_list",
+):
+    """drops every table of the database, creates them again and generates the dataset with its
+    orders stored in the given backend"""
+
+    params = get_db_params(database_url, False)
+    Base.metadata.drop_all(bind=params["engine"])
+    init_database(params["engine"])
+
+    with params["session"]() as db:
+        counts = generate(db, config)
+        migrate_orders_to_backend(db, ordering_backend)
+        db.commit()
+
+    params["engine"].dispose()
+    return counts
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    defaults = DatasetConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(value), default=value
+        )
+
+
+def parse_config(args: argparse.Namespace):
+    return DatasetConfig(
+        **{name: getattr(args, name) for name in asdict(DatasetConfig())}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument(
+        "--ordering-backend", choices=["linked_list", "rank"], default="linked_list"
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    counts = create_database(
+        args.database_url, parse_config(args), args.ordering_backend
+    )
+    for table, count in counts.items():
+        print(f"{table:>32}: {count}")
+
+
+if __name__ == "__main__":
+    main()
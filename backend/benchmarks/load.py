@@ -0,0 +1,490 @@
+"""runs the load test scenarios against a local uvicorn and stores their latencies and query counts
+as json, so the results of different commits can be compared
+
+    python -m benchmarks.load --database-url sqlite:///benchmark.db --workers 2 \\
+        --set FAST_JSON_RESPONSES=true
+
+the dataset is generated into the database first (see benchmarks.data, it takes the same
+arguments) and uvicorn is started on it with the --set settings. with --url the scenarios run
+against a server that is already running on a generated dataset instead. the query counts are read
+from the Server-Timing header, so they need QUERY_TIMING_ENABLED
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from benchmarks.data import (
+    BENCHMARK_PASSWORD,
+    DatasetConfig,
+    add_arguments,
+    create_database,
+    parse_config,
+)
+from config import settings as app_settings
+
+_SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+_RESULTS_DIRECTORY = Path(__file__).parent / "results"
+
+
+@dataclass
+class Sample:
+    status_code: int
+    # in milliseconds
+    latency: float
+    # None when the server doesn't send the Server-Timing header
+    queries: int | None
+
+
+@dataclass
+class Project:
+    id: int
+    # the token of a user of the project
+    token: str
+    # the todo items of each category in their order
+    categories: dict[int, list[int]] = field(default_factory=dict)
+    tags: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Dataset:
+    usernames: list[str]
+    projects: list[Project]
+
+
+type Scenario = Callable[
+    [httpx.AsyncClient, Dataset, list[Project], random.Random],
+    Awaitable[httpx.Response],
+]
+
+
+async def board_load(
+    client: httpx.AsyncClient,
+    dataset: Dataset,
+    projects: list[Project],
+    rng: random.Random,
+):
+    """loads the ordered board of a project, like opening it in the browser"""
+
+    project = rng.choice(projects)
+    return await client.get(
+        "/todo-categories/",
+        params={"project_id": project.id, "ordered": True},
+        headers=_auth_header(project.token),
+    )
+
+
+async def drag_and_drop(
+    client: httpx.AsyncClient,
+    dataset: Dataset,
+    projects: list[Project],
+    rng: random.Random,
+):
+    """moves an item to a random position of a random category of its board
+
+    every worker moves the items of its own projects, so the positions it sends are up to date
+    """
+
+    project = rng.choice(projects)
+    todo_id = rng.choice([id for ids in project.categories.values() for id in ids])
+    category_id = rng.choice(list(project.categories))
+    for ids in project.categories.values():
+        if todo_id in ids:
+            ids.remove(todo_id)
+
+    items = project.categories[category_id]
+    index = rng.randint(0, len(items))
+    response = await client.patch(
+        f"/todo-items/{todo_id}",
+        json={
+            "order": {
+                "left_id": items[index - 1] if index > 0 else None,
+                "right_id": items[index] if index < len(items) else None,
+                "new_category_id": category_id,
+            }
+        },
+        headers=_auth_header(project.token),
+    )
+
+    if response.status_code == 200:
+        items.insert(index, todo_id)
+    else:
+        await _load_board(client, project)
+
+    return response
+
+
+async def tag_search(
+    client: httpx.AsyncClient,
+    dataset: Dataset,
+    projects: list[Project],
+    rng: random.Random,
+):
+    """searches the items of a project by one of its tags"""
+
+    project = rng.choice([project for project in projects if project.tags])
+    return await client.get(
+        "/tags/",
+        params={"name": rng.choice(project.tags), "project_id": project.id},
+        headers=_auth_header(project.token),
+    )
+
+
+async def login_storm(
+    client: httpx.AsyncClient,
+    dataset: Dataset,
+    projects: list[Project],
+    rng: random.Random,
+):
+    """logs in as a random user, every login hashes the password with bcrypt"""
+
+    return await client.post(
+        "/oauth/token",
+        data={
+            "username": rng.choice(dataset.usernames),
+            "password": BENCHMARK_PASSWORD,
+        },
+    )
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "board_load": board_load,
+    "drag_and_drop": drag_and_drop,
+    "tag_search": tag_search,
+    "login_storm": login_storm,
+}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    dataset: Dataset,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    seed: int,
+):
+    """sends `requests` requests of the scenario from `concurrency` workers, every worker gets its
+    own share of the projects
+    """
+
+    concurrency = max(1, min(concurrency, len(dataset.projects)))
+    samples: list[Sample] = []
+    remaining = requests
+
+    async def worker(index: int):
+        nonlocal remaining
+
+        rng = random.Random(seed + index)
+        projects = dataset.projects[index::concurrency]
+
+        while remaining > 0:
+            remaining -= 1
+            started_at = time.perf_counter()
+            response = await scenario(client, dataset, projects, rng)
+            latency = (time.perf_counter() - started_at) * 1000
+
+            queries = _SERVER_TIMING_QUERIES.search(
+                response.headers.get("Server-Timing", "")
+            )
+            samples.append(
+                Sample(
+                    response.status_code,
+                    latency,
+                    int(queries.group(1)) if queries is not None else None,
+                )
+            )
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return _summarize(samples, concurrency, time.perf_counter() - started_at)
+
+
+def _summarize(samples: list[Sample], concurrency: int, duration: float):
+    latencies = sorted(sample.latency for sample in samples)
+    queries = [sample.queries for sample in samples if sample.queries is not None]
+
+    return {
+        "requests": len(samples),
+        "concurrency": concurrency,
+        "errors": sum(1 for sample in samples if sample.status_code >= 400),
+        "statuses": dict(
+            Counter(str(sample.status_code) for sample in samples).most_common()
+        ),
+        "duration_seconds": round(duration, 3),
+        "requests_per_second": round(len(samples) / duration, 2),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 3),
+            **{
+                f"p{percentile}": round(_percentile(latencies, percentile), 3)
+                for percentile in (50, 90, 95, 99)
+            },
+            "max": round(latencies[-1], 3),
+        },
+        "queries": (
+            {
+                "mean": round(statistics.fmean(queries), 2),
+                "max": max(queries),
+                "total": sum(queries),
+            }
+            if len(queries) > 0
+            else None
+        ),
+    }
+
+
+def _percentile(sorted_values: list[float], percentile: int):
+    # the nearest rank, so the percentile is always one of the measured latencies
+    index = max(0, -(-len(sorted_values) * percentile // 100) - 1)
+    return sorted_values[index]
+
+
+async def load_dataset(client: httpx.AsyncClient, usernames: list[str]):
+    """logs every user in and loads the boards of their projects"""
+
+    tokens: dict[str, str] = {}
+    for username in usernames:
+        response = await client.post(
+            "/oauth/token",
+            data={"username": username, "password": BENCHMARK_PASSWORD},
+        )
+        response.raise_for_status()
+        tokens[username] = response.json()["access_token"]
+
+    projects: dict[int, Project] = {}
+    for token in tokens.values():
+        response = await client.get("/projects/", headers=_auth_header(token))
+        response.raise_for_status()
+        for project in response.json():
+            projects.setdefault(project["id"], Project(project["id"], token))
+
+    for project in projects.values():
+        await _load_board(client, project)
+
+    return Dataset(usernames, sorted(projects.values(), key=lambda x: x.id))
+
+
+async def _load_board(client: httpx.AsyncClient, project: Project):
+    response = await client.get(
+        "/todo-categories/",
+        params={"project_id": project.id, "ordered": True},
+        headers=_auth_header(project.token),
+    )
+    response.raise_for_status()
+
+    project.categories = {
+        category["id"]: [item["id"] for item in category["items"]]
+        for category in response.json()
+    }
+    project.tags = sorted(
+        {
+            tag["name"]
+            for category in response.json()
+            for item in category["items"]
+            for tag in item["tags"]
+        }
+    )
+
+
+def _auth_header(token: str):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def start_server(database_url: str, workers: int, settings: dict[str, str]):
+    """starts uvicorn with the app of main.py on a free port"""
+
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        port = free_socket.getsockname()[1]
+
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=Path(__file__).parent.parent,
+        env=os.environ | settings | {"SQLALCHEMY_DATABASE_URL": database_url},
+    )
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("the server exited before it started")
+        try:
+            if httpx.get(f"{url}/openapi.json").status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError("the server didn't start in 60 seconds")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace, url: str, config: DatasetConfig):
+    results: dict[str, Any] = {}
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        dataset = await load_dataset(
+            client, [f"user{id}" for id in range(1, config.users + 1)]
+        )
+
+        for name in args.scenarios:
+            requests = args.login_requests if name == "login_storm" else args.requests
+            results[name] = await run_scenario(
+                client,
+                dataset,
+                SCENARIOS[name],
+                requests,
+                args.concurrency,
+                config.seed,
+            )
+            _print_result(name, results[name])
+
+    return results
+
+
+def _print_result(name: str, result: dict[str, Any]):
+    latency = result["latency_ms"]
+    queries = result["queries"]
+    print(
+        f"{name:>14}: {result['requests_per_second']:8.1f} req/s, "
+        f"p50 {latency['p50']:8.2f} ms, p95 {latency['p95']:8.2f} ms, "
+        f"p99 {latency['p99']:8.2f} ms, "
+        f"{queries['mean'] if queries is not None else '-':>6} queries, "
+        f"{result['errors']} errors"
+    )
+
+
+def _parse_setting(value: str):
+    name, separator, setting = value.partition("=")
+    if separator == "":
+        raise argparse.ArgumentTypeError("the settings are given as NAME=VALUE")
+    return name, setting
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--database-url")
+    target.add_argument("--url", help="a running server on a generated dataset")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--set",
+        type=_parse_setting,
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="a setting of the server (see config.py)",
+    )
+    parser.add_argument(
+        "--scenarios",
+        type=lambda value: value.split(","),
+        default=list(SCENARIOS),
+        help=f"comma separated, of {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--output", type=Path)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name}")
+
+    config = parse_config(args)
+    settings = dict(args.set)
+    process = None
+
+    if args.url is not None:
+        url = args.url
+    else:
+        print(f"generating the dataset into {args.database_url}")
+        # the server doesn't convert the orders on startup, so they're stored in its backend
+        create_database(
+            args.database_url,
+            config,
+            settings.get("ORDERING_BACKEND", app_settings.ORDERING_BACKEND),
+        )
+        process, url = start_server(args.database_url, args.workers, settings)
+
+    try:
+        scenarios = asyncio.run(run(args, url, config))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    commit = _git_commit()
+    created_date = datetime.datetime.now(datetime.UTC)
+    output = args.output or _RESULTS_DIRECTORY / (
+        f"{created_date:%Y%m%dT%H%M%S}-{(commit or 'unknown')[:12]}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "commit": commit,
+                "created_date": created_date.isoformat(),
+                "python": platform.python_version(),
+                "server": {
+                    "url": url if args.url is not None else None,
+                    "workers": args.workers if args.url is None else None,
+                    "settings": settings,
+                },
+                "dataset": asdict(config),
+                "scenarios": scenarios,
+            },
+            indent=2,
+        )
+    )
+    print(f"results are stored in {output}")
+
+
+if __name__ == "__main__":
+    main()
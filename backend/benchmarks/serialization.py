@@ -0,0 +1,143 @@
+"""times how long rendering the board of a project takes with FastAPI's default json rendering and
+with FAST_JSON_RESPONSES
+
+    python -m benchmarks.serialization --items 1000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import Callable
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+
+# the relationships of the models are resolved once every model is imported
+from db.models import (
+    project_user_association,
+    todo_category_project_association,
+    todo_item_tag_association,
+    user_project_permission,
+)
+from db.models.project import Project
+from db.models.tag import Tag
+from db.models.todo_category import TodoCategory
+from db.models.todo_category_action import Action, TodoCategoryAction
+from db.models.todo_category_order import TodoCategoryOrder
+from db.models.todo_item import TodoItem
+from db.models.todo_item_dependency import TodoItemDependency
+from db.models.todo_item_order import TodoItemOrder
+from db.models.user import User
+from db.schemas.todo_category import TodoCategory as TodoCategorySchema
+
+
+def build_board(items: int, categories: int):
+    """builds the categories of a board with their items in memory, like the board route loads
+    them (every item has tags, a dependency, an order and a user who marked it as done)
+    """
+
+    user = User(id=1, username="benchmark")
+    project = Project(id=1, title="benchmark", description="benchmark")
+    tags = [Tag(id=id, name=f"tag {id}", project_id=project.id) for id in range(1, 6)]
+
+    board: list[TodoCategory] = []
+    for category_id in range(1, categories + 1):
+        category = TodoCategory(
+            id=category_id,
+            title=f"category {category_id}",
+            description="description of the category",
+            projects=[project],
+            actions=[TodoCategoryAction(action=Action.AUTO_MARK_AS_DONE)],
+            orders=[
+                TodoCategoryOrder(
+                    project_id=project.id,
+                    category_id=category_id,
+                    left_id=category_id - 1 if category_id > 1 else None,
+                    right_id=category_id + 1 if category_id < categories else None,
+                )
+            ],
+        )
+        board.append(category)
+
+    todo_items: list[TodoItem] = []
+    for todo_id in range(1, items + 1):
+        todo = TodoItem(
+            id=todo_id,
+            title=f"todo item {todo_id}",
+            description="a description that is about as long as the real ones are",
+            category_id=board[todo_id % categories].id,
+            comments_count=todo_id % 7,
+            marked_as_done_by_user_id=user.id if todo_id % 3 == 0 else None,
+            marked_as_done_by=user if todo_id % 3 == 0 else None,
+            tags=[tags[todo_id % 5], tags[(todo_id + 1) % 5]],
+            order=TodoItemOrder(todo_id=todo_id, left_id=None, right_id=None),
+        )
+        # is_done is a column property, it's loaded from the database in the routes
+        todo.__dict__["is_done"] = todo.marked_as_done_by_user_id is not None
+        if len(todo_items) > 0:
+            todo.dependencies = [
+                TodoItemDependency(
+                    id=todo_id,
+                    todo_id=todo_id,
+                    dependant_todo_id=todo_items[-1].id,
+                    dependant_todo=todo_items[-1],
+                )
+            ]
+        todo_items.append(todo)
+        board[todo_id % categories].items.append(todo)
+
+    return board
+
+
+def render_default(board: list[TodoCategory]) -> bytes:
+    """what FastAPI does with the result of a route that has a response_model"""
+
+    field = create_response_field(name="response", type_=list[TodoCategorySchema])
+    content = asyncio.run(serialize_response(field=field, response_content=board))
+    return JSONResponse(content).body
+
+
+def render_fast(board: list[TodoCategory]) -> bytes:
+    """what DbRoute does with FAST_JSON_RESPONSES"""
+
+    adapter = TypeAdapter(list[TodoCategorySchema])
+    return adapter.dump_json(
+        adapter.validate_python(board, from_attributes=True), by_alias=True
+    )
+
+
+def measure(render: Callable[[list[TodoCategory]], bytes], board, repeat: int):
+    timings: list[float] = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        render(board)
+        timings.append((time.perf_counter() - started_at) * 1000)
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    board = build_board(args.items, args.categories)
+    # both paths must send the same bytes, otherwise the comparison is meaningless
+    assert render_default(board) == render_fast(board)
+
+    print(f"board of {args.items} items in {args.categories} categories")
+    for name, render in [("default", render_default), ("fast", render_fast)]:
+        timings = measure(render, board, args.repeat)
+        print(
+            f"{name:>8}: median {statistics.median(timings):7.2f} ms, "
+            f"min {min(timings):7.2f} ms, {len(render(board)) / 1024:.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
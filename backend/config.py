@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,6 +14,113 @@ class Settings(BaseSettings):
     IS_SQLALCHEMY_LOG_ENABLED: bool
     ALLOW_ORIGIN_REGEX: str | None = None
 
+    # the connection pool of the engines (sqlite in-memory databases don't use a pool), psycopg is
+    # used for postgresql:// urls
+    SQLALCHEMY_POOL_SIZE: int = 5
+    SQLALCHEMY_MAX_OVERFLOW: int = 10
+    SQLALCHEMY_POOL_TIMEOUT: float = 30
+    # connections older than this many seconds are replaced, -1 keeps them forever
+    SQLALCHEMY_POOL_RECYCLE: int = 1800
+    SQLALCHEMY_POOL_PRE_PING: bool = True
+    # the number of compiled statements that each engine caches
+    SQLALCHEMY_QUERY_CACHE_SIZE: int = 500
+
+    # the read only routes (lists of the board) query this replica of the database if it's set,
+    # clients that wrote something in the last READ_YOUR_WRITES_SECONDS keep reading from the primary
+    # so they see their own changes while the replica catches up (the time of the write is sent to
+    # the client in a cookie and a header, which it sends back)
+    SQLALCHEMY_READ_REPLICA_URL: str | None = None
+    SQLALCHEMY_ASYNC_READ_REPLICA_URL: str | None = None
+    READ_YOUR_WRITES_SECONDS: float = 5
+
+    # the project events are fanned out in this process by default, with multiple workers set this
+    # to the "module:ClassName" of an EventBroker subclass that shares them between the workers
+    EVENT_BROKER: str | None = None
+    # a subscriber that has this many undelivered events is told to resync instead
+    EVENT_SUBSCRIBER_MAX_QUEUED: int = 100
+    EVENT_STREAM_KEEPALIVE_SECONDS: float = 15
+
+    # the deletes are kept in the change log of the sync route for this many days (they're dropped
+    # by `python -m db.maintenance compact-change-log`), clients that haven't synced for longer have
+    # to load everything again
+    CHANGE_LOG_TOMBSTONE_RETENTION_DAYS: float = 30
+
+    # pragmas of the sqlite connections
+    SQLITE_JOURNAL_MODE: Literal["WAL", "DELETE", "TRUNCATE", "MEMORY"] = "WAL"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL"] = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    # negative values are in KiB, positive values are in pages
+    SQLITE_CACHE_SIZE: int = -64 * 1024
+
+    # when enabled the sync routes and cruds run in the greenlet of an AsyncSession and only their
+    # queries are awaited on an AsyncEngine (the cruds aren't async), so a request doesn't take a
+    # thread of the threadpool while it waits for the database. the async url must use an async
+    # driver (it defaults to SQLALCHEMY_DATABASE_URL, which works for postgresql, sqlite needs
+    # sqlite+aiosqlite://)
+    SQLALCHEMY_ASYNC: bool = False
+    SQLALCHEMY_ASYNC_DATABASE_URL: str | None = None
+
+    # the responses of these media types ("type/*" matches every subtype) that are at least
+    # COMPRESSION_MINIMUM_SIZE bytes are compressed, with zstd if the zstandard package is installed
+    # and the client accepts it, otherwise with gzip
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_MEDIA_TYPES: list[str] = ["application/json", "text/plain", "text/html"]
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # the sql statements of each request are counted and timed, the totals are sent in the
+    # Server-Timing header and logged (at INFO) together with the slowest statements
+    QUERY_TIMING_ENABLED: bool = True
+    QUERY_TIMING_SLOWEST_COUNT: int = 3
+
+    # the statements that take at least this many milliseconds are logged (at WARNING) and kept in
+    # the last SLOW_QUERY_LOG_SIZE entries of GET /admin/slow-queries, None turns it off. with
+    # SLOW_QUERY_EXPLAIN the plans of the slow selects are captured too, with
+    # SLOW_QUERY_EXPLAIN_ANALYZE postgresql also measures them (EXPLAIN ANALYZE runs the select a
+    # second time, which doubles the time of the slow queries)
+    SLOW_QUERY_THRESHOLD_MS: float | None = 500
+    SLOW_QUERY_EXPLAIN: bool = False
+    SLOW_QUERY_EXPLAIN_ANALYZE: bool = False
+    SLOW_QUERY_LOG_SIZE: int = 100
+
+    # the /admin routes require this bearer token, they're unusable while it's not set
+    ADMIN_TOKEN: str | None = None
+
+    # the requests that send ADMIN_TOKEN in the X-Profile header (or the profile query parameter) run
+    # under cProfile, the last PROFILING_MAX_PROFILES profiles are served by GET /admin/profiles.
+    # one request is profiled at a time, and its profile includes what the other requests ran
+    PROFILING_ENABLED: bool = False
+    PROFILING_MAX_PROFILES: int = 20
+
+    # GET /metrics serves the request, pool, password hashing, cache and compression metrics in the
+    # prometheus text format, scrapers have to send METRICS_TOKEN as a bearer token when it's set
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str | None = None
+
+    # the json responses are validated and dumped to bytes by pydantic directly, skipping FastAPI's
+    # second validation and the json module (the routes read it when they're created)
+    FAST_JSON_RESPONSES: bool = False
+
+    # "linked_list" keeps the order of items in their left_id/right_id columns,
+    # "rank" keeps it in sortable rank keys (the stored orders are converted by
+    # `python -m db.maintenance migrate-orders`)
+    ORDERING_BACKEND: Literal["linked_list", "rank"] = "linked_list"
+    # rank keys longer than this are rebalanced in the background
+    RANK_MAX_LENGTH: int = 24
+
+    # the bcrypt work factor of new password hashes, existing hashes are upgraded on login
+    BCRYPT_ROUNDS: int = 12
+    # hashing runs on its own pool, requests are rejected when this many of them are waiting
+    PASSWORD_HASHING_MAX_WORKERS: int = 4
+    PASSWORD_HASHING_MAX_QUEUE: int = 64
+
+    # the authenticated users are cached by their token, so most requests don't decode the token or
+    # query the user again
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_CACHE_TTL_SECONDS: float = 60
+    AUTH_CACHE_MAX_SIZE: int = 10_000
+
     model_config = SettingsConfigDict(env_file=".env")
 
 
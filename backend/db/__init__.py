@@ -2,12 +2,41 @@ from config import settings
 from db.db import get_db_params, init_database
 
 params = get_db_params(
-    settings.SQLALCHEMY_DATABASE_URL, settings.IS_SQLALCHEMY_LOG_ENABLED
+    settings.SQLALCHEMY_DATABASE_URL,
+    settings.IS_SQLALCHEMY_LOG_ENABLED,
+    (
+        settings.SQLALCHEMY_ASYNC_DATABASE_URL or settings.SQLALCHEMY_DATABASE_URL
+        if settings.SQLALCHEMY_ASYNC
+        else None
+    ),
 )
 
 engine = params["engine"]
 SessionLocal = params["session"]
+AsyncSessionLocal = params["async_session"]
+
+# None when there is no replica, the reads go to the primary then
+read_params = (
+    get_db_params(
+        settings.SQLALCHEMY_READ_REPLICA_URL,
+        settings.IS_SQLALCHEMY_LOG_ENABLED,
+        (
+            settings.SQLALCHEMY_ASYNC_READ_REPLICA_URL
+            or settings.SQLALCHEMY_READ_REPLICA_URL
+            if settings.SQLALCHEMY_ASYNC
+            else None
+        ),
+    )
+    if settings.SQLALCHEMY_READ_REPLICA_URL is not None
+    else None
+)
+
+ReadSessionLocal = read_params["session"] if read_params is not None else None
+ReadAsyncSessionLocal = (
+    read_params["async_session"] if read_params is not None else None
+)
 
 
 def init_db():
+    # only the schema is created here, the data is maintained by `python -m db.maintenance`
     init_database(engine)
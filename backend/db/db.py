@@ -1,43 +1,241 @@
 import logging
-from typing import TypedDict
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypedDict
 
-from sqlalchemy import Engine, create_engine, event
+from sqlalchemy import Engine, create_engine, event, inspect, make_url, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.schema import CreateColumn
 
-# pylint: disable=unsubscriptable-object
-DbPrams = TypedDict("DbPrams", {"session": sessionmaker[Session], "engine": Engine})
+from config import settings
+from db.utils.slow_query_log import is_slow_query, record_slow_query
 
+# sessions of the async engine keep a sync engine of the same database in their info, for the work
+# that is done outside of the request (for example in background threads)
+SYNC_BIND_INFO_KEY = "sync_bind"
 
-def get_db_params(connection_string: str, enable_logging: bool) -> DbPrams:
-    is_sqlite = connection_string.startswith("sqlite:///")
+_QUERY_START_TIMES_INFO_KEY = "query_start_times"
 
-    engine_kwargs = {
-        "url": connection_string,
-        "echo": enable_logging,
-    }
 
-    if is_sqlite:
-        engine_kwargs["connect_args"] = {"check_same_thread": False}
+class QueryStats:
+    """the sql statements that were executed while tracking the queries (see `track_queries`)"""
+
+    def __init__(self, slowest_count: int):
+        self.count = 0
+        # in seconds
+        self.duration = 0.0
+        # the (duration, statement) of the slowest statements, the slowest one first
+        self.slowest: list[tuple[float, str]] = []
+        self._slowest_count = slowest_count
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+
+        if len(self.slowest) < self._slowest_count or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda slow_query: slow_query[0], reverse=True)
+            del self.slowest[self._slowest_count :]
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries(slowest_count: int = 3) -> Iterator[QueryStats]:
+    """collects the statements that are executed inside it, including the ones of the sync routes
+    that run in the threadpool (they get a copy of the context)
+    """
+
+    stats = QueryStats(slowest_count)
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
 
-    engine = create_engine(**engine_kwargs)
+def get_tracked_queries():
+    """the stats of the innermost `track_queries`, None if the queries aren't tracked"""
+
+    return _query_stats.get()
+
+
+# pylint: disable=unsubscriptable-object
+DbPrams = TypedDict(
+    "DbPrams",
+    {
+        "session": sessionmaker[Session],
+        "engine": Engine,
+        "async_session": async_sessionmaker[AsyncSession] | None,
+        "async_engine": AsyncEngine | None,
+    },
+)
+
+
+def get_db_params(
+    connection_string: str,
+    enable_logging: bool,
+    async_connection_string: str | None = None,
+) -> DbPrams:
+    """
+    :param async_connection_string: if provided an async engine is created for it as well
+    """
+
+    engine = create_engine(
+        **_get_engine_kwargs(connection_string, enable_logging),
+    )
     session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
     if enable_logging:
         logging.getLogger("sqlalchemy.engine").setLevel(logging.DEBUG)
 
-    if is_sqlite:
+    _configure_connections(engine)
+    _instrument_queries(engine)
+
+    async_engine = None
+    async_session = None
+
+    if async_connection_string is not None:
+        async_engine = create_async_engine(
+            **_get_engine_kwargs(async_connection_string, enable_logging)
+        )
+        _configure_connections(async_engine.sync_engine)
+        _instrument_queries(async_engine.sync_engine)
+        async_session = async_sessionmaker(
+            async_engine, autoflush=False, info={SYNC_BIND_INFO_KEY: engine}
+        )
+
+    return {
+        "session": session,
+        "engine": engine,
+        "async_session": async_session,
+        "async_engine": async_engine,
+    }
+
+
+def _get_engine_kwargs(connection_string: str, enable_logging: bool) -> dict[str, Any]:
+    url = make_url(connection_string)
+
+    if url.drivername in ("postgresql", "postgres"):
+        # psycopg (3) is the installed driver, sqlalchemy would default to psycopg2 otherwise
+        url = url.set(drivername="postgresql+psycopg")
+
+    kwargs: dict[str, Any] = {
+        "url": url,
+        "echo": enable_logging,
+        "query_cache_size": settings.SQLALCHEMY_QUERY_CACHE_SIZE,
+    }
+
+    if url.get_backend_name() == "sqlite":
+        kwargs["connect_args"] = {"check_same_thread": False}
+
+        if url.database in (None, "", ":memory:"):
+            # in-memory databases live in a single connection, so they don't have a pool to tune
+            return kwargs
+
+    return kwargs | {
+        "pool_size": settings.SQLALCHEMY_POOL_SIZE,
+        "max_overflow": settings.SQLALCHEMY_MAX_OVERFLOW,
+        "pool_timeout": settings.SQLALCHEMY_POOL_TIMEOUT,
+        "pool_recycle": settings.SQLALCHEMY_POOL_RECYCLE,
+        "pool_pre_ping": settings.SQLALCHEMY_POOL_PRE_PING,
+    }
+
+
+def _configure_connections(engine: Engine):
+    if engine.dialect.name != "sqlite":
+        return
+
+    # the listener is registered on this engine only, registering it on the `Engine` class would
+    # run it once for every engine that was ever created (tests, replicas, ...)
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
         # https://docs.sqlalchemy.org/en/20/dialects/sqlite.html#foreign-key-support
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.close()
 
-        @event.listens_for(Engine, "connect")
-        def set_sqlite_pragma(dbapi_connection, connection_record):
-            cursor = dbapi_connection.cursor()
-            cursor.execute("PRAGMA foreign_keys=ON")
-            cursor.close()
 
-    return {"session": session, "engine": engine}
+def _instrument_queries(engine: Engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_timer(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        connection.info.setdefault(_QUERY_START_TIMES_INFO_KEY, []).append(
+            time.perf_counter()
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query(connection, cursor, statement, parameters, context, executemany):
+        start_times: list[float] = connection.info.get(_QUERY_START_TIMES_INFO_KEY, [])
+        if len(start_times) == 0:
+            return
+
+        duration = time.perf_counter() - start_times.pop()
+
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+
+        if is_slow_query(duration):
+            record_slow_query(connection, statement, parameters, executemany, duration)
+
+    @event.listens_for(engine, "handle_error")
+    def discard_query_timer(exception_context):
+        # after_cursor_execute isn't called for the statements that failed
+        connection = exception_context.connection
+        if connection is not None and not connection.closed:
+            start_times = connection.info.get(_QUERY_START_TIMES_INFO_KEY, [])
+            if len(start_times) != 0:
+                start_times.pop()
 
 
 def init_database(engine: Engine):
     from db.models.base import Base
 
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns_and_indexes(engine)
+
+
+def _add_missing_columns_and_indexes(engine: Engine):
+    # create_all doesn't alter existing tables, so the new columns and indexes are added here.
+    # only columns that are nullable or have a server default can be added this way
+    from db.models.base import Base
+
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {
+                column["name"] for column in inspector.get_columns(table.name)
+            }
+            missing_columns = [
+                column
+                for column in table.columns
+                if column.name not in existing_columns
+            ]
+
+            for column in missing_columns:
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+                        f"{CreateColumn(column).compile(dialect=engine.dialect)}"
+                    )
+                )
+
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
@@ -0,0 +1,96 @@
+"""maintenance of the stored data, run it once per deploy (and the compaction on a schedule)
+instead of on the start of every worker
+
+    python -m db.maintenance                      # runs every task
+    python -m db.maintenance compact-change-log   # runs the given tasks only
+
+- migrate-orders: converts the stored orders to ORDERING_BACKEND, run it before the app is started
+  with a different backend
+- recompute-counters: repairs the done/pending counters of the projects and the comments count of
+  the todo items (and fills them when the columns are new)
+- compact-change-log: keeps the latest change of each entity and drops the deletes that are older
+  than CHANGE_LOG_TOMBSTONE_RETENTION_DAYS
+
+the tasks run in a single transaction on SQLALCHEMY_DATABASE_URL
+"""
+
+import argparse
+from collections.abc import Callable, Sequence
+from datetime import timedelta
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from db import SessionLocal
+
+# the relationships of the models are resolved once every model is imported, the app imports them
+# through its routes
+from db.models import (  # pylint: disable=unused-import
+    project,
+    project_user_association,
+    tag,
+    todo_category,
+    todo_category_action,
+    todo_category_order,
+    todo_category_project_association,
+    todo_item,
+    todo_item_comments,
+    todo_item_dependency,
+    todo_item_order,
+    todo_item_tag_association,
+    user,
+    user_project_permission,
+)
+from db.utils.change_log import compact_change_log
+from db.utils.order_migration import migrate_orders_to_backend
+from db.utils.project_counters import recompute_project_counters
+from db.utils.todo_item_comment_crud import recompute_comments_count
+
+
+def _migrate_orders(db: Session):
+    migrate_orders_to_backend(db, settings.ORDERING_BACKEND)
+
+
+def _recompute_counters(db: Session):
+    recompute_project_counters(db)
+    recompute_comments_count(db)
+
+
+def _compact_change_log(db: Session):
+    compact_change_log(db, timedelta(days=settings.CHANGE_LOG_TOMBSTONE_RETENTION_DAYS))
+
+
+TASKS: dict[str, Callable[[Session], None]] = {
+    "migrate-orders": _migrate_orders,
+    "recompute-counters": _recompute_counters,
+    "compact-change-log": _compact_change_log,
+}
+
+
+def run_tasks(db: Session, tasks: Sequence[str]):
+    """runs the given tasks in the order of `TASKS` and commits them together"""
+
+    for name, task in TASKS.items():
+        if name in tasks:
+            task(db)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("tasks", nargs="*", choices=list(TASKS))
+    args = parser.parse_args()
+    tasks = args.tasks or list(TASKS)
+
+    with SessionLocal() as db:
+        run_tasks(db, tasks)
+
+    for name in TASKS:
+        if name in tasks:
+            print(f"{name}: done")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,5 +20,7 @@ class BasesWithCreatedDate(Base):
 class BaseOrderedItem(DeclarativeBase):
     __abstract__ = True
 
+    id: Mapped[int]
     left_id: Mapped[int | None]
     right_id: Mapped[int | None]
+    rank: Mapped[str | None]
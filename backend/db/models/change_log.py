@@ -0,0 +1,104 @@
+import datetime
+import enum
+
+from sqlalchemy import DateTime, Enum, Index, Integer, event, func, insert, select
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.models.base import Base
+
+
+class ChangedEntity(enum.StrEnum):
+    PROJECT = enum.auto()
+    TODO_CATEGORY = enum.auto()
+    TODO_ITEM = enum.auto()
+    TAG = enum.auto()
+    TODO_ITEM_COMMENT = enum.auto()
+
+
+class ChangeOperation(enum.StrEnum):
+    UPSERT = enum.auto()
+    DELETE = enum.auto()
+
+
+def _utc_now():
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+class ChangeLogEntry(Base):
+    """a change of an entity as seen from one project, written by the cruds (see db.utils.change_log)
+
+    the entries don't reference the changed rows, so they outlive the entities they point to and
+    are removed by the compaction instead
+    """
+
+    __tablename__ = "change_log"
+
+    # the clients sync from the version they saw last, it's given by `ChangeLogVersion` in the
+    # order the entries are committed
+    version: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    entity_type: Mapped[ChangedEntity] = mapped_column(
+        Enum(ChangedEntity, validate_strings=True)
+    )
+    entity_id: Mapped[int] = mapped_column(Integer())
+    operation: Mapped[ChangeOperation] = mapped_column(
+        Enum(ChangeOperation, validate_strings=True)
+    )
+    project_id: Mapped[int] = mapped_column(Integer())
+    # set when only this user should see the change (the user lost access to the project)
+    user_id: Mapped[int | None] = mapped_column(Integer(), nullable=True)
+    created_date: Mapped[datetime.datetime] = mapped_column(
+        DateTime(), default=_utc_now
+    )
+
+    __table_args__ = (
+        Index("ix_change_log_project_id_version", "project_id", "version"),
+        Index("ix_change_log_user_id_version", "user_id", "version"),
+        Index(
+            "ix_change_log_entity",
+            "entity_type",
+            "entity_id",
+            "project_id",
+            "user_id",
+        ),
+    )
+
+
+class ChangeLogVersion(Base):
+    """the last version given to a change log entry, the table has a single row
+
+    the writers increment it right before they commit, which locks the row until the commit. so a
+    change with a lower version can't be committed after a client synced past it (an autoincrement
+    id follows the order of the inserts instead)
+    """
+
+    __tablename__ = "change_log_version"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    version: Mapped[int] = mapped_column(Integer())
+
+
+@event.listens_for(ChangeLogVersion.__table__, "after_create")
+def _insert_version_row(target, connection, **kwargs):
+    # continues from the entries of a log that was written before the table existed
+    connection.execute(
+        insert(target).values(
+            id=1,
+            version=select(
+                func.coalesce(func.max(ChangeLogEntry.version), 0)
+            ).scalar_subquery(),
+        )
+    )
+
+
+class ChangeLogCompaction(Base):
+    """the compaction removed tombstones up to `version`, clients that synced before it have to
+    load everything again
+    """
+
+    __tablename__ = "change_log_compaction"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    version: Mapped[int] = mapped_column(Integer())
+    created_date: Mapped[datetime.datetime] = mapped_column(
+        DateTime(), default=_utc_now
+    )
@@ -1,7 +1,6 @@
 from typing import TYPE_CHECKING, List
 
-from sqlalchemy import String, func, select
-from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from db.models.base import BasesWithCreatedDate
@@ -36,50 +35,16 @@ class Project(BasesWithCreatedDate):
         back_populates="project", viewonly=True
     )
 
-    # TODO: i dont know about the performance implications of these hybrid queries... like does sqlalchemy remove the need to query the db again if the object is already there?
-    @hybrid_property
-    def done_todos_count(self):  # type: ignore
-        done_todos = 0
-        for todo_category in self.todo_categories:
-            done_todos += len(
-                list(filter(lambda todo_item: todo_item.is_done, todo_category.items))
-            )
-        return done_todos
-
-    @done_todos_count.expression
-    def done_todos_count(cls):
-        from db.models.todo_category import TodoCategory
-        from db.models.todo_item import TodoItem
-
-        return func.count(
-            select(Project)
-            .join(Project.todo_categories)
-            .join(TodoCategory.items)
-            .where(TodoItem.is_done == True, Project.id == cls.id)
-        ).label("done_todos")
-
-    @hybrid_property
-    def pending_todos_count(self):  # type: ignore
-        pending_todos = 0
-        for todo_category in self.todo_categories:
-            pending_todos += len(
-                list(
-                    filter(
-                        lambda todo_item: todo_item.is_done == False,
-                        todo_category.items,
-                    )
-                )
-            )
-        return pending_todos
-
-    @pending_todos_count.expression
-    def pending_todos_count(cls):
-        from db.models.todo_category import TodoCategory
-        from db.models.todo_item import TodoItem
-
-        return func.count(
-            select(Project)
-            .join(Project.todo_categories)
-            .join(TodoCategory.items)
-            .where(TodoItem.is_done == False, Project.id == cls.id)
-        ).label("pending_todos")
+    # maintained by the cruds that create, remove, move or (un)mark todo items and the ones that
+    # attach or detach categories (see db.utils.project_counters)
+    done_todos_count: Mapped[int] = mapped_column(
+        Integer(), nullable=False, default=0, server_default="0"
+    )
+    pending_todos_count: Mapped[int] = mapped_column(
+        Integer(), nullable=False, default=0, server_default="0"
+    )
+    # incremented by every crud that changes the project or its board (see db.utils.project_versions),
+    # the board and project routes use it as their ETag
+    version: Mapped[int] = mapped_column(
+        Integer(), nullable=False, default=0, server_default="0"
+    )
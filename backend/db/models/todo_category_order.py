@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import CheckConstraint, ForeignKey, UniqueConstraint
+from sqlalchemy import CheckConstraint, ForeignKey, Index, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from db.models.base import BaseOrderedItem, BasesWithCreatedDate
@@ -25,6 +25,7 @@ class TodoCategoryOrder(BasesWithCreatedDate, BaseOrderedItem):
     right_id: Mapped[int | None] = mapped_column(
         ForeignKey("todo_category.id", ondelete="CASCADE"), nullable=True
     )
+    rank: Mapped[str | None] = mapped_column(String(), nullable=True)
     category: Mapped["TodoCategory"] = relationship(
         foreign_keys=[category_id], single_parent=True, back_populates="orders"
     )
@@ -33,6 +34,7 @@ class TodoCategoryOrder(BasesWithCreatedDate, BaseOrderedItem):
         UniqueConstraint("project_id", "category_id"),
         UniqueConstraint("project_id", "left_id"),
         UniqueConstraint("project_id", "right_id"),
+        Index("ix_todo_category_order_project_id_rank", "project_id", "rank"),
         CheckConstraint("category_id != left_id"),
         CheckConstraint("category_id != right_id"),
         CheckConstraint("left_id != null and left_id != right_id"),
@@ -1,8 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, List, Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, String, func, null, select
-from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, column_property, mapped_column, relationship
 
 from db.models.base import BasesWithCreatedDate
@@ -59,15 +58,18 @@ class TodoItem(BasesWithCreatedDate):
         uselist=False,
         back_populates="done_todos",
     )
+    # maintained by todo_item_comment_crud, so the comments aren't loaded just to be counted
+    comments_count: Mapped[int] = mapped_column(
+        Integer(), nullable=False, default=0, server_default="0"
+    )
 
-    @hybrid_property
-    def comments_count(self):  # type: ignore
-        return len(self.comments)
-
-    @comments_count.expression
-    def comments_count(cls):
-        return func.count(
-            select(TodoItem)
-            .join(TodoItem.comments)
-            .where(TodoItemComment.todo_id == cls.id)
-        ).label("done_todos")
+    __table_args__ = (
+        # the todo items of a category are listed (and paginated) in the order of their id
+        Index("ix_todo_item_category_id_id", "category_id", "id"),
+        Index(
+            "ix_todo_item_category_id_marked_as_done_by_user_id",
+            "category_id",
+            "marked_as_done_by_user_id",
+        ),
+        {"sqlite_autoincrement": True},
+    )
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import CheckConstraint, ForeignKey
+from sqlalchemy import CheckConstraint, ForeignKey, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from db.models.base import BaseOrderedItem, BasesWithCreatedDate
@@ -22,6 +22,7 @@ class TodoItemOrder(BasesWithCreatedDate, BaseOrderedItem):
     right_id: Mapped[int | None] = mapped_column(
         ForeignKey("todo_item.id", ondelete="CASCADE"), nullable=True, unique=True
     )
+    rank: Mapped[str | None] = mapped_column(String(), nullable=True, index=True)
     todo: Mapped["TodoItem"] = relationship(
         foreign_keys=[todo_id], single_parent=True, back_populates="order"
     )
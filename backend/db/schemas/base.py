@@ -4,3 +4,4 @@ from pydantic import BaseModel
 class NullableOrderedItem(BaseModel):
     right_id: int | None
     left_id: int | None
+    rank: str | None = None
@@ -1,9 +1,8 @@
 import json
 from dataclasses import dataclass
 
-from pydantic import BaseModel, ConfigDict, Field, computed_field, field_validator
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator
 
-from db.models.base import Base
 from db.models.user_project_permission import Permission
 
 
@@ -75,32 +74,16 @@ class ProjectUpdateUserPermissions(ProjectBase, _Permissions):
     user_id: int
 
 
-class _UserProjectPermission(BaseModel):
-    permission: Permission
-
-    model_config = ConfigDict(from_attributes=True)
-
-
-class _ProjectUserAssociation(BaseModel):
-    user_id: int
-    project_id: int
-    permissions: list[_UserProjectPermission]
-
-    model_config = ConfigDict(from_attributes=True)
-
-
-class _PartialUser(BaseModel):
-    id: int
-    username: str
-    associations: list[_ProjectUserAssociation]
-
-    model_config = ConfigDict(from_attributes=True)
-
-
 class PartialUserWithPermission(_Permissions):
     id: int
     username: str
 
+    @field_validator("permissions", mode="before")
+    @classmethod
+    def parse_permissions(cls, permissions: list[Permission | str]) -> list[Permission]:
+        # parses the permissions of a serialized project as well (even in strict mode)
+        return [Permission(permission) for permission in permissions]
+
 
 class PartialTodoCategory(BaseModel):
     id: int
@@ -126,57 +109,9 @@ class Project(ProjectBase):
     done_todos_count: int
     pending_todos_count: int
 
-    users_: list[_PartialUser] = Field(exclude=True, default=[], alias="users")
-
-    @computed_field
-    @property
-    def users(self) -> list[PartialUserWithPermission]:
-        # TODO: think of another way, this way sux ass also is shitty performance wise,
-        # new solution should follow these:
-        # 1- for each project's user's permissions we should NOT perform a new query to the database (if user has 10000 associations then 9999 of them could be redundant :}) because accessing project.users[x].association is a new query then association.permissions is also another query
-        # 2- it should be universal, whenever I return a project schema, the permissions should be there per user (even in create we return the project which should contain the user who created it with the associated permission)
-        # (preferred) 3- removes the associations as a relationship property on User and Project models
-        return [
-            PartialUserWithPermission(
-                **user.model_dump(),
-                permissions=[
-                    perm.permission
-                    for association in filter(
-                        lambda association: association.project_id == self.id,
-                        user.associations,
-                    )
-                    for perm in association.permissions
-                ],
-            )
-            for user in self.users_
-        ]
-
-    @field_validator("users_", mode="before")
-    @classmethod
-    def ignore_if_users_provided(cls, value, validation_data):
-        if not (
-            isinstance(value, list)
-            and len(value) > 0
-            and not isinstance(value[0], Base)
-        ):
-            return value
-
-        return [
-            {
-                "id": user["id"],
-                "username": user["username"],
-                "associations": [
-                    {
-                        "user_id": user["id"],
-                        "project_id": validation_data.data["id"],
-                        "permissions": [
-                            {"permission": Permission(perm)}
-                            for perm in user["permissions"]
-                        ],
-                    }
-                ],
-            }
-            for user in value
-        ]
+    # projects loaded with `project_crud.load_project_users` get their users with a single query
+    users: list[PartialUserWithPermission] = Field(
+        validation_alias=AliasChoices("users_with_permissions", "users")
+    )
 
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,39 @@
+import enum
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class ProjectEventType(enum.StrEnum):
+    PROJECT_UPDATED = enum.auto()
+    # the user in `data` lost the access to the project, their event streams are closed
+    USER_DETACHED = enum.auto()
+
+    TODO_CATEGORY_CREATED = enum.auto()
+    TODO_CATEGORY_UPDATED = enum.auto()
+    TODO_CATEGORY_REORDERED = enum.auto()
+    TODO_CATEGORY_DELETED = enum.auto()
+
+    TODO_ITEM_CREATED = enum.auto()
+    TODO_ITEM_UPDATED = enum.auto()
+    TODO_ITEM_MOVED = enum.auto()
+    TODO_ITEM_DELETED = enum.auto()
+
+    TAG_ATTACHED = enum.auto()
+    TAG_DETACHED = enum.auto()
+
+    COMMENT_ADDED = enum.auto()
+    COMMENT_UPDATED = enum.auto()
+    COMMENT_DELETED = enum.auto()
+
+    # the subscriber fell behind and some events were dropped, it has to refetch the board
+    RESYNC = enum.auto()
+
+
+class ProjectEvent(BaseModel):
+    type: ProjectEventType
+    project_id: int
+    category_id: int | None = None
+    todo_id: int | None = None
+    # the fields that changed, for instance the new position of a moved item
+    data: dict[str, Any] = {}
@@ -0,0 +1,15 @@
+import datetime
+
+from pydantic import BaseModel
+
+
+class RequestProfile(BaseModel):
+    # sent in the X-Profile-Id header of the profiled response
+    id: str
+    method: str
+    path: str
+    # the operation id of the route, None if no api route handled the request
+    route: str | None
+    status_code: int
+    duration_ms: float
+    created_date: datetime.datetime
@@ -0,0 +1,17 @@
+import datetime
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class SlowQuery(BaseModel):
+    statement: str
+    # the strings and other values that may be sensitive are replaced with their type
+    parameters: list[Any] | dict[str, Any] | None
+    duration_ms: float
+    # the operation id of the route and the crud function that executed the statement
+    route: str | None
+    caller: str | None
+    # the output of EXPLAIN, when SLOW_QUERY_EXPLAIN is enabled and the statement is a select
+    plan: list[str] | None
+    created_date: datetime.datetime
@@ -0,0 +1,47 @@
+from pydantic import BaseModel, ConfigDict
+
+from db.models.change_log import ChangedEntity
+from db.schemas.project import Project
+from db.schemas.todo_category import (
+    TodoCategoryPartialAction,
+    TodoCategoryPartialTodoItem,
+)
+from db.schemas.todo_item import TodoItemPartialTag
+from db.schemas.todo_item_comment import TodoComment
+
+
+class SyncProject(Project):
+    # the categories of the project in the order of the board
+    todo_category_ids: list[int]
+
+
+class SyncTodoCategory(BaseModel):
+    id: int
+    title: str
+    description: str
+    actions: list[TodoCategoryPartialAction]
+    # the items of the category in their order, items that aren't listed left the category
+    todo_ids: list[int]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SyncDeletedEntity(BaseModel):
+    entity_type: ChangedEntity
+    id: int
+    # the entity is only gone from this project (a category can belong to multiple projects)
+    project_id: int
+
+
+class SyncChanges(BaseModel):
+    # the version to sync from next time
+    version: int
+    # the changes since the requested version aren't known anymore, everything has to be loaded
+    # again (the other lists are empty then)
+    reset: bool
+    projects: list[SyncProject]
+    todo_categories: list[SyncTodoCategory]
+    todo_items: list[TodoCategoryPartialTodoItem]
+    tags: list[TodoItemPartialTag]
+    comments: list[TodoComment]
+    deleted: list[SyncDeletedEntity]
@@ -79,6 +79,7 @@ class TodoCategoryPartialTodoItem(BaseModel):
     order: NullableOrderedItem
     comments_count: int
     marked_as_done_by: TodoCategoryPartialUser | None
+    position: int | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -89,5 +90,6 @@ class TodoCategory(TodoCategoryBase):
     items: list[TodoCategoryPartialTodoItem]
     projects: list[TodoCategoryPartialProject]
     actions: list[TodoCategoryPartialAction]
+    position: int | None = None
 
     model_config = ConfigDict(from_attributes=True)
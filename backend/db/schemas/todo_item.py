@@ -13,6 +13,13 @@ class SearchTodoStatus(Enum):
     PENDING = "pending"
 
 
+class TodoItemSearchFilters(BaseModel):
+    due_date_from: datetime.datetime | None = None
+    due_date_to: datetime.datetime | None = None
+    tag_id: int | None = None
+    done_by_user_id: int | None = None
+
+
 class TodoItemBase(BaseModel):
     title: str = Field(min_length=1, max_length=100)
     description: str = Field(min_length=1, max_length=100)
@@ -39,6 +46,15 @@ class TodoItemUpdateOrder(BaseModel):
     new_category_id: int
 
 
+class TodoItemMoveOrder(TodoItemUpdateOrder):
+    todo_id: int
+
+
+class TodoItemBulkUpdateOrder(BaseModel):
+    # the moves are applied one after another, so a move can use the result of the previous ones
+    moves: list[TodoItemMoveOrder] = Field(min_length=1, max_length=1000)
+
+
 class TodoItemUpdate(BaseModel):
     order: TodoItemUpdateOrder | None = Field(default=None)
     item: TodoItemUpdateItem | None = Field(default=None)
@@ -101,5 +117,6 @@ class TodoItem(TodoItemBase):
     order: NullableOrderedItem
     comments_count: int
     marked_as_done_by: TodoItemPartialUser | None
+    position: int | None = None
 
     model_config = ConfigDict(from_attributes=True)
@@ -34,3 +34,12 @@ class User(UserBase):
     projects: list[PartialProject] = []
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class UserPrincipal(BaseModel):
+    """the authenticated user of a request, routes only need its id to check the permissions"""
+
+    id: int
+    username: str
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
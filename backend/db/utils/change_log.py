@@ -0,0 +1,232 @@
+import datetime
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import Select, delete, event, func, insert, select, update
+from sqlalchemy.orm import Session, SessionTransaction
+
+from db.models.change_log import (
+    ChangedEntity,
+    ChangeLogCompaction,
+    ChangeLogEntry,
+    ChangeLogVersion,
+    ChangeOperation,
+)
+from db.models.project import Project
+from db.models.todo_category_project_association import TodoCategoryProjectAssociation
+from db.models.todo_item import TodoItem
+
+_SESSION_INFO_KEY = "pending_change_log_entries"
+
+
+def log_changes(
+    db: Session,
+    entity_type: ChangedEntity,
+    entity_ids: Iterable[int],
+    project_ids: Iterable[int],
+    operation: ChangeOperation = ChangeOperation.UPSERT,
+    user_id: int | None = None,
+):
+    """records that the entities changed in each of the projects, so the clients of the projects
+    get them from the sync route
+
+    deletes must be logged before the entities are deleted (they can't be looked up afterwards)
+    this does not commit the changes, the entries are inserted when the caller commits them
+    """
+
+    _insert_entries(
+        db,
+        entity_type,
+        operation,
+        [
+            (entity_id, project_id)
+            for entity_id in dict.fromkeys(entity_ids)
+            for project_id in dict.fromkeys(project_ids)
+        ],
+        user_id,
+    )
+
+
+def log_changes_in_categories(
+    db: Session,
+    entity_type: ChangedEntity,
+    entity_ids: Iterable[int],
+    category_ids: Iterable[int],
+    operation: ChangeOperation = ChangeOperation.UPSERT,
+):
+    """records the change of the entities in every project that the categories belong to"""
+
+    log_changes(
+        db,
+        entity_type,
+        entity_ids,
+        db.scalars(
+            select(TodoCategoryProjectAssociation.project_id)
+            .where(TodoCategoryProjectAssociation.category_id.in_(set(category_ids)))
+            .distinct()
+        ).all(),
+        operation,
+    )
+
+
+def log_category_changes(
+    db: Session,
+    category_ids: Iterable[int],
+    operation: ChangeOperation = ChangeOperation.UPSERT,
+):
+    """records the change of each category in the projects that it belongs to
+
+    the categories are sent with the order of their items, so it's also logged when their items are
+    added, moved or removed
+    """
+
+    _insert_entries(
+        db,
+        ChangedEntity.TODO_CATEGORY,
+        operation,
+        _fetch_pairs(
+            db,
+            select(
+                TodoCategoryProjectAssociation.category_id,
+                TodoCategoryProjectAssociation.project_id,
+            ).where(TodoCategoryProjectAssociation.category_id.in_(set(category_ids))),
+        ),
+    )
+
+
+def log_todo_changes(
+    db: Session,
+    todo_ids: Iterable[int],
+    operation: ChangeOperation = ChangeOperation.UPSERT,
+):
+    """records the change of each todo item in the projects of its category"""
+
+    _insert_entries(
+        db,
+        ChangedEntity.TODO_ITEM,
+        operation,
+        _fetch_pairs(
+            db,
+            select(TodoItem.id, TodoCategoryProjectAssociation.project_id)
+            .join(
+                TodoCategoryProjectAssociation,
+                TodoCategoryProjectAssociation.category_id == TodoItem.category_id,
+            )
+            .where(TodoItem.id.in_(set(todo_ids))),
+        ),
+    )
+
+
+def compact_change_log(db: Session, tombstone_retention: datetime.timedelta):
+    """shrinks the change log to the latest change of each entity and removes the deletes that are
+    older than `tombstone_retention`
+
+    the clients that synced before the newest removed delete can't tell what was deleted anymore,
+    so the sync route tells them to load everything again
+    this does not commit the changes, caller needs to commit the changes
+    """
+
+    # only the latest change of an entity decides what the clients get
+    db.execute(
+        delete(ChangeLogEntry).where(
+            ChangeLogEntry.version.not_in(
+                select(func.max(ChangeLogEntry.version)).group_by(
+                    ChangeLogEntry.entity_type,
+                    ChangeLogEntry.entity_id,
+                    ChangeLogEntry.project_id,
+                    ChangeLogEntry.user_id,
+                )
+            )
+        )
+    )
+
+    # nobody has access to the deleted projects, their former users got their own entries
+    db.execute(
+        delete(ChangeLogEntry).where(
+            ChangeLogEntry.user_id.is_(None),
+            ChangeLogEntry.project_id.not_in(select(Project.id)),
+        )
+    )
+
+    expired = (
+        ChangeLogEntry.operation == ChangeOperation.DELETE,
+        ChangeLogEntry.created_date
+        < datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+        - tombstone_retention,
+    )
+    compacted_version = db.scalar(
+        select(func.max(ChangeLogEntry.version)).where(*expired)
+    )
+
+    if compacted_version is None:
+        return
+
+    db.execute(delete(ChangeLogEntry).where(*expired))
+    db.add(ChangeLogCompaction(version=compacted_version))
+
+
+def _fetch_pairs(db: Session, query: Select[tuple[int, int]]):
+    return [(entity_id, project_id) for entity_id, project_id in db.execute(query)]
+
+
+def _insert_entries(
+    db: Session,
+    entity_type: ChangedEntity,
+    operation: ChangeOperation,
+    pairs: list[tuple[int, int]],
+    user_id: int | None = None,
+):
+    # the entries get their versions when the transaction commits, see `_insert_pending_entries`
+    db.info.setdefault(_SESSION_INFO_KEY, []).extend(
+        {
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "operation": operation,
+            "project_id": project_id,
+            "user_id": user_id,
+        }
+        for entity_id, project_id in pairs
+    )
+
+
+def _next_versions(db: Session, count: int):
+    """reserves `count` versions and returns the first of them
+
+    the version row stays locked until the transaction ends, so the writers of the change log
+    commit one after the other and in the order of their versions
+    """
+
+    db.execute(
+        update(ChangeLogVersion)
+        .values(version=ChangeLogVersion.version + count)
+        .execution_options(synchronize_session=False)
+    )
+    return db.scalar(select(ChangeLogVersion.version)) - count + 1
+
+
+@event.listens_for(Session, "before_commit")
+def _insert_pending_entries(db: Session):
+    pending_entries: list[dict[str, Any]] = db.info.pop(_SESSION_INFO_KEY, [])
+
+    if len(pending_entries) == 0:
+        return
+
+    # the changes of the transaction are flushed first, so the version row is the last lock that
+    # the transaction takes and it's only held while the entries are inserted and committed
+    db.flush()
+    first_version = _next_versions(db, len(pending_entries))
+    db.execute(
+        insert(ChangeLogEntry),
+        [
+            {"version": first_version + index, **entry}
+            for index, entry in enumerate(pending_entries)
+        ],
+    )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_entries(db: Session, transaction: SessionTransaction):
+    # the entries of a committed transaction are already inserted, the ones that are left belong to
+    # a transaction that was rolled back or closed without a commit
+    if transaction.parent is None:
+        db.info.pop(_SESSION_INFO_KEY, None)
@@ -0,0 +1,109 @@
+import asyncio
+import importlib
+import threading
+from collections import defaultdict
+
+from config import settings
+from db.schemas.project_event import ProjectEvent, ProjectEventType
+
+
+class EventSubscription:
+    """the events of a project for one subscriber, it belongs to the event loop that created it"""
+
+    def __init__(self, broker: "EventBroker", project_id: int):
+        self.project_id = project_id
+        self._broker = broker
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[ProjectEvent] = asyncio.Queue(
+            maxsize=settings.EVENT_SUBSCRIBER_MAX_QUEUED
+        )
+
+    async def get(self) -> ProjectEvent:
+        return await self._queue.get()
+
+    def push(self, event: ProjectEvent):
+        """queues the event, it can be called from any thread"""
+
+        self._loop.call_soon_threadsafe(self._put, event)
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+    def _put(self, event: ProjectEvent):
+        if not self._queue.full():
+            self._queue.put_nowait(event)
+            return
+
+        # the events can't be applied with a gap, so the subscriber starts over from a fresh board
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(
+            ProjectEvent(type=ProjectEventType.RESYNC, project_id=self.project_id)
+        )
+
+
+class EventBroker:
+    """fans the events of the projects out to the subscribers in this process
+
+    with multiple workers, subclass it and override `publish` to send the events through a shared
+    backend (redis pub/sub, postgres LISTEN/NOTIFY, ...) and call `deliver` in every worker when an
+    event arrives from the backend, then set EVENT_BROKER to the subclass
+    """
+
+    def __init__(self):
+        self._subscriptions: defaultdict[int, set[EventSubscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, event: ProjectEvent):
+        self.deliver(event)
+
+    def deliver(self, event: ProjectEvent):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event.project_id, ()))
+
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def subscribe(self, project_id: int):
+        """must be called from the event loop that reads the events"""
+
+        subscription = EventSubscription(self, project_id)
+        with self._lock:
+            self._subscriptions[project_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.project_id)
+            if subscriptions is None:
+                return
+
+            subscriptions.discard(subscription)
+            if len(subscriptions) == 0:
+                del self._subscriptions[subscription.project_id]
+
+
+_broker: EventBroker | None = None
+_broker_lock = threading.Lock()
+
+
+def get_event_broker() -> EventBroker:
+    global _broker
+
+    with _broker_lock:
+        if _broker is None:
+            _broker = _create_broker()
+        return _broker
+
+
+def _create_broker() -> EventBroker:
+    if settings.EVENT_BROKER is None:
+        return EventBroker()
+
+    module_name, _, class_name = settings.EVENT_BROKER.partition(":")
+    broker_class = getattr(importlib.import_module(module_name), class_name)
+
+    if not issubclass(broker_class, EventBroker):
+        raise TypeError(f"{settings.EVENT_BROKER} is not a subclass of EventBroker")
+
+    return broker_class()
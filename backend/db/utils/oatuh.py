@@ -5,7 +5,8 @@ from joserfc import jwt
 from sqlalchemy.orm import Session
 
 from config import settings
-from db.utils.user_crud import get_user_by_username, verify_password
+from db.utils.password_hasher import needs_rehash, verify_password
+from db.utils.user_crud import get_user_by_username, update_password
 
 
 def authenticate_user(db: Session, username: str, password: str):
@@ -14,16 +15,20 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     if not verify_password(password, user.password):
         return False
+    if needs_rehash(user.password):
+        # BCRYPT_ROUNDS changed since the password was hashed, the plain password is only known here
+        update_password(db, user, password)
     return user
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
+    now = datetime.datetime.now(datetime.UTC)
     if expires_delta:
-        expire = datetime.datetime.now(datetime.UTC) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.datetime.now(datetime.UTC) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(
         {"alg": settings.ALGORITHM}, to_encode, settings.SECRET_KEY
     )
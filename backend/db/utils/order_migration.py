@@ -0,0 +1,97 @@
+from collections.abc import Callable, Sequence
+from typing import Literal
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from db.models.base import BaseOrderedItem
+from db.models.todo_category_order import TodoCategoryOrder
+from db.models.todo_item import TodoItem
+from db.models.todo_item_order import TodoItemOrder
+from db.utils.shared.rank import evenly_spaced_ranks
+from db.utils.shared.ranked_item import sort_by_links
+
+
+def migrate_orders_to_backend(db: Session, backend: Literal["linked_list", "rank"]):
+    """converts the stored orders of categories and todo items to the given ordering backend
+
+    each backend only keeps its own columns up to date, so the lists that are stored in the other
+    backend's columns are converted and the columns of the other backend are cleared.
+    lists that are already stored in the requested backend are not touched.
+    this does not commit the changes, caller needs to commit the changes
+    """
+
+    if backend == "rank":
+        stale_filter = TodoCategoryOrder.rank == None
+        stale_item_filter = TodoItemOrder.rank == None
+    else:
+        stale_filter = TodoCategoryOrder.rank != None
+        stale_item_filter = TodoItemOrder.rank != None
+
+    project_ids = db.scalars(
+        select(TodoCategoryOrder.project_id).where(stale_filter).distinct()
+    ).all()
+    category_orders: dict[int, list[TodoCategoryOrder]] = {}
+    for order in db.scalars(
+        select(TodoCategoryOrder).where(TodoCategoryOrder.project_id.in_(project_ids))
+    ):
+        category_orders.setdefault(order.project_id, []).append(order)
+
+    category_ids = db.scalars(
+        select(TodoItem.category_id)
+        .join(TodoItemOrder, TodoItemOrder.todo_id == TodoItem.id)
+        .where(stale_item_filter)
+        .distinct()
+    ).all()
+    todo_orders: dict[int, list[TodoItemOrder]] = {}
+    for order, category_id in db.execute(
+        select(TodoItemOrder, TodoItem.category_id)
+        .join(TodoItemOrder.todo)
+        .where(TodoItem.category_id.in_(category_ids))
+    ).tuples():
+        todo_orders.setdefault(category_id, []).append(order)
+
+    for orders in category_orders.values():
+        _convert(db, orders, lambda order: order.category_id, backend)
+
+    for orders in todo_orders.values():
+        _convert(db, orders, lambda order: order.todo_id, backend)
+
+    db.flush()
+
+
+def _convert[
+    TOrderedItemClass: BaseOrderedItem
+](
+    db: Session,
+    orders: Sequence[TOrderedItemClass],
+    get_item_id: Callable[[TOrderedItemClass], int],
+    backend: Literal["linked_list", "rank"],
+):
+    if backend == "rank":
+        for order, rank in zip(
+            sort_by_links(orders, get_item_id), evenly_spaced_ranks(len(orders))
+        ):
+            order.rank = rank
+            order.left_id = None
+            order.right_id = None
+        return
+
+    sorted_orders = sorted(
+        orders, key=lambda order: (order.rank is None, order.rank or "", order.id)
+    )
+
+    # the links are unique in a list, so the old ones are cleared before the new ones are set
+    for order in sorted_orders:
+        order.left_id = None
+        order.right_id = None
+    db.flush()
+
+    for index, order in enumerate(sorted_orders):
+        order.rank = None
+        order.left_id = get_item_id(sorted_orders[index - 1]) if index > 0 else None
+        order.right_id = (
+            get_item_id(sorted_orders[index + 1])
+            if index < len(sorted_orders) - 1
+            else None
+        )
@@ -0,0 +1,119 @@
+from collections.abc import Iterable
+
+from sqlalchemy import func, select
+
+from config import settings
+from db.models.todo_category_order import TodoCategoryOrder
+from db.models.todo_item import TodoItem
+from db.models.todo_item_order import TodoItemOrder
+from db.utils.shared.ordered_item import get_linked_list_positions
+
+
+def get_category_positions(project_id: int):
+    """returns a subquery of (item_id, position) of the categories of a project"""
+
+    if settings.ORDERING_BACKEND == "rank":
+        return (
+            select(
+                TodoCategoryOrder.category_id.label("item_id"),
+                (
+                    func.row_number().over(
+                        order_by=(
+                            TodoCategoryOrder.rank.asc().nulls_last(),
+                            TodoCategoryOrder.category_id.asc(),
+                        )
+                    )
+                    - 1
+                ).label("position"),
+            )
+            .where(TodoCategoryOrder.project_id == project_id)
+            .subquery("positions")
+        )
+
+    return get_linked_list_positions(
+        TodoCategoryOrder,
+        TodoCategoryOrder.category_id,
+        lambda order: order.project_id == project_id,
+    )
+
+
+def get_project_category_positions(project_ids: list[int]):
+    """returns a subquery of (project_id, item_id, position) of the categories of the given projects
+
+    positions start from 0 in each project
+    """
+
+    if settings.ORDERING_BACKEND == "rank":
+        return (
+            select(
+                TodoCategoryOrder.project_id,
+                TodoCategoryOrder.category_id.label("item_id"),
+                (
+                    func.row_number().over(
+                        partition_by=TodoCategoryOrder.project_id,
+                        order_by=(
+                            TodoCategoryOrder.rank.asc().nulls_last(),
+                            TodoCategoryOrder.category_id.asc(),
+                        ),
+                    )
+                    - 1
+                ).label("position"),
+            )
+            .where(TodoCategoryOrder.project_id.in_(project_ids))
+            .subquery("positions")
+        )
+
+    return get_linked_list_positions(
+        TodoCategoryOrder,
+        TodoCategoryOrder.category_id,
+        lambda order: order.project_id.in_(project_ids),
+        TodoCategoryOrder.project_id,
+    )
+
+
+def get_todo_item_positions(category_ids: list[int]):
+    """returns a subquery of (item_id, position) of the todo items of the given categories
+
+    positions start from 0 in each category
+    """
+
+    if settings.ORDERING_BACKEND == "rank":
+        return (
+            select(
+                TodoItemOrder.todo_id.label("item_id"),
+                (
+                    func.row_number().over(
+                        partition_by=TodoItem.category_id,
+                        order_by=(
+                            TodoItemOrder.rank.asc().nulls_last(),
+                            TodoItemOrder.todo_id.asc(),
+                        ),
+                    )
+                    - 1
+                ).label("position"),
+            )
+            .join(TodoItemOrder.todo)
+            .where(TodoItem.category_id.in_(category_ids))
+            .subquery("positions")
+        )
+
+    category_todo_ids = select(TodoItem.id).where(
+        TodoItem.category_id.in_(category_ids)
+    )
+
+    return get_linked_list_positions(
+        TodoItemOrder,
+        TodoItemOrder.todo_id,
+        lambda order: order.todo_id.in_(category_todo_ids),
+    )
+
+
+def with_positions[TItem](rows: Iterable[tuple[TItem, int | None]]) -> list[TItem]:
+    """stores the position of each item on the item itself (as `position`), so it's included in the response"""
+
+    items: list[TItem] = []
+    for item, position in rows:
+        setattr(item, "position", position)
+        items.append(item)
+
+    return items
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict
+
+from bcrypt import checkpw, gensalt, hashpw
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+from config import settings
+from error.exceptions import ErrorCode, UserFriendlyError
+
+
+class PasswordHashingStats(TypedDict):
+    max_workers: int
+    # jobs that are waiting for a free worker
+    queued: int
+    # jobs that are being hashed/verified right now
+    running: int
+    # jobs that were rejected because the queue was full
+    rejected: int
+
+
+# bcrypt is slow on purpose (~250ms with 12 rounds), so it runs on its own bounded pool instead of
+# the threadpool/event loop that serves the requests
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASHING_MAX_WORKERS,
+    thread_name_prefix="password-hasher",
+)
+_stats_lock = threading.Lock()
+_stats: PasswordHashingStats = {
+    "max_workers": settings.PASSWORD_HASHING_MAX_WORKERS,
+    "queued": 0,
+    "running": 0,
+    "rejected": 0,
+}
+
+
+def hash_password(password: str) -> str:
+    return _run(
+        lambda: hashpw(
+            password.encode("utf-8"), gensalt(rounds=settings.BCRYPT_ROUNDS)
+        ).decode("utf-8")
+    )
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _run(
+        lambda: checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    )
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """whether the hash was created with a different work factor than `BCRYPT_ROUNDS`"""
+
+    # bcrypt hashes look like $2b$<rounds>$<salt and hash>
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return True
+
+    return int(parts[2]) != settings.BCRYPT_ROUNDS
+
+
+def get_password_hashing_stats() -> PasswordHashingStats:
+    with _stats_lock:
+        return _stats.copy()
+
+
+def _run[TResult](job: Callable[[], TResult]) -> TResult:
+    """runs the job on the hashing pool and waits for it
+
+    the caller is either a threadpool worker, which just blocks, or the greenlet of an async
+    session (see `run_db`), which awaits the job so the event loop keeps serving other requests
+    """
+
+    with _stats_lock:
+        if _stats["queued"] >= settings.PASSWORD_HASHING_MAX_QUEUE:
+            _stats["rejected"] += 1
+            raise UserFriendlyError(
+                ErrorCode.SERVER_IS_BUSY,
+                "Too many login/signup requests at the moment, please try again later",
+            )
+        _stats["queued"] += 1
+
+    future = _executor.submit(_track, job)
+
+    if in_greenlet():
+        return await_only(asyncio.wrap_future(future))
+
+    return future.result()
+
+
+def _track[TResult](job: Callable[[], TResult]) -> TResult:
+    with _stats_lock:
+        _stats["queued"] -= 1
+        _stats["running"] += 1
+
+    try:
+        return job()
+    finally:
+        with _stats_lock:
+            _stats["running"] -= 1
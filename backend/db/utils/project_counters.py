@@ -0,0 +1,105 @@
+from sqlalchemy import ColumnElement, func, select, update
+from sqlalchemy.orm import Session
+
+from db.models.project import Project
+from db.models.todo_category_project_association import TodoCategoryProjectAssociation
+from db.models.todo_item import TodoItem
+
+
+def update_project_counters(
+    db: Session, category_id: int, done: int = 0, pending: int = 0
+):
+    """adds the given deltas to the todo counters of every project that the category belongs to
+
+    the counters are incremented in the database, so concurrent updates don't overwrite each other.
+    this does not commit the changes, caller needs to commit the changes
+    """
+
+    if done == 0 and pending == 0:
+        return
+
+    db.execute(
+        update(Project)
+        .where(
+            Project.id.in_(
+                select(TodoCategoryProjectAssociation.project_id).where(
+                    TodoCategoryProjectAssociation.category_id == category_id
+                )
+            )
+        )
+        .values(
+            done_todos_count=Project.done_todos_count + done,
+            pending_todos_count=Project.pending_todos_count + pending,
+        )
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def add_todos_to_project_counters(
+    db: Session, category_id: int, is_done: bool, count: int = 1
+):
+    """adds `count` todo items with the given status to the counters, a negative count removes them"""
+
+    if is_done:
+        update_project_counters(db, category_id, done=count)
+    else:
+        update_project_counters(db, category_id, pending=count)
+
+
+def add_category_to_project_counters(
+    db: Session, category_id: int, project_id: int, sign: int = 1
+):
+    """adds (or with `sign=-1` removes) the todo items of a category to the counters of a project
+
+    this does not commit the changes, caller needs to commit the changes
+    """
+
+    db.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(
+            done_todos_count=Project.done_todos_count
+            + sign * _count_todos(True, TodoItem.category_id == category_id),
+            pending_todos_count=Project.pending_todos_count
+            + sign * _count_todos(False, TodoItem.category_id == category_id),
+        )
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def recompute_project_counters(db: Session, project_ids: list[int] | None = None):
+    """recomputes the counters from the todo items, repairing any drift
+
+    :param project_ids: the projects to repair, all of the projects are repaired if it's None
+    this does not commit the changes, caller needs to commit the changes
+    """
+
+    # the subqueries are correlated to the updated project
+    in_project = (
+        TodoCategoryProjectAssociation.category_id == TodoItem.category_id,
+        TodoCategoryProjectAssociation.project_id == Project.id,
+    )
+    statement = update(Project).values(
+        done_todos_count=_count_todos(True, *in_project),
+        pending_todos_count=_count_todos(False, *in_project),
+    )
+
+    if project_ids is not None:
+        statement = statement.where(Project.id.in_(project_ids))
+
+    db.execute(statement.execution_options(synchronize_session="fetch"))
+
+
+def _count_todos(is_done: bool, *filters: ColumnElement[bool]):
+    return (
+        select(func.count(TodoItem.id))
+        .where(
+            *filters,
+            (
+                TodoItem.marked_as_done_by_user_id != None
+                if is_done
+                else TodoItem.marked_as_done_by_user_id == None
+            ),
+        )
+        .scalar_subquery()
+    )
@@ -1,7 +1,8 @@
-from sqlalchemy import func
+from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
+from db.models.change_log import ChangedEntity, ChangeOperation
 from db.models.project import Project
 from db.models.project_user_association import ProjectUserAssociation
 from db.models.todo_category import TodoCategory
@@ -14,12 +15,13 @@ from db.schemas.project import (
     ProjectUpdate,
     ProjectUpdateUserPermissions,
 )
+from db.schemas.project_event import ProjectEventType
 from db.schemas.todo_category import TodoCategoryCreate
-from db.utils.shared.permission_query import (
-    PermissionsType,
-    join_with_permission_query_if_required,
-    validate_item_exists_with_permissions,
-)
+from db.utils.change_log import log_changes
+from db.utils.project_events import emit_project_event
+from db.utils.project_versions import bump_project_versions
+from db.utils.shared.permission_context import PermissionContext
+from db.utils.shared.permission_query import PermissionsType, get_permission_verdicts
 from error.exceptions import ErrorCode, UserFriendlyError
 
 
@@ -44,11 +46,13 @@ def create(db: Session, project: ProjectCreate, user_id: int):
     )
     db.flush()
 
+    log_changes(db, ChangedEntity.PROJECT, [db_item.id], [db_item.id])
+
     if project.create_from_default_template:
         add_default_template_categories(db, db_item.id, user_id)
 
     db.commit()
-    return db_item
+    return load_project_users(db, [db_item])[0]
 
 
 def update(db: Session, project_id: int, patch: ProjectUpdate, user_id: int):
@@ -57,6 +61,9 @@ def update(db: Session, project_id: int, patch: ProjectUpdate, user_id: int):
     db_item.title = patch.title
     db_item.description = patch.description
 
+    emit_project_event(db, ProjectEventType.PROJECT_UPDATED, [project_id])
+    log_changes(db, ChangedEntity.PROJECT, [project_id], [project_id])
+    bump_project_versions(db, [project_id])
     db.commit()
     return db_item
 
@@ -102,7 +109,11 @@ def update_user_permissions(
             )
         )
 
+    emit_project_event(db, ProjectEventType.PROJECT_UPDATED, [project_id])
+    log_changes(db, ChangedEntity.PROJECT, [project_id], [project_id])
+    bump_project_versions(db, [project_id])
     db.commit()
+    _invalidate_cached_permissions(db, project_id)
 
     return get_project(db, project_id, user_id)
 
@@ -142,7 +153,11 @@ def attach_to_user(
             )
         )
 
+    emit_project_event(db, ProjectEventType.PROJECT_UPDATED, [project_id])
+    log_changes(db, ChangedEntity.PROJECT, [project_id], [project_id])
+    bump_project_versions(db, [project_id])
     db.commit()
+    _invalidate_cached_permissions(db, project_id)
 
     return association_db_item
 
@@ -167,6 +182,15 @@ def detach_from_user(
         ProjectUserAssociation.project_id == project_id,
         ProjectUserAssociation.user_id == detaching_user_id,
     ).delete()
+    # the detached user can't see the changes of the project anymore, so they get their own delete
+    log_changes(
+        db,
+        ChangedEntity.PROJECT,
+        [project_id],
+        [project_id],
+        ChangeOperation.DELETE,
+        detaching_user_id,
+    )
 
     if (
         db.query(ProjectUserAssociation)
@@ -176,7 +200,17 @@ def detach_from_user(
     ):
         delete_project(db, project_id)
 
+    emit_project_event(
+        db,
+        ProjectEventType.USER_DETACHED,
+        [project_id],
+        data={"user_id": detaching_user_id},
+    )
+    emit_project_event(db, ProjectEventType.PROJECT_UPDATED, [project_id])
+    log_changes(db, ChangedEntity.PROJECT, [project_id], [project_id])
+    bump_project_versions(db, [project_id])
     db.commit()
+    _invalidate_cached_permissions(db, project_id)
 
 
 def delete_project(db: Session, project_id: int):
@@ -228,7 +262,54 @@ def get_projects(db: Session, user_id: int, project_id: int | None = None):
     if project_id is not None:
         query = query.filter(Project.id == project_id)
 
-    return query.order_by(Project.id.asc()).all()
+    return load_project_users(
+        db,
+        query.options(selectinload(Project.todo_categories), selectinload(Project.tags))
+        .order_by(Project.id.asc())
+        .all(),
+    )
+
+
+def load_project_users(db: Session, projects: list[Project]):
+    """loads the users of the projects with their permissions in each project with a single query
+
+    the users are stored on the projects (as `users_with_permissions`), so they're included in the response
+    """
+
+    users_per_project: dict[int, dict[int, dict]] = {
+        project.id: {} for project in projects
+    }
+
+    for project_id, user_id, username, permission in db.execute(
+        select(
+            ProjectUserAssociation.project_id,
+            User.id,
+            User.username,
+            UserProjectPermission.permission,
+        )
+        .join(User, User.id == ProjectUserAssociation.user_id)
+        .outerjoin(
+            UserProjectPermission,
+            UserProjectPermission.project_user_association_id
+            == ProjectUserAssociation.id,
+        )
+        .where(ProjectUserAssociation.project_id.in_(users_per_project.keys()))
+        .order_by(ProjectUserAssociation.id.asc(), UserProjectPermission.id.asc())
+    ).tuples():
+        user = users_per_project[project_id].setdefault(
+            user_id, {"id": user_id, "username": username, "permissions": []}
+        )
+        if permission is not None:
+            user["permissions"].append(permission)
+
+    for project in projects:
+        setattr(
+            project,
+            "users_with_permissions",
+            list(users_per_project[project.id].values()),
+        )
+
+    return projects
 
 
 def add_default_template_categories(db: Session, project_id: int, user_id: int):
@@ -256,18 +337,29 @@ def validate_project_belongs_to_user(
     user_id: int,
     permissions: PermissionsType,
 ):
-    query = (
-        db.query(Project)
-        .filter(Project.id == project_id)
-        .join(Project.users)
-        .filter(User.id == user_id)
-    )
+    context = PermissionContext.of(db)
 
-    query = join_with_permission_query_if_required(query, permissions)
+    if context is not None:
+        verdicts = context.get_project_verdicts(db, [project_id], user_id, permissions)
+    else:
+        verdicts = get_permission_verdicts(
+            db,
+            select(ProjectUserAssociation.project_id).where(
+                ProjectUserAssociation.user_id == user_id
+            ),
+            [project_id],
+            permissions,
+        )
 
-    validate_item_exists_with_permissions(
-        query,
-        permissions,
-        ErrorCode.PROJECT_NOT_FOUND,
-        "project doesn't exist or doesn't belong to user or you don't have the permission to perform the requested action",
-    )
+    if not all(verdicts.values()):
+        raise UserFriendlyError(
+            ErrorCode.PROJECT_NOT_FOUND,
+            "project doesn't exist or doesn't belong to user or you don't have the permission to perform the requested action",
+        )
+
+
+def _invalidate_cached_permissions(db: Session, project_id: int):
+    context = PermissionContext.of(db)
+
+    if context is not None:
+        context.invalidate_project(project_id)
@@ -0,0 +1,107 @@
+import logging
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, SessionTransaction
+
+from db.models.todo_category_project_association import TodoCategoryProjectAssociation
+from db.models.todo_item import TodoItem
+from db.schemas.project_event import ProjectEvent, ProjectEventType
+from db.utils.event_broker import get_event_broker
+
+_SESSION_INFO_KEY = "pending_project_events"
+
+_logger = logging.getLogger(__name__)
+
+
+def emit_project_event(
+    db: Session,
+    type: ProjectEventType,
+    project_ids: Iterable[int],
+    category_id: int | None = None,
+    todo_id: int | None = None,
+    data: dict[str, Any] | None = None,
+):
+    """publishes the event to the subscribers of the projects after the current transaction is
+    committed, the event is dropped if the transaction is rolled back
+    """
+
+    db.info.setdefault(_SESSION_INFO_KEY, []).extend(
+        ProjectEvent(
+            type=type,
+            project_id=project_id,
+            category_id=category_id,
+            todo_id=todo_id,
+            data=data or {},
+        )
+        for project_id in dict.fromkeys(project_ids)
+    )
+
+
+def emit_category_event(
+    db: Session,
+    type: ProjectEventType,
+    category_ids: Iterable[int],
+    category_id: int | None = None,
+    todo_id: int | None = None,
+    data: dict[str, Any] | None = None,
+):
+    """emits the event to every project that the categories belong to"""
+
+    emit_project_event(
+        db,
+        type,
+        get_category_project_ids(db, category_ids),
+        category_id,
+        todo_id,
+        data,
+    )
+
+
+def emit_todo_event(
+    db: Session,
+    type: ProjectEventType,
+    todo_id: int,
+    data: dict[str, Any] | None = None,
+):
+    """emits the event to every project that the todo item belongs to"""
+
+    # the session may have moved the item to another category without flushing it yet
+    todo = db.get(TodoItem, todo_id)
+    if todo is None:
+        return
+
+    emit_category_event(db, type, [todo.category_id], todo.category_id, todo_id, data)
+
+
+def get_category_project_ids(db: Session, category_ids: Iterable[int]):
+    return db.scalars(
+        select(TodoCategoryProjectAssociation.project_id)
+        .where(TodoCategoryProjectAssociation.category_id.in_(set(category_ids)))
+        .distinct()
+    ).all()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_events(db: Session):
+    pending_events: list[ProjectEvent] = db.info.pop(_SESSION_INFO_KEY, [])
+
+    if len(pending_events) == 0:
+        return
+
+    broker = get_event_broker()
+    for pending_event in pending_events:
+        try:
+            broker.publish(pending_event)
+        except Exception:
+            # the change is already committed, a failing subscriber shouldn't fail the request
+            _logger.exception("publishing the project event failed")
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_events(db: Session, transaction: SessionTransaction):
+    # the events of a committed transaction are already published, the ones that are left belong to
+    # a transaction that was rolled back or closed without a commit
+    if transaction.parent is None:
+        db.info.pop(_SESSION_INFO_KEY, None)
@@ -0,0 +1,95 @@
+from collections.abc import Iterable
+
+from sqlalchemy import ColumnElement, or_, select, update
+from sqlalchemy.orm import Session
+
+from db.models.project import Project
+from db.models.project_user_association import ProjectUserAssociation
+from db.models.tag import Tag
+from db.models.todo_category_project_association import TodoCategoryProjectAssociation
+from db.models.todo_item import TodoItem
+from db.models.todo_item_tag_association import TodoItemTagAssociation
+
+
+def bump_project_versions(db: Session, project_ids: Iterable[int]):
+    """increments the version of the projects, it must be called by every crud that changes what
+    the board or the project looks like, so the cached responses of the clients become stale
+
+    this does not commit the changes, caller needs to commit the changes
+    """
+
+    _bump_versions(db, Project.id.in_(set(project_ids)))
+
+
+def bump_category_project_versions(db: Session, category_ids: Iterable[int]):
+    """increments the version of every project that the categories belong to"""
+
+    _bump_versions(
+        db,
+        Project.id.in_(
+            select(TodoCategoryProjectAssociation.project_id).where(
+                TodoCategoryProjectAssociation.category_id.in_(set(category_ids))
+            )
+        ),
+    )
+
+
+def bump_todo_project_versions(db: Session, todo_ids: Iterable[int]):
+    """increments the version of every project that the todo items belong to"""
+
+    _bump_versions(
+        db,
+        Project.id.in_(
+            select(TodoCategoryProjectAssociation.project_id)
+            .join(
+                TodoItem,
+                TodoItem.category_id == TodoCategoryProjectAssociation.category_id,
+            )
+            .where(TodoItem.id.in_(set(todo_ids)))
+        ),
+    )
+
+
+def bump_tag_project_versions(db: Session, tag_ids: Iterable[int]):
+    """increments the version of the projects that the tags belong to and the projects of the
+    todo items that have the tags (the todo items can be shared with other projects)
+    """
+
+    tag_ids = set(tag_ids)
+    _bump_versions(
+        db,
+        or_(
+            Project.id.in_(select(Tag.project_id).where(Tag.id.in_(tag_ids))),
+            Project.id.in_(
+                select(TodoCategoryProjectAssociation.project_id)
+                .join(
+                    TodoItem,
+                    TodoItem.category_id == TodoCategoryProjectAssociation.category_id,
+                )
+                .join(
+                    TodoItemTagAssociation,
+                    TodoItemTagAssociation.todo_id == TodoItem.id,
+                )
+                .where(TodoItemTagAssociation.tag_id.in_(tag_ids))
+            ),
+        ),
+    )
+
+
+def get_project_version(db: Session, project_id: int, user_id: int) -> int | None:
+    """returns the version of the project, None if the project doesn't belong to user"""
+
+    return db.scalar(
+        select(Project.version)
+        .join(ProjectUserAssociation, ProjectUserAssociation.project_id == Project.id)
+        .where(Project.id == project_id, ProjectUserAssociation.user_id == user_id)
+    )
+
+
+def _bump_versions(db: Session, project_filter: ColumnElement[bool]):
+    db.execute(
+        update(Project)
+        .where(project_filter)
+        .values(version=Project.version + 1)
+        .execution_options(synchronize_session="fetch")
+    )
@@ -1,7 +1,8 @@
-from collections.abc import Callable
+from collections.abc import Callable, Iterable
 from typing import Type, TypedDict
 
-from sqlalchemy.orm import Mapped, Query, Session
+from sqlalchemy import ColumnElement, Integer, and_, func, literal_column, select
+from sqlalchemy.orm import Mapped, Query, Session, aliased
 
 from db.models.base import BaseOrderedItem
 from error.exceptions import ErrorCode, UserFriendlyError
@@ -13,6 +14,10 @@ class NewOrder(TypedDict):
     left_id: int | None
 
 
+class ListMove(NewOrder):
+    list_id: int
+
+
 def update_element_order[
     TOrderedItemClass: BaseOrderedItem
 ](
@@ -23,17 +28,7 @@ def update_element_order[
     moving_item: NewOrder,
     create_order: Callable[[int, int | None, int | None], None],
 ):
-    if (
-        moving_item["item_id"] == moving_item["left_id"]
-        or moving_item["item_id"] == moving_item["right_id"]
-        or (
-            moving_item["left_id"] is not None
-            and moving_item["left_id"] == moving_item["right_id"]
-        )
-    ):
-        raise UserFriendlyError(
-            ErrorCode.INVALID_INPUT, "inputs values create a cyclic order"
-        )
+    validate_new_order(moving_item)
 
     # the validation that moving_id, id, next_id exists and belongs to user is callers responsibility
     _remove_item_from_sorted_items_in_position(
@@ -79,6 +74,125 @@ def update_element_order[
     db.flush()
 
 
+def get_linked_list_positions[
+    TOrderedItemClass: BaseOrderedItem
+](
+    order_class: Type[TOrderedItemClass],
+    item_id_column: Mapped[int],
+    scope: Callable[[Type[TOrderedItemClass]], ColumnElement[bool]],
+    list_id_column: Mapped[int] | None = None,
+):
+    """returns a subquery of (item_id, position) that walks the linked lists with a recursive CTE
+
+    :param scope: returns the filter of the orders of the lists for the given (aliased) order class,
+        for example: lambda order: order.project_id == project_id
+    :param list_id_column: needed when the scope has several lists that can hold the same item (a
+        category is in the list of every project it belongs to), the subquery also returns it and
+        the walk doesn't cross from one list to another
+    every list starts from its head (left_id = null) with position 0, items that are not reachable
+    from the head of their list (broken links) are not returned
+    """
+
+    item_id_key = item_id_column.key
+    list_id_keys = [list_id_column.key] if list_id_column is not None else []
+    positions = (
+        select(
+            getattr(order_class, item_id_key).label("item_id"),
+            literal_column("0", Integer).label("position"),
+            *[getattr(order_class, key).label(key) for key in list_id_keys],
+        )
+        .where(scope(order_class), order_class.left_id == None)
+        .cte("positions", recursive=True)
+    )
+
+    next_order = aliased(order_class)
+    list_length = (
+        select(func.count()).select_from(order_class).where(scope(order_class))
+    ).scalar_subquery()
+
+    return positions.union_all(
+        select(
+            getattr(next_order, item_id_key),
+            positions.c.position + literal_column("1", Integer),
+            *[getattr(next_order, key) for key in list_id_keys],
+        ).join(
+            positions,
+            and_(
+                next_order.left_id == positions.c.item_id,
+                *[getattr(next_order, key) == positions.c[key] for key in list_id_keys],
+            ),
+        )
+        # the walk can't be longer than the list, this guards against cycles in corrupted lists
+        .where(scope(next_order), positions.c.position < list_length)
+    )
+
+
+def apply_moves(lists: dict[int, list[int]], moves: Iterable[ListMove]):
+    """applies the moves one after another on in memory lists of item ids
+
+    :param lists: the item ids of each list in order, it's updated in place
+    the moving item is placed right after `left_id` if it's provided (`right_id` must be the next item
+    in that case), right before `right_id` if only `right_id` is provided and at the end of the
+    list if none of them are provided
+    """
+
+    item_lists = {
+        item_id: list_id for list_id, item_ids in lists.items() for item_id in item_ids
+    }
+
+    for move in moves:
+        validate_new_order(move)
+
+        if move["list_id"] not in lists:
+            raise UserFriendlyError(
+                ErrorCode.INVALID_INPUT, "the destination list is not loaded"
+            )
+
+        source_list_id = item_lists.get(move["item_id"])
+        if source_list_id is not None:
+            lists[source_list_id].remove(move["item_id"])
+
+        target = lists[move["list_id"]]
+        index = len(target)
+        try:
+            if move["left_id"] is not None:
+                index = target.index(move["left_id"]) + 1
+            elif move["right_id"] is not None:
+                index = target.index(move["right_id"])
+        except ValueError:
+            raise UserFriendlyError(
+                ErrorCode.INVALID_INPUT,
+                "the provided left or right items are not in the same list as the moving item",
+            )
+
+        if (
+            move["left_id"] is not None
+            and move["right_id"] is not None
+            and (index == len(target) or target[index] != move["right_id"])
+        ):
+            raise UserFriendlyError(
+                ErrorCode.INVALID_INPUT,
+                "the provided left and right items are not next to each other",
+            )
+
+        target.insert(index, move["item_id"])
+        item_lists[move["item_id"]] = move["list_id"]
+
+
+def validate_new_order(moving_item: NewOrder):
+    if (
+        moving_item["item_id"] == moving_item["left_id"]
+        or moving_item["item_id"] == moving_item["right_id"]
+        or (
+            moving_item["left_id"] is not None
+            and moving_item["left_id"] == moving_item["right_id"]
+        )
+    ):
+        raise UserFriendlyError(
+            ErrorCode.INVALID_INPUT, "inputs values create a cyclic order"
+        )
+
+
 def delete_item_from_sorted_items[
     TOrderedItemClass: BaseOrderedItem
 ](
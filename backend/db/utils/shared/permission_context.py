@@ -0,0 +1,305 @@
+import typing
+from collections.abc import Iterable
+
+from sqlalchemy import and_, null, select
+from sqlalchemy.orm import Session
+
+from db.models.project_user_association import ProjectUserAssociation
+from db.models.todo_category_project_association import TodoCategoryProjectAssociation
+from db.models.todo_item import TodoItem
+from db.models.user_project_permission import Permission, UserProjectPermission
+from db.utils.shared.permission_query import PermissionsType
+
+_SESSION_INFO_KEY = "permission_context"
+
+# None means that the user doesn't have access to the project
+_ProjectPermissions = frozenset[Permission] | None
+
+
+class PermissionContext:
+    """caches the permissions of users per project for the lifetime of a session
+
+    bind it to request-scoped sessions only, permission changes made by other sessions are not seen
+    by a context after the permissions of a project are loaded into it
+    """
+
+    def __init__(self):
+        self._project_permissions: dict[tuple[int, int], _ProjectPermissions] = {}
+        self._category_projects: dict[int, frozenset[int]] = {}
+        self._todo_categories: dict[int, int | None] = {}
+
+    @staticmethod
+    def bind(db: Session) -> "PermissionContext":
+        context = PermissionContext.of(db)
+
+        if context is None:
+            context = PermissionContext()
+            db.info[_SESSION_INFO_KEY] = context
+
+        return context
+
+    @staticmethod
+    def of(db: Session) -> "PermissionContext | None":
+        return db.info.get(_SESSION_INFO_KEY)
+
+    def get_project_verdicts(
+        self,
+        db: Session,
+        project_ids: Iterable[int],
+        user_id: int,
+        permissions: PermissionsType,
+    ):
+        project_ids = list(dict.fromkeys(project_ids))
+        self._load_project_permissions(db, project_ids, user_id)
+
+        return {
+            project_id: _is_permitted(
+                self._project_permissions[(user_id, project_id)], permissions
+            )
+            for project_id in project_ids
+        }
+
+    def get_category_verdicts(
+        self,
+        db: Session,
+        category_ids: Iterable[int],
+        user_id: int,
+        permissions: PermissionsType,
+    ):
+        category_ids = list(dict.fromkeys(category_ids))
+        missing_category_ids = [
+            category_id
+            for category_id in category_ids
+            if category_id not in self._category_projects
+        ]
+
+        if len(missing_category_ids) > 0:
+            self._store_rows(
+                user_id,
+                db.execute(
+                    self._with_project_permissions(
+                        select(
+                            null(), TodoCategoryProjectAssociation.category_id
+                        ).where(
+                            TodoCategoryProjectAssociation.category_id.in_(
+                                missing_category_ids
+                            )
+                        ),
+                        user_id,
+                    )
+                ).tuples(),
+                missing_category_ids,
+                [],
+            )
+
+        return {
+            category_id: self._is_category_permitted(
+                db, category_id, user_id, permissions
+            )
+            for category_id in category_ids
+        }
+
+    def get_todo_item_verdicts(
+        self,
+        db: Session,
+        todo_ids: Iterable[int],
+        user_id: int,
+        permissions: PermissionsType,
+    ):
+        todo_ids = list(dict.fromkeys(todo_ids))
+        missing_todo_ids = [
+            todo_id for todo_id in todo_ids if todo_id not in self._todo_categories
+        ]
+
+        if len(missing_todo_ids) > 0:
+            self._store_rows(
+                user_id,
+                db.execute(
+                    self._with_project_permissions(
+                        select(TodoItem.id, TodoItem.category_id).where(
+                            TodoItem.id.in_(missing_todo_ids)
+                        ),
+                        user_id,
+                        TodoCategoryProjectAssociation.category_id
+                        == TodoItem.category_id,
+                    )
+                ).tuples(),
+                [],
+                missing_todo_ids,
+            )
+
+        verdicts: dict[int, bool] = {}
+        for todo_id in todo_ids:
+            category_id = self._todo_categories[todo_id]
+            verdicts[todo_id] = category_id is not None and self._is_category_permitted(
+                db, category_id, user_id, permissions
+            )
+
+        return verdicts
+
+    def invalidate_project(self, project_id: int):
+        self._project_permissions = {
+            key: value
+            for key, value in self._project_permissions.items()
+            if key[1] != project_id
+        }
+
+    def invalidate_categories(self, category_ids: Iterable[int]):
+        for category_id in category_ids:
+            self._category_projects.pop(category_id, None)
+
+    def invalidate_todo_items(self, todo_ids: Iterable[int]):
+        for todo_id in todo_ids:
+            self._todo_categories.pop(todo_id, None)
+
+    def _is_category_permitted(
+        self,
+        db: Session,
+        category_id: int,
+        user_id: int,
+        permissions: PermissionsType,
+    ):
+        project_ids = self._category_projects.get(category_id, frozenset())
+        self._load_project_permissions(db, project_ids, user_id)
+
+        return any(
+            _is_permitted(self._project_permissions[(user_id, project_id)], permissions)
+            for project_id in project_ids
+        )
+
+    def _load_project_permissions(
+        self, db: Session, project_ids: Iterable[int], user_id: int
+    ):
+        missing_project_ids = [
+            project_id
+            for project_id in project_ids
+            if (user_id, project_id) not in self._project_permissions
+        ]
+
+        if len(missing_project_ids) == 0:
+            return
+
+        for project_id in missing_project_ids:
+            self._project_permissions[(user_id, project_id)] = None
+
+        permissions_per_project: dict[int, set[Permission]] = {}
+        for project_id, permission in db.execute(
+            select(ProjectUserAssociation.project_id, UserProjectPermission.permission)
+            .outerjoin(
+                UserProjectPermission,
+                UserProjectPermission.project_user_association_id
+                == ProjectUserAssociation.id,
+            )
+            .where(
+                ProjectUserAssociation.user_id == user_id,
+                ProjectUserAssociation.project_id.in_(missing_project_ids),
+            )
+        ).tuples():
+            project_permissions = permissions_per_project.setdefault(project_id, set())
+            if permission is not None:
+                project_permissions.add(permission)
+
+        for project_id, project_permissions in permissions_per_project.items():
+            self._project_permissions[(user_id, project_id)] = frozenset(
+                project_permissions
+            )
+
+    @staticmethod
+    def _with_project_permissions(
+        query, user_id: int, category_join_condition: typing.Any = None
+    ):
+        """extends a select of (todo_id, category_id) with the projects of the category and the permissions of the user in them"""
+
+        if category_join_condition is not None:
+            query = query.outerjoin(
+                TodoCategoryProjectAssociation, category_join_condition
+            )
+
+        return (
+            query.add_columns(
+                TodoCategoryProjectAssociation.project_id,
+                ProjectUserAssociation.id,
+                UserProjectPermission.permission,
+            )
+            .outerjoin(
+                ProjectUserAssociation,
+                and_(
+                    ProjectUserAssociation.project_id
+                    == TodoCategoryProjectAssociation.project_id,
+                    ProjectUserAssociation.user_id == user_id,
+                ),
+            )
+            .outerjoin(
+                UserProjectPermission,
+                UserProjectPermission.project_user_association_id
+                == ProjectUserAssociation.id,
+            )
+        )
+
+    def _store_rows(
+        self,
+        user_id: int,
+        rows: Iterable[
+            tuple[int | None, int | None, int | None, int | None, Permission | None]
+        ],
+        loaded_category_ids: list[int],
+        loaded_todo_ids: list[int],
+    ):
+        # every loaded id gets an entry even if it doesn't exist, so it won't be queried again
+        todo_categories: dict[int, int | None] = {
+            todo_id: None for todo_id in loaded_todo_ids
+        }
+        category_projects: dict[int, set[int]] = {
+            category_id: set() for category_id in loaded_category_ids
+        }
+        project_permissions: dict[int, set[Permission] | None] = {}
+
+        for todo_id, category_id, project_id, association_id, permission in rows:
+            if todo_id is not None:
+                todo_categories[todo_id] = category_id
+            if category_id is None:
+                continue
+
+            projects = category_projects.setdefault(category_id, set())
+            if project_id is None:
+                continue
+            projects.add(project_id)
+
+            if association_id is None:
+                project_permissions[project_id] = None
+                continue
+
+            permissions = project_permissions.setdefault(project_id, set())
+            if permissions is not None and permission is not None:
+                permissions.add(permission)
+
+        self._todo_categories.update(todo_categories)
+        for category_id, projects in category_projects.items():
+            self._category_projects.setdefault(category_id, frozenset(projects))
+        for project_id, permissions in project_permissions.items():
+            self._project_permissions.setdefault(
+                (user_id, project_id),
+                frozenset(permissions) if permissions is not None else None,
+            )
+
+
+def _is_permitted(
+    project_permissions: _ProjectPermissions, permissions: PermissionsType
+):
+    if permissions is not None and len(permissions) == 0:
+        raise Exception("permissions cannot be empty, did meant to pass None?")
+
+    if project_permissions is None:
+        return False
+
+    if permissions is None or Permission.ALL in project_permissions:
+        return True
+
+    return all(
+        (
+            permission in project_permissions
+            if isinstance(permission, Permission)
+            else len(permission & project_permissions) > 0
+        )
+        for permission in permissions
+    )
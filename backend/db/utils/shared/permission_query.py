@@ -1,10 +1,9 @@
 import typing
+from collections.abc import Iterable
 
-from sqlalchemy import and_
-from sqlalchemy.orm import Query
+from sqlalchemy import Select, and_, case, func, or_, select
+from sqlalchemy.orm import Session
 
-from db.models.base import Base
-from db.models.project import Project
 from db.models.project_user_association import ProjectUserAssociation
 from db.models.user_project_permission import Permission, UserProjectPermission
 from error.exceptions import ErrorCode, UserFriendlyError
@@ -12,63 +11,111 @@ from error.exceptions import ErrorCode, UserFriendlyError
 PermissionsType = typing.Sequence[Permission | set[Permission]] | None
 
 
-def join_with_permission_query_if_required[
-    T: Base
-](query: Query[T], permissions: PermissionsType):
-    """join the the current query with a permissions query
-
-    :param permissions: takes an array of permissions, for example: 1- has A and B = [A, B], 2- has (A or B) and C = [{A, B}, C]
-    Return: a new query with permissions query joined with it
+def get_permission_verdicts[
+    TKey
+](
+    db: Session,
+    scope: Select[tuple[TKey]],
+    keys: Iterable[TKey],
+    permissions: PermissionsType,
+) -> dict[TKey, bool]:
+    """resolve ownership and permissions of a batch of items with a single query
+
+    :param scope: a select of the column that identifies the items (usually their id) which is
+        already joined with `ProjectUserAssociation` and filtered by the current user, for example:
+            select(Tag.id)
+            .join(ProjectUserAssociation, ProjectUserAssociation.project_id == Tag.project_id)
+            .where(ProjectUserAssociation.user_id == user_id)
+    :param permissions: takes an array of permissions, for example: 1- has A and B = [A, B],
+        2- has (A or B) and C = [{A, B}, C] (`Permission.ALL` always satisfies the expression),
+        None only checks the ownership
+    Return: a verdict per key, keys that don't exist or don't belong to the user are False
     """
 
-    if permissions is None:
-        return query
-
-    expanded_permissions: list[Permission] = []
-    for permission in permissions:
-        if isinstance(permission, Permission):
-            expanded_permissions.append(permission)
-            continue
-        expanded_permissions.extend(typing.cast(tuple[Permission], permission))
-
-    if len(expanded_permissions) == 0:
-        raise Exception(
-            "expanded_permissions length cannot be empty, did meant to pass None?"
-        )
-
-    if any(permission == Permission.ALL for permission in expanded_permissions):
-        expanded_permissions = [Permission.ALL]
+    verdicts = {key: False for key in keys}
 
-    if any(permission != Permission.ALL for permission in expanded_permissions):
-        expanded_permissions = expanded_permissions + [Permission.ALL]
+    if len(verdicts) == 0:
+        return verdicts
 
-    # TODO: THERE SHOULD BE A BETTER WAY, but the purpose is that the query should already be joined with Projects table
-    # because if its not we are not sure whose expanded_permissions we are checking
-    if not any(joins[0].parent.entity == Project for joins in query._setup_joins):  # type: ignore
-        raise Exception("query should be already joined with Project table")
+    key_column = scope.selected_columns[0]
+    scope = scope.where(key_column.in_(verdicts.keys()))
 
-    # TODO: THERE SHOULD BE A BETTER WAY, but the purpose is that the query should not already be joined with UserProjectPermission table
-    # otherwise we would be joining to UserProjectPermission table twice
-    if any(
-        joins[0].parent.entity == UserProjectPermission for joins in query._setup_joins  # type: ignore
-    ):
-        raise Exception("query is already joined with UserProjectPermission")
-
-    query = query.join(ProjectUserAssociation.permissions).filter(
-        UserProjectPermission.permission.in_(expanded_permissions)
+    if permissions is None:
+        for key in db.scalars(scope.distinct()):
+            verdicts[key] = True
+        return verdicts
+
+    # an item can belong to multiple projects, so the expression is resolved per association
+    # and the item is permitted if any of its associations satisfies it
+    verdicts_per_association = (
+        scope.add_columns(_permission_expression(permissions).label("is_permitted"))
+        .outerjoin(
+            UserProjectPermission,
+            UserProjectPermission.project_user_association_id
+            == ProjectUserAssociation.id,
+        )
+        .group_by(key_column, ProjectUserAssociation.id)
+        .subquery()
     )
 
-    return query
+    key, is_permitted = verdicts_per_association.c
+    for row in db.execute(select(key, func.max(is_permitted)).group_by(key)).tuples():
+        verdicts[row[0]] = row[1] == 1
 
+    return verdicts
 
-def validate_item_exists_with_permissions(
-    query: Query,
+
+def validate_items_exist_with_permissions[
+    TKey
+](
+    db: Session,
+    scope: Select[tuple[TKey]],
+    keys: Iterable[TKey],
     permissions: PermissionsType,
     error_code: ErrorCode,
     error_message: str,
 ):
-    if query.count() < (len(permissions) if permissions is not None else 1):
+    verdicts = get_permission_verdicts(db, scope, keys, permissions)
+
+    if not all(verdicts.values()):
         raise UserFriendlyError(
             error_code,
             error_message,
         )
+
+
+def _permission_expression(permissions: typing.Sequence[Permission | set[Permission]]):
+    if len(permissions) == 0 or any(
+        len(permission) == 0
+        for permission in permissions
+        if not isinstance(permission, Permission)
+    ):
+        raise Exception("permissions cannot be empty, did meant to pass None?")
+
+    required_permissions = and_(
+        *(
+            or_(
+                *(
+                    _has_permission(option)
+                    for option in (
+                        [permission]
+                        if isinstance(permission, Permission)
+                        else permission
+                    )
+                )
+            )
+            for permission in permissions
+        )
+    )
+
+    return case(
+        (or_(_has_permission(Permission.ALL), required_permissions), 1),
+        else_=0,
+    )
+
+
+def _has_permission(permission: Permission):
+    return (
+        func.max(case((UserProjectPermission.permission == permission, 1), else_=0))
+        == 1
+    )
@@ -0,0 +1,112 @@
+import math
+
+# the digits are ordered the same way in byte-wise and in the common locale aware collations,
+# so `ORDER BY rank` sorts the keys correctly without any database specific collation
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+
+def rank_between(left: str | None, right: str | None) -> str:
+    """returns a key that sorts after `left` and before `right`
+
+    keys are the fractional digits of a number in [0, 1) without the trailing zeros,
+    so there is always room for a new key between two different keys
+    :param left: the key of the previous item or None if there is no previous item
+    :param right: the key of the next item or None if there is no next item
+    """
+
+    if left is not None and right is not None and left >= right:
+        raise ValueError(f"{left} must be smaller than {right}")
+
+    for key in (left, right):
+        if key is not None and (key == "" or key.endswith(DIGITS[0])):
+            raise ValueError(f"invalid rank key: {key}")
+
+    # moving to the start or the end of a list is the most common move, so instead of taking
+    # the midpoint a single digit is stepped, that way the keys grow one digit per ~BASE moves
+    if right is None and left is not None:
+        for index, digit in enumerate(left):
+            if digit != DIGITS[-1]:
+                return left[:index] + DIGITS[DIGITS.index(digit) + 1]
+
+    if left is None and right is not None:
+        for index, digit in enumerate(right):
+            if DIGITS.index(digit) > 1:
+                return right[:index] + DIGITS[DIGITS.index(digit) - 1]
+
+    return _midpoint(left or "", right)
+
+
+def ranks_between(left: str | None, right: str | None, count: int) -> list[str]:
+    """returns `count` ascending keys between `left` and `right`
+
+    the range is split in halves, so the keys only grow logarithmically with `count`
+    """
+
+    if count == 0:
+        return []
+
+    middle = rank_between(left, right)
+    half = count // 2
+
+    return (
+        ranks_between(left, middle, half)
+        + [middle]
+        + ranks_between(middle, right, count - half - 1)
+    )
+
+
+def evenly_spaced_ranks(count: int) -> list[str]:
+    """returns `count` ascending keys which are spread evenly with the shortest possible length"""
+
+    if count == 0:
+        return []
+
+    width = 1
+    while BASE**width <= count:
+        width += 1
+
+    ranks = []
+    for index in range(1, count + 1):
+        value = index * BASE**width // (count + 1)
+        ranks.append(_to_digits(value, width).rstrip(DIGITS[0]))
+
+    return ranks
+
+
+def _midpoint(left: str, right: str | None) -> str:
+    if right is not None:
+        # the shared prefix is kept and the midpoint of the remaining digits is appended
+        prefix_length = 0
+        while (
+            prefix_length < len(right)
+            and (left[prefix_length] if prefix_length < len(left) else DIGITS[0])
+            == right[prefix_length]
+        ):
+            prefix_length += 1
+
+        if prefix_length > 0:
+            return right[:prefix_length] + _midpoint(
+                left[prefix_length:], right[prefix_length:]
+            )
+
+    left_digit = DIGITS.index(left[0]) if len(left) > 0 else 0
+    right_digit = DIGITS.index(right[0]) if right is not None else BASE
+
+    if right_digit - left_digit > 1:
+        return DIGITS[math.ceil((left_digit + right_digit) / 2)]
+
+    # the first digits are consecutive
+    if right is not None and len(right) > 1:
+        return right[:1]
+
+    return DIGITS[left_digit] + _midpoint(left[1:], None)
+
+
+def _to_digits(value: int, width: int):
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, BASE)
+        digits.append(DIGITS[digit])
+
+    return "".join(reversed(digits))
@@ -0,0 +1,288 @@
+import logging
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Type
+
+from sqlalchemy import Connection, Engine, event, func, select
+from sqlalchemy.orm import Mapped, Query, Session
+
+from config import settings
+from db.db import SYNC_BIND_INFO_KEY
+from db.models.base import BaseOrderedItem
+from db.utils.shared.ordered_item import NewOrder, validate_new_order
+from db.utils.shared.rank import evenly_spaced_ranks, rank_between, ranks_between
+from error.exceptions import ErrorCode, UserFriendlyError
+
+_SESSION_INFO_KEY = "pending_rank_rebalances"
+
+_logger = logging.getLogger(__name__)
+_rebalancer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rank-rebalancer")
+
+
+@dataclass(frozen=True)
+class RankedList[TOrderedItemClass: BaseOrderedItem]:
+    """the orders of a single list and the row that owns the list (its category or project)
+
+    the rank changes of a list lock the owner row until they are committed, so the moves and the
+    rebalances of the same list are applied one after another and each of them reads the ranks
+    that the previous one committed
+    """
+
+    order_class: Type[TOrderedItemClass]
+    owner_id_column: Mapped[int]
+    owner_id: int
+    # a query of the orders of the list in the given session (it shouldn't contain joins, because
+    # it's used for updating the orders as well)
+    get_orders: Callable[[Session], Query[TOrderedItemClass]]
+    # records the new ranks of a rebalance like any other change of the list (the versions of the
+    # projects, the change log and the project events) in the transaction of the rebalance
+    log_rebalance: Callable[[Session], None]
+
+    def lock(self, db: Session):
+        # sqlite ignores `FOR UPDATE`, it allows a single writer at a time anyway
+        db.execute(
+            select(self.owner_id_column)
+            .where(self.owner_id_column == self.owner_id)
+            .with_for_update()
+        )
+
+
+def update_element_rank[
+    TOrderedItemClass: BaseOrderedItem
+](
+    db: Session,
+    ranked_list: RankedList[TOrderedItemClass],
+    item_id_column: Mapped[int],
+    moving_item: NewOrder,
+    create_order: Callable[[int, str], None],
+):
+    """moves an item between its new neighbours by giving it a new rank
+
+    :param ranked_list: the list that the item is moving in, it's locked until the move is committed
+    the moving item is placed right after `left_id` if only `left_id` is provided, right before
+    `right_id` if only `right_id` is provided and at the end of the list if none of them are provided
+    """
+
+    validate_new_order(moving_item)
+
+    ranked_list.lock(db)
+    order_class = ranked_list.order_class
+    order_query = ranked_list.get_orders(db)
+
+    # the validation that moving_id, id, next_id exists and belongs to user is callers responsibility
+    other_items = order_query.filter(item_id_column != moving_item["item_id"])
+    left_rank, right_rank = _get_neighbour_ranks(
+        other_items, order_class, item_id_column, moving_item
+    )
+
+    if left_rank is None and right_rank is None and moving_item["left_id"] is None:
+        left_rank = other_items.with_entities(func.max(order_class.rank)).scalar()
+    elif right_rank is None and left_rank is not None:
+        right_rank = (
+            other_items.filter(order_class.rank > left_rank)
+            .with_entities(func.min(order_class.rank))
+            .scalar()
+        )
+    elif left_rank is None and right_rank is not None:
+        left_rank = (
+            other_items.filter(order_class.rank < right_rank)
+            .with_entities(func.max(order_class.rank))
+            .scalar()
+        )
+
+    if left_rank is not None and right_rank is not None and left_rank >= right_rank:
+        raise UserFriendlyError(
+            ErrorCode.INVALID_INPUT,
+            "the left item must be placed before the right item",
+        )
+
+    rank = rank_between(left_rank, right_rank)
+
+    if (
+        order_query.filter(item_id_column == moving_item["item_id"]).update(
+            {"rank": rank}, synchronize_session="fetch"
+        )
+        == 0
+    ):
+        create_order(moving_item["item_id"], rank)
+
+    db.flush()
+
+    if len(rank) > settings.RANK_MAX_LENGTH:
+        # the rebalance starts after the move is committed, so it sees the new rank
+        schedule_rebalance(db, ranked_list)
+
+    return rank
+
+
+def delete_item_from_ranked_items[
+    TOrderedItemClass: BaseOrderedItem
+](
+    db: Session,
+    order_query: Query[TOrderedItemClass],
+    item_id_column: Mapped[int],
+    deleting_item_id: int,
+):
+    # removing an item doesn't affect the rank of the other items
+    order_query.filter(item_id_column == deleting_item_id).delete(
+        synchronize_session="fetch"
+    )
+    db.flush()
+
+
+def rebalance_ranks[
+    TOrderedItemClass: BaseOrderedItem
+](order_class: Type[TOrderedItemClass], order_query: Query[TOrderedItemClass],):
+    """replaces the ranks of a list with the shortest evenly spaced keys, keeping the current order"""
+
+    orders = order_query.order_by(
+        order_class.rank.asc().nulls_last(), order_class.id.asc()
+    ).all()
+
+    for order, rank in zip(orders, evenly_spaced_ranks(len(orders))):
+        order.rank = rank
+
+
+def rank_moved_items(
+    item_ids: list[int], ranks: dict[int, str | None], moved_item_ids: set[int]
+):
+    """returns the new ranks of the items that need one after `item_ids` is reordered in memory
+
+    the items that didn't move keep their rank and the moved items (and the items without a rank)
+    between two of them get evenly spread keys in between
+    """
+
+    new_ranks: dict[int, str] = {}
+    moved_run: list[int] = []
+    previous_rank: str | None = None
+
+    for item_id in [*item_ids, None]:
+        rank = ranks.get(item_id) if item_id is not None else None
+
+        if item_id is not None and (
+            item_id in moved_item_ids
+            or rank is None
+            or (previous_rank is not None and rank <= previous_rank)
+        ):
+            moved_run.append(item_id)
+            continue
+
+        new_ranks.update(
+            zip(moved_run, ranks_between(previous_rank, rank, len(moved_run)))
+        )
+        moved_run = []
+        previous_rank = rank
+
+    return new_ranks
+
+
+def schedule_rebalance(db: Session, ranked_list: RankedList):
+    """rebalances the ranks of the list in its own transaction after the current transaction is committed"""
+
+    db.info.setdefault(_SESSION_INFO_KEY, []).append(ranked_list)
+
+
+def sort_by_links[
+    TOrderedItemClass: BaseOrderedItem
+](orders: Sequence[TOrderedItemClass], get_item_id: Callable[[TOrderedItemClass], int]):
+    """sorts the orders of a single list by following their left_id/right_id links
+
+    items that are not reachable from the head of the list (broken links) are placed at the end
+    """
+
+    orders_by_item_id = {get_item_id(order): order for order in orders}
+    heads = [
+        order
+        for order in orders
+        if order.left_id is None or order.left_id not in orders_by_item_id
+    ]
+
+    sorted_orders: list[TOrderedItemClass] = []
+    visited_item_ids: set[int] = set()
+
+    for head in sorted(heads, key=get_item_id):
+        order = head
+        while order is not None and get_item_id(order) not in visited_item_ids:
+            visited_item_ids.add(get_item_id(order))
+            sorted_orders.append(order)
+            order = (
+                orders_by_item_id.get(order.right_id)
+                if order.right_id is not None
+                else None
+            )
+
+    sorted_orders.extend(
+        order
+        for order in sorted(orders, key=get_item_id)
+        if get_item_id(order) not in visited_item_ids
+    )
+
+    return sorted_orders
+
+
+def _get_neighbour_ranks[
+    TOrderedItemClass: BaseOrderedItem
+](
+    other_items: Query[TOrderedItemClass],
+    order_class: Type[TOrderedItemClass],
+    item_id_column: Mapped[int],
+    moving_item: NewOrder,
+):
+    neighbour_ids = [
+        id for id in [moving_item["left_id"], moving_item["right_id"]] if id is not None
+    ]
+
+    if len(neighbour_ids) == 0:
+        return None, None
+
+    ranks: dict[int, str | None] = dict(
+        other_items.filter(item_id_column.in_(neighbour_ids))
+        .with_entities(item_id_column, order_class.rank)
+        .tuples()
+        .all()
+    )
+
+    if any(ranks.get(id) is None for id in neighbour_ids):
+        raise UserFriendlyError(
+            ErrorCode.INVALID_INPUT,
+            "the provided left or right items are not in the same list as the moving item",
+        )
+
+    return (
+        ranks[moving_item["left_id"]] if moving_item["left_id"] is not None else None,
+        ranks[moving_item["right_id"]] if moving_item["right_id"] is not None else None,
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _start_pending_rebalances(db: Session):
+    pending_rebalances = db.info.pop(_SESSION_INFO_KEY, [])
+
+    if len(pending_rebalances) > 0:
+        # sessions of an async engine can't be used from other threads, so they provide a sync bind
+        bind = db.info.get(SYNC_BIND_INFO_KEY) or db.get_bind()
+        # the rebalance checks out its own connection instead of sharing the one of the request
+        engine = bind.engine if isinstance(bind, Connection) else bind
+        _rebalancer.submit(_rebalance, engine, pending_rebalances)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_rebalances(db: Session):
+    db.info.pop(_SESSION_INFO_KEY, None)
+
+
+def _rebalance(engine: Engine, pending_rebalances: list[RankedList]):
+    # a list may be scheduled more than once, rebalancing it again is harmless
+    for ranked_list in pending_rebalances:
+        # each list is locked in its own short transaction and its orders are read after the lock
+        # is taken, so the moves that were committed in the meantime are kept
+        try:
+            with Session(bind=engine) as db:
+                ranked_list.lock(db)
+                rebalance_ranks(ranked_list.order_class, ranked_list.get_orders(db))
+                db.flush()
+                ranked_list.log_rebalance(db)
+                db.commit()
+        except Exception:
+            _logger.exception("rebalancing the ranks failed")
@@ -0,0 +1,173 @@
+import datetime
+import logging
+import sys
+import threading
+from collections import deque
+from collections.abc import Iterator, Mapping, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import Connection
+
+from config import settings
+from db.schemas.slow_query import SlowQuery
+
+# the sets of parameters of an executemany that are kept
+_MAX_PARAMETER_SETS = 10
+
+_EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+_logger = logging.getLogger(__name__)
+
+_route: ContextVar[str | None] = ContextVar("slow_query_route", default=None)
+
+_lock = threading.Lock()
+# the latest slow queries, the oldest ones are dropped first
+_slow_queries: deque[SlowQuery] = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+
+
+@contextmanager
+def route_queries(route: str) -> Iterator[None]:
+    """attributes the slow queries that are executed inside it to the route"""
+
+    token = _route.set(route)
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+def is_slow_query(duration: float):
+    return (
+        settings.SLOW_QUERY_THRESHOLD_MS is not None
+        and duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS
+    )
+
+
+def record_slow_query(
+    connection: Connection,
+    statement: str,
+    parameters: Any,
+    executemany: bool,
+    duration: float,
+):
+    """logs the statement and keeps it in the slow query log, with its plan if SLOW_QUERY_EXPLAIN is
+    enabled (the plan is captured on the same connection, right after the statement)
+    """
+
+    slow_query = SlowQuery(
+        statement=statement,
+        parameters=(
+            [
+                _redact(parameter_set)
+                for parameter_set in parameters[:_MAX_PARAMETER_SETS]
+            ]
+            if executemany
+            else _redact(parameters)
+        ),
+        duration_ms=round(duration * 1000, 3),
+        route=_route.get(),
+        caller=_find_caller(),
+        plan=(
+            _explain(connection, statement, parameters)
+            if settings.SLOW_QUERY_EXPLAIN and not executemany
+            else None
+        ),
+        created_date=datetime.datetime.now(datetime.UTC),
+    )
+
+    _logger.warning(
+        "slow query (%.1fms) in %s from %s: %s",
+        slow_query.duration_ms,
+        slow_query.route,
+        slow_query.caller,
+        statement,
+        extra=slow_query.model_dump(),
+    )
+
+    with _lock:
+        _slow_queries.append(slow_query)
+
+
+def get_slow_queries() -> list[SlowQuery]:
+    """the slow queries in the log, the latest one first"""
+
+    with _lock:
+        return list(reversed(_slow_queries))
+
+
+def clear_slow_queries():
+    with _lock:
+        _slow_queries.clear()
+
+
+def _redact(parameters: Any) -> Any:
+    if isinstance(parameters, Mapping):
+        return {str(key): _redact_value(value) for key, value in parameters.items()}
+
+    if isinstance(parameters, Sequence) and not isinstance(parameters, str | bytes):
+        return [_redact_value(value) for value in parameters]
+
+    return None
+
+
+def _redact_value(value: Any):
+    # ids, flags and dates help to reproduce the query and don't reveal the users' data
+    if value is None or isinstance(
+        value, bool | int | float | datetime.date | datetime.time
+    ):
+        return value
+
+    return f"<{type(value).__name__}>"
+
+
+def _find_caller():
+    # the innermost function of the cruds that led to the statement
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("db.utils.") and module != __name__:
+            return f"{module}.{frame.f_code.co_qualname}"
+        frame = frame.f_back
+
+    return None
+
+
+def _explain(connection: Connection, statement: str, parameters: Any):
+    # EXPLAIN ANALYZE runs the statement again, so only the reads are explained
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return None
+
+    match connection.dialect.name:
+        case "sqlite":
+            explain = "EXPLAIN QUERY PLAN "
+        case "postgresql" if settings.SLOW_QUERY_EXPLAIN_ANALYZE:
+            explain = "EXPLAIN (ANALYZE, BUFFERS) "
+        case "postgresql":
+            explain = "EXPLAIN "
+        case _:
+            return None
+
+    # the dbapi cursor doesn't go through the engine's events, so it isn't timed or logged again
+    cursor = connection.connection.cursor()
+    try:
+        # the plan is captured inside the transaction of the request, a failed statement would
+        # abort it on postgresql, so the explain is undone up to the savepoint when it fails
+        cursor.execute(f"SAVEPOINT {_EXPLAIN_SAVEPOINT}")
+        try:
+            cursor.execute(explain + statement, parameters)
+            # sqlite's rows are (id, parent, notused, detail), postgresql's have a single line of
+            # text
+            plan = [str(row[-1]) for row in cursor.fetchall()]
+        except Exception:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {_EXPLAIN_SAVEPOINT}")
+            raise
+        finally:
+            cursor.execute(f"RELEASE SAVEPOINT {_EXPLAIN_SAVEPOINT}")
+        return plan
+    except Exception:
+        _logger.exception("explaining the slow query failed")
+        return None
+    finally:
+        cursor.close()
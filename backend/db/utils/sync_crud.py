@@ -0,0 +1,243 @@
+from collections import defaultdict
+from collections.abc import Collection
+from typing import Any
+
+from sqlalchemy import Select, and_, func, or_, select
+from sqlalchemy.orm import Session, selectinload
+
+from db.models.change_log import (
+    ChangedEntity,
+    ChangeLogCompaction,
+    ChangeLogEntry,
+    ChangeOperation,
+)
+from db.models.project import Project
+from db.models.project_user_association import ProjectUserAssociation
+from db.models.tag import Tag
+from db.models.todo_category import TodoCategory
+from db.models.todo_category_project_association import TodoCategoryProjectAssociation
+from db.models.todo_item import TodoItem
+from db.models.todo_item_comments import TodoItemComment
+from db.utils.order_positions import (
+    get_project_category_positions,
+    get_todo_item_positions,
+)
+from db.utils.project_crud import load_project_users
+from db.utils.todo_category_crud import todo_item_loader_options
+
+
+def get_changes(db: Session, since: int, user_id: int):
+    """returns the entities that changed after the `since` version in the projects of the user
+
+    the latest state of the changed entities is returned, the deleted ones (and the ones that the
+    user can't see anymore) are returned as tombstones. if the change log was compacted after
+    `since` the client is told to load everything again
+    """
+
+    compacted_version = db.scalar(select(func.max(ChangeLogCompaction.version)))
+    if compacted_version is not None and since < compacted_version:
+        return _build_changes(
+            db.scalar(select(func.max(ChangeLogEntry.version))) or since, reset=True
+        )
+
+    user_project_ids = select(ProjectUserAssociation.project_id).where(
+        ProjectUserAssociation.user_id == user_id
+    )
+
+    entries = db.execute(
+        select(
+            ChangeLogEntry.version,
+            ChangeLogEntry.entity_type,
+            ChangeLogEntry.entity_id,
+            ChangeLogEntry.operation,
+            ChangeLogEntry.project_id,
+        )
+        .where(
+            ChangeLogEntry.version > since,
+            or_(
+                and_(
+                    ChangeLogEntry.user_id.is_(None),
+                    ChangeLogEntry.project_id.in_(user_project_ids),
+                ),
+                ChangeLogEntry.user_id == user_id,
+            ),
+        )
+        .order_by(ChangeLogEntry.version.asc())
+    ).all()
+
+    if len(entries) == 0:
+        return _build_changes(since)
+
+    # the latest change of each entity in each project wins
+    operations: dict[tuple[ChangedEntity, int, int], ChangeOperation] = {}
+    for _, entity_type, entity_id, operation, project_id in entries:
+        operations[entity_type, entity_id, project_id] = operation
+
+    upserted: defaultdict[ChangedEntity, defaultdict[int, list[int]]] = defaultdict(
+        lambda: defaultdict(list)
+    )
+    deleted: list[dict[str, Any]] = []
+    for (entity_type, entity_id, project_id), operation in operations.items():
+        if operation == ChangeOperation.UPSERT:
+            upserted[entity_type][entity_id].append(project_id)
+        else:
+            deleted.append(
+                {"entity_type": entity_type, "id": entity_id, "project_id": project_id}
+            )
+
+    user_category_ids = select(TodoCategoryProjectAssociation.category_id).where(
+        TodoCategoryProjectAssociation.project_id.in_(user_project_ids)
+    )
+
+    projects = _load_projects(
+        db, upserted[ChangedEntity.PROJECT].keys(), user_project_ids
+    )
+    categories = _load_categories(
+        db, upserted[ChangedEntity.TODO_CATEGORY].keys(), user_category_ids
+    )
+    todo_items = (
+        db.query(TodoItem)
+        .filter(
+            TodoItem.id.in_(list(upserted[ChangedEntity.TODO_ITEM])),
+            TodoItem.category_id.in_(user_category_ids),
+        )
+        .options(*todo_item_loader_options())
+        .all()
+    )
+    tags = (
+        db.query(Tag)
+        .filter(
+            Tag.id.in_(list(upserted[ChangedEntity.TAG])),
+            Tag.project_id.in_(user_project_ids),
+        )
+        .all()
+    )
+    comments = (
+        db.query(TodoItemComment)
+        .join(TodoItemComment.todo)
+        .filter(
+            TodoItemComment.id.in_(list(upserted[ChangedEntity.TODO_ITEM_COMMENT])),
+            TodoItem.category_id.in_(user_category_ids),
+        )
+        .all()
+    )
+
+    # the changed entities that are gone or moved out of the user's projects are deleted as well
+    for entity_type, loaded in [
+        (ChangedEntity.PROJECT, projects),
+        (ChangedEntity.TODO_CATEGORY, categories),
+        (ChangedEntity.TODO_ITEM, todo_items),
+        (ChangedEntity.TAG, tags),
+        (ChangedEntity.TODO_ITEM_COMMENT, comments),
+    ]:
+        loaded_ids = {entity.id for entity in loaded}
+        for entity_id, project_ids in upserted[entity_type].items():
+            if entity_id not in loaded_ids:
+                deleted.extend(
+                    {"entity_type": entity_type, "id": entity_id, "project_id": id}
+                    for id in project_ids
+                )
+
+    return _build_changes(
+        entries[-1].version,
+        projects=projects,
+        todo_categories=categories,
+        todo_items=todo_items,
+        tags=tags,
+        comments=comments,
+        deleted=deleted,
+    )
+
+
+def _load_projects(
+    db: Session, project_ids: Collection[int], user_project_ids: Select[tuple[int]]
+):
+    if len(project_ids) == 0:
+        return []
+
+    projects = load_project_users(
+        db,
+        db.query(Project)
+        .filter(Project.id.in_(list(project_ids)), Project.id.in_(user_project_ids))
+        .options(selectinload(Project.todo_categories), selectinload(Project.tags))
+        .order_by(Project.id.asc())
+        .all(),
+    )
+
+    category_ids: dict[int, list[int]] = {project.id: [] for project in projects}
+    positions = get_project_category_positions(list(category_ids))
+
+    # the categories of all the projects are ordered with a single query
+    for project_id, category_id in db.execute(
+        select(
+            TodoCategoryProjectAssociation.project_id,
+            TodoCategoryProjectAssociation.category_id,
+        )
+        .outerjoin(
+            positions,
+            and_(
+                positions.c.item_id == TodoCategoryProjectAssociation.category_id,
+                positions.c.project_id == TodoCategoryProjectAssociation.project_id,
+            ),
+        )
+        .where(TodoCategoryProjectAssociation.project_id.in_(list(category_ids)))
+        .order_by(
+            positions.c.position.asc().nulls_last(),
+            TodoCategoryProjectAssociation.category_id.asc(),
+        )
+    ).tuples():
+        category_ids[project_id].append(category_id)
+
+    for project in projects:
+        setattr(project, "todo_category_ids", category_ids[project.id])
+
+    return projects
+
+
+def _load_categories(
+    db: Session, category_ids: Collection[int], user_category_ids: Select[tuple[int]]
+):
+    if len(category_ids) == 0:
+        return []
+
+    categories = (
+        db.query(TodoCategory)
+        .filter(
+            TodoCategory.id.in_(list(category_ids)),
+            TodoCategory.id.in_(user_category_ids),
+        )
+        .options(selectinload(TodoCategory.actions))
+        .order_by(TodoCategory.id.asc())
+        .all()
+    )
+
+    todo_ids: dict[int, list[int]] = {category.id: [] for category in categories}
+    positions = get_todo_item_positions(list(todo_ids.keys()))
+
+    # the items of all the categories are ordered with a single query
+    for todo_id, category_id in db.execute(
+        select(TodoItem.id, TodoItem.category_id)
+        .outerjoin(positions, positions.c.item_id == TodoItem.id)
+        .where(TodoItem.category_id.in_(list(todo_ids)))
+        .order_by(positions.c.position.asc().nulls_last(), TodoItem.id.desc())
+    ).tuples():
+        todo_ids[category_id].append(todo_id)
+
+    for category in categories:
+        setattr(category, "todo_ids", todo_ids[category.id])
+
+    return categories
+
+
+def _build_changes(version: int, reset: bool = False, **changes: list):
+    return {
+        "version": version,
+        "reset": reset,
+        "projects": [],
+        "todo_categories": [],
+        "todo_items": [],
+        "tags": [],
+        "comments": [],
+        "deleted": [],
+        **changes,
+    }
@@ -1,18 +1,29 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from db.models.change_log import ChangedEntity, ChangeOperation
 from db.models.project import Project
+from db.models.project_user_association import ProjectUserAssociation
 from db.models.tag import Tag
 from db.models.todo_category import TodoCategory
+from db.models.todo_category_project_association import TodoCategoryProjectAssociation
 from db.models.todo_item import TodoItem
 from db.models.todo_item_tag_association import TodoItemTagAssociation
 from db.models.user import User
 from db.models.user_project_permission import Permission
+from db.schemas.project_event import ProjectEventType
 from db.schemas.tag import TagAttachToTodo, TagCreate, TagDelete, TagUpdate
+from db.utils.change_log import log_changes, log_todo_changes
 from db.utils.project_crud import validate_project_belongs_to_user
+from db.utils.project_events import emit_project_event, emit_todo_event
+from db.utils.project_versions import (
+    bump_project_versions,
+    bump_tag_project_versions,
+    bump_todo_project_versions,
+)
 from db.utils.shared.permission_query import (
     PermissionsType,
-    join_with_permission_query_if_required,
-    validate_item_exists_with_permissions,
+    validate_items_exist_with_permissions,
 )
 from db.utils.todo_item_crud import validate_todo_item_belongs_to_user
 from error.exceptions import ErrorCode, UserFriendlyError
@@ -40,7 +51,13 @@ def create(db: Session, tag: TagCreate, user_id: int):
 
     db_item = Tag(**tag.model_dump())
     db.add(db_item)
+    db.flush()
 
+    emit_project_event(db, ProjectEventType.PROJECT_UPDATED, [tag.project_id])
+    # the project is sent with its tags
+    log_changes(db, ChangedEntity.TAG, [db_item.id], [tag.project_id])
+    log_changes(db, ChangedEntity.PROJECT, [tag.project_id], [tag.project_id])
+    bump_project_versions(db, [tag.project_id])
     db.commit()
     return db_item
 
@@ -92,6 +109,10 @@ def edit(db: Session, tag_name: str, tag: TagUpdate, user_id: int):
 
     db_item.name = tag.name
 
+    emit_project_event(db, ProjectEventType.PROJECT_UPDATED, [db_item.project_id])
+    log_changes(db, ChangedEntity.TAG, [db_item.id], [db_item.project_id])
+    log_changes(db, ChangedEntity.PROJECT, [db_item.project_id], [db_item.project_id])
+    bump_tag_project_versions(db, [db_item.id])
     db.commit()
     return db_item
 
@@ -100,6 +121,24 @@ def delete(db: Session, tag_name: str, tag: TagDelete, user_id: int):
     validate_tag_belongs_to_user_in_project_by_name(
         db, tag_name, tag.project_id, user_id, [Permission.DELETE_TAG]
     )
+    emit_project_event(db, ProjectEventType.PROJECT_UPDATED, [tag.project_id])
+    tag_ids = db.scalars(
+        select(Tag.id).where(Tag.name == tag_name, Tag.project_id == tag.project_id)
+    ).all()
+    log_changes(
+        db, ChangedEntity.TAG, tag_ids, [tag.project_id], ChangeOperation.DELETE
+    )
+    log_changes(db, ChangedEntity.PROJECT, [tag.project_id], [tag.project_id])
+    # the todo items of the tag are only known before it's deleted
+    log_todo_changes(
+        db,
+        db.scalars(
+            select(TodoItemTagAssociation.todo_id).where(
+                TodoItemTagAssociation.tag_id.in_(tag_ids)
+            )
+        ).all(),
+    )
+    bump_tag_project_versions(db, tag_ids)
     db.query(Tag).filter(
         Tag.name == tag_name, Tag.project_id == tag.project_id
     ).delete()
@@ -160,6 +199,11 @@ def attach_tag_to_todo(
     db_item = TodoItemTagAssociation(todo_id=association.todo_id, tag_id=tag.id)
     db.add(db_item)
 
+    emit_todo_event(
+        db, ProjectEventType.TAG_ATTACHED, association.todo_id, {"tag": tag.name}
+    )
+    log_todo_changes(db, [association.todo_id])
+    bump_todo_project_versions(db, [association.todo_id])
     db.commit()
     return tag
 
@@ -193,6 +237,9 @@ def detach_tag_from_todo(db: Session, tag_name: str, todo_id: int, user_id: int)
             ErrorCode.TAG_NOT_FOUND, "this tag doesn't exist for this todo"
         )
 
+    emit_todo_event(db, ProjectEventType.TAG_DETACHED, todo_id, {"tag": tag_name})
+    log_todo_changes(db, [todo_id])
+    bump_todo_project_versions(db, [todo_id])
     db.commit()
 
 
@@ -203,21 +250,22 @@ def validate_tag_belongs_to_user_in_project_by_name(
     user_id: int,
     permissions: PermissionsType,
 ):
-    query = (
-        db.query(Tag)
-        .join(Tag.project)
-        .join(Project.users)
-        .filter(User.id == user_id)
-        .filter(Tag.name == tag_name)
+    scope = (
+        select(Tag.name)
+        .join(
+            ProjectUserAssociation,
+            ProjectUserAssociation.project_id == Tag.project_id,
+        )
+        .where(ProjectUserAssociation.user_id == user_id)
     )
 
     if project_id is not None:
-        query = query.filter(Tag.project_id == project_id)
-
-    query = join_with_permission_query_if_required(query, permissions)
+        scope = scope.where(Tag.project_id == project_id)
 
-    validate_item_exists_with_permissions(
-        query,
+    validate_items_exist_with_permissions(
+        db,
+        scope,
+        [tag_name],
         permissions,
         ErrorCode.TAG_NOT_FOUND,
         "tag not found or doesn't belong to user or you don't have the permission to perform the requested action",
@@ -231,21 +279,22 @@ def validate_tag_belongs_to_user_in_todo_by_name(
     user_id: int,
     permissions: PermissionsType,
 ):
-    query = (
-        db.query(TodoItem)
-        .join(TodoItem.category)
-        .join(TodoItem.tags)
-        .join(TodoCategory.projects)
-        .join(Project.users)
-        .filter(User.id == user_id)
-        .filter(TodoItem.id == todo_id)
-        .filter(Tag.name == tag_name)
-    )
-
-    query = join_with_permission_query_if_required(query, permissions)
-
-    validate_item_exists_with_permissions(
-        query,
+    validate_items_exist_with_permissions(
+        db,
+        select(Tag.name)
+        .join(TodoItemTagAssociation, TodoItemTagAssociation.tag_id == Tag.id)
+        .join(TodoItem, TodoItem.id == TodoItemTagAssociation.todo_id)
+        .join(
+            TodoCategoryProjectAssociation,
+            TodoCategoryProjectAssociation.category_id == TodoItem.category_id,
+        )
+        .join(
+            ProjectUserAssociation,
+            ProjectUserAssociation.project_id
+            == TodoCategoryProjectAssociation.project_id,
+        )
+        .where(ProjectUserAssociation.user_id == user_id, TodoItem.id == todo_id),
+        [tag_name],
         permissions,
         ErrorCode.TAG_NOT_FOUND,
         "tag not found or doesn't belong to user or you don't have the permission to perform the requested action",
@@ -258,17 +307,15 @@ def validate_tag_belongs_to_user_by_id(
     user_id: int,
     permissions: PermissionsType,
 ):
-    query = (
-        db.query(Tag)
-        .join(Tag.project)
-        .join(Project.users)
-        .filter(User.id == user_id)
-        .filter(Tag.id == tag_id)
-    )
-    query = join_with_permission_query_if_required(query, permissions)
-
-    validate_item_exists_with_permissions(
-        query,
+    validate_items_exist_with_permissions(
+        db,
+        select(Tag.id)
+        .join(
+            ProjectUserAssociation,
+            ProjectUserAssociation.project_id == Tag.project_id,
+        )
+        .where(ProjectUserAssociation.user_id == user_id),
+        [tag_id],
         permissions,
         ErrorCode.TAG_NOT_FOUND,
         "tag not found or doesn't belong to user or you don't have the permission to perform the requested action",
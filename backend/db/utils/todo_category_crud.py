@@ -1,53 +1,104 @@
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, lazyload
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from config import settings
+from db.models.change_log import ChangedEntity, ChangeOperation
 from db.models.project import Project
+from db.models.project_user_association import ProjectUserAssociation
 from db.models.todo_category import TodoCategory
 from db.models.todo_category_action import Action, TodoCategoryAction
 from db.models.todo_category_order import TodoCategoryOrder
 from db.models.todo_category_project_association import TodoCategoryProjectAssociation
-from db.models.user import User
+from db.models.todo_item import TodoItem
+from db.models.todo_item_dependency import TodoItemDependency
 from db.models.user_project_permission import Permission
+from db.schemas.project_event import ProjectEventType
 from db.schemas.todo_category import (
     TodoCategoryAttachAssociation,
     TodoCategoryCreate,
     TodoCategoryUpdateItem,
     TodoCategoryUpdateOrder,
 )
+from db.utils.change_log import log_category_changes, log_changes
+from db.utils.order_positions import (
+    get_category_positions,
+    get_todo_item_positions,
+    with_positions,
+)
+from db.utils.project_counters import add_category_to_project_counters
 from db.utils.project_crud import validate_project_belongs_to_user
+from db.utils.project_events import emit_category_event, emit_project_event
+from db.utils.project_versions import (
+    bump_category_project_versions,
+    bump_project_versions,
+)
 from db.utils.shared.ordered_item import (
+    NewOrder,
     delete_item_from_sorted_items,
     update_element_order,
 )
-from db.utils.shared.permission_query import (
-    PermissionsType,
-    join_with_permission_query_if_required,
-    validate_item_exists_with_permissions,
+from db.utils.shared.permission_context import PermissionContext
+from db.utils.shared.permission_query import PermissionsType, get_permission_verdicts
+from db.utils.shared.ranked_item import (
+    RankedList,
+    delete_item_from_ranked_items,
+    update_element_rank,
 )
 from error.exceptions import ErrorCode, UserFriendlyError
 
 
-def get_categories_for_project(db: Session, project_id: int, user_id: int):
+def get_categories_for_project(
+    db: Session, project_id: int, user_id: int, ordered: bool = False
+):
+    """
+    :param ordered: if True the categories and their items are returned in the order of their lists
+        with their position
+    """
+
     validate_project_belongs_to_user(
         db,
         project_id,
         user_id,
         None,
     )
-    return (
-        db.query(TodoCategory)
-        .outerjoin(TodoCategory.orders.and_(TodoCategoryOrder.project_id == project_id))
-        .join(TodoCategory.projects)
+    query = db.query(TodoCategory).outerjoin(
+        TodoCategory.orders.and_(TodoCategoryOrder.project_id == project_id)
+    )
+
+    if ordered:
+        positions = get_category_positions(project_id)
+        query = (
+            query.outerjoin(positions, positions.c.item_id == TodoCategory.id)
+            .add_columns(positions.c.position)
+            .order_by(positions.c.position.asc().nulls_last())
+        )
+    elif settings.ORDERING_BACKEND == "rank":
+        query = query.order_by(TodoCategoryOrder.rank.asc().nulls_last())
+
+    query = (
+        query.join(TodoCategory.projects)
         .filter(Project.id == project_id)
         .order_by(TodoCategory.id.asc())
         .options(
-            lazyload(
+            selectinload(
                 TodoCategory.orders.and_(TodoCategoryOrder.project_id == project_id)
-            )
-        )  # TODO: see why the goblin do we need this to exist
-        .all()
+            ),
+            selectinload(TodoCategory.projects),
+            selectinload(TodoCategory.actions),
+        )
     )
 
+    if not ordered:
+        return query.options(
+            selectinload(TodoCategory.items).options(*todo_item_loader_options())
+        ).all()
+
+    categories = with_positions(query.tuples().all())
+    _load_ordered_items(db, categories)
+    return categories
+
 
 def create(db: Session, category: TodoCategoryCreate, user_id: int):
     validate_project_belongs_to_user(
@@ -67,6 +118,14 @@ def create(db: Session, category: TodoCategoryCreate, user_id: int):
     db.add(association)
     db.flush()
 
+    emit_project_event(
+        db,
+        ProjectEventType.TODO_CATEGORY_CREATED,
+        [category.project_id],
+        db_item.id,
+    )
+    log_changes(db, ChangedEntity.TODO_CATEGORY, [db_item.id], [category.project_id])
+
     update_order(
         db,
         db_item.id,
@@ -109,6 +168,15 @@ def update_item(
     if category.actions is not None:
         _update_actions(db, db_item, category.actions)
 
+    emit_category_event(
+        db,
+        ProjectEventType.TODO_CATEGORY_UPDATED,
+        [category_id],
+        category_id,
+        data=category.model_dump(exclude={"actions"}, exclude_none=True),
+    )
+    log_category_changes(db, [category_id])
+    bump_category_project_versions(db, [category_id])
     db.commit()
     return db_item
 
@@ -120,20 +188,16 @@ def update_order(
         {Permission.UPDATE_TODO_CATEGORY, Permission.CREATE_TODO_CATEGORY}
     ]
 
-    validate_todo_category_belongs_to_user(
+    validate_todo_categories_belong_to_user(
         db,
-        category_id,
+        [
+            id
+            for id in [category_id, moving_item.left_id, moving_item.right_id]
+            if id is not None
+        ],
         user_id,
         required_permissions,
     )
-    if moving_item.left_id is not None:
-        validate_todo_category_belongs_to_user(
-            db, moving_item.left_id, user_id, required_permissions
-        )
-    if moving_item.right_id is not None:
-        validate_todo_category_belongs_to_user(
-            db, moving_item.right_id, user_id, required_permissions
-        )
     validate_project_belongs_to_user(
         db,
         moving_item.project_id,
@@ -141,31 +205,68 @@ def update_order(
         required_permissions,
     )
 
-    def create_order(id: int, left_id: int | None, right_id: int | None):
-        db.add(
-            TodoCategoryOrder(
-                category_id=id,
-                project_id=moving_item.project_id,
-                left_id=left_id,
-                right_id=right_id,
+    order_query = db.query(TodoCategoryOrder).filter(
+        TodoCategoryOrder.project_id == moving_item.project_id
+    )
+    new_order: NewOrder = {
+        "item_id": category_id,
+        "left_id": moving_item.left_id,
+        "right_id": moving_item.right_id,
+    }
+
+    if settings.ORDERING_BACKEND == "rank":
+        update_element_rank(
+            db,
+            RankedList(
+                TodoCategoryOrder,
+                Project.id,
+                moving_item.project_id,
+                lambda db: db.query(TodoCategoryOrder).filter(
+                    TodoCategoryOrder.project_id == moving_item.project_id
+                ),
+                lambda db: _log_rebalanced_project(db, moving_item.project_id),
+            ),
+            TodoCategoryOrder.category_id,
+            new_order,
+            lambda id, rank: db.add(
+                TodoCategoryOrder(
+                    category_id=id, project_id=moving_item.project_id, rank=rank
+                )
+            ),
+        )
+    else:
+
+        def create_order(id: int, left_id: int | None, right_id: int | None):
+            db.add(
+                TodoCategoryOrder(
+                    category_id=id,
+                    project_id=moving_item.project_id,
+                    left_id=left_id,
+                    right_id=right_id,
+                )
             )
+
+        update_element_order(
+            db,
+            TodoCategoryOrder,
+            order_query,
+            TodoCategoryOrder.category_id,
+            new_order,
+            create_order,
         )
 
-    update_element_order(
+    emit_project_event(
         db,
-        TodoCategoryOrder,
-        db.query(TodoCategoryOrder).filter(
-            TodoCategoryOrder.project_id == moving_item.project_id
-        ),
-        TodoCategoryOrder.category_id,
-        {
-            "item_id": category_id,
-            "left_id": moving_item.left_id,
-            "right_id": moving_item.right_id,
-        },
-        create_order,
+        ProjectEventType.TODO_CATEGORY_REORDERED,
+        [moving_item.project_id],
+        category_id,
+        data={"left_id": moving_item.left_id, "right_id": moving_item.right_id},
     )
-
+    # the project is sent with the order of its categories
+    log_changes(
+        db, ChangedEntity.PROJECT, [moving_item.project_id], [moving_item.project_id]
+    )
+    bump_project_versions(db, [moving_item.project_id])
     db.commit()
 
     item = db.query(TodoCategory).filter(TodoCategory.id == category_id).first()
@@ -208,6 +309,26 @@ def attach_to_project(
             "this category already belongs to this project",
         )
 
+    _invalidate_cached_permissions(db, category_id)
+    add_category_to_project_counters(db, category_id, association.project_id)
+
+    emit_project_event(
+        db,
+        ProjectEventType.TODO_CATEGORY_CREATED,
+        [association.project_id],
+        category_id,
+    )
+    # the items of the category are new to the clients of the project as well
+    log_changes(
+        db, ChangedEntity.TODO_CATEGORY, [category_id], [association.project_id]
+    )
+    log_changes(
+        db,
+        ChangedEntity.TODO_ITEM,
+        db.scalars(select(TodoItem.id).where(TodoItem.category_id == category_id)),
+        [association.project_id],
+    )
+
     update_order(
         db,
         category_id,
@@ -238,14 +359,33 @@ def detach_from_project(db: Session, category_id: int, project_id: int, user_id:
         [Permission.DELETE_TODO_CATEGORY],
     )
 
-    delete_item_from_sorted_items(
-        db,
-        TodoCategoryOrder,
-        db.query(TodoCategoryOrder).filter(TodoCategoryOrder.project_id == project_id),
-        TodoCategoryOrder.category_id,
-        category_id,
+    order_query = db.query(TodoCategoryOrder).filter(
+        TodoCategoryOrder.project_id == project_id
     )
 
+    if settings.ORDERING_BACKEND == "rank":
+        delete_item_from_ranked_items(
+            db, order_query, TodoCategoryOrder.category_id, category_id
+        )
+    else:
+        delete_item_from_sorted_items(
+            db,
+            TodoCategoryOrder,
+            order_query,
+            TodoCategoryOrder.category_id,
+            category_id,
+        )
+
+    add_category_to_project_counters(db, category_id, project_id, -1)
+    # the items leave the project with the category, they're read before the category of the last
+    # project is deleted along with them
+    log_changes(
+        db,
+        ChangedEntity.TODO_ITEM,
+        db.scalars(select(TodoItem.id).where(TodoItem.category_id == category_id)),
+        [project_id],
+        ChangeOperation.DELETE,
+    )
     db.query(TodoCategoryProjectAssociation).filter(
         TodoCategoryProjectAssociation.project_id == project_id,
         TodoCategoryProjectAssociation.category_id == category_id,
@@ -259,7 +399,20 @@ def detach_from_project(db: Session, category_id: int, project_id: int, user_id:
     ):
         db.query(TodoCategory).filter(TodoCategory.id == category_id).delete()
 
+    emit_project_event(
+        db, ProjectEventType.TODO_CATEGORY_DELETED, [project_id], category_id
+    )
+    log_changes(
+        db,
+        ChangedEntity.TODO_CATEGORY,
+        [category_id],
+        [project_id],
+        ChangeOperation.DELETE,
+    )
+    log_changes(db, ChangedEntity.PROJECT, [project_id], [project_id])
+    bump_project_versions(db, [project_id])
     db.commit()
+    _invalidate_cached_permissions(db, category_id)
 
 
 def validate_todo_category_belongs_to_user(
@@ -268,21 +421,100 @@ def validate_todo_category_belongs_to_user(
     user_id: int,
     permissions: PermissionsType,
 ):
-    query = (
-        db.query(TodoCategory)
-        .filter(TodoCategory.id == category_id)
-        .join(TodoCategory.projects)
-        .join(Project.users)
-        .filter(User.id == user_id)
+    validate_todo_categories_belong_to_user(db, [category_id], user_id, permissions)
+
+
+def validate_todo_categories_belong_to_user(
+    db: Session,
+    category_ids: list[int],
+    user_id: int,
+    permissions: PermissionsType,
+):
+    context = PermissionContext.of(db)
+
+    if context is not None:
+        verdicts = context.get_category_verdicts(db, category_ids, user_id, permissions)
+    else:
+        verdicts = get_permission_verdicts(
+            db,
+            select(TodoCategoryProjectAssociation.category_id)
+            .join(
+                ProjectUserAssociation,
+                ProjectUserAssociation.project_id
+                == TodoCategoryProjectAssociation.project_id,
+            )
+            .where(ProjectUserAssociation.user_id == user_id),
+            category_ids,
+            permissions,
+        )
+
+    if not all(verdicts.values()):
+        raise UserFriendlyError(
+            ErrorCode.TODO_CATEGORY_NOT_FOUND,
+            "todo category doesn't exist or doesn't belong to user or you don't have the permission to perform the requested action",
+        )
+
+
+def _invalidate_cached_permissions(db: Session, category_id: int):
+    context = PermissionContext.of(db)
+
+    if context is not None:
+        context.invalidate_categories([category_id])
+
+
+def _log_rebalanced_project(db: Session, project_id: int):
+    # every category of the project is sent with a new rank
+    emit_project_event(db, ProjectEventType.PROJECT_UPDATED, [project_id])
+    log_changes(
+        db,
+        ChangedEntity.TODO_CATEGORY,
+        db.scalars(
+            select(TodoCategoryOrder.category_id).where(
+                TodoCategoryOrder.project_id == project_id
+            )
+        ),
+        [project_id],
     )
+    bump_project_versions(db, [project_id])
+
+
+def _load_ordered_items(db: Session, categories: list[TodoCategory]):
+    category_ids = [category.id for category in categories]
+    items_per_category: dict[int, list[TodoItem]] = {
+        category_id: [] for category_id in category_ids
+    }
+    positions = get_todo_item_positions(category_ids)
+
+    for item in with_positions(
+        db.query(TodoItem)
+        .options(*todo_item_loader_options())
+        .outerjoin(positions, positions.c.item_id == TodoItem.id)
+        .add_columns(positions.c.position)
+        .filter(TodoItem.category_id.in_(category_ids))
+        .order_by(positions.c.position.asc().nulls_last(), TodoItem.id.desc())
+        .tuples()
+        .all()
+    ):
+        items_per_category[item.category_id].append(item)
+
+    # the loaded items replace the lazy loaded collection without being marked as a change
+    for category in categories:
+        set_committed_value(category, "items", items_per_category[category.id])
+
+
+def todo_item_loader_options():
+    """the loader plan of everything that is serialized with the items of a category
 
-    query = join_with_permission_query_if_required(query, permissions)
+    the whole board is loaded with a fixed number of queries instead of a few queries per item
+    """
 
-    validate_item_exists_with_permissions(
-        query,
-        permissions,
-        ErrorCode.TODO_CATEGORY_NOT_FOUND,
-        "todo category doesn't exist or doesn't belong to user or you don't have the permission to perform the requested action",
+    return (
+        joinedload(TodoItem.order),
+        joinedload(TodoItem.marked_as_done_by),
+        selectinload(TodoItem.tags),
+        selectinload(TodoItem.dependencies).joinedload(
+            TodoItemDependency.dependant_todo
+        ),
     )
 
 
@@ -327,6 +559,10 @@ def _update_actions(
 def _get_last_category_id_in_project_except_current(
     db: Session, current_category_id: int, project_id: int, user_id: int
 ):
+    if settings.ORDERING_BACKEND == "rank":
+        # an item without neighbours is placed at the end of the list
+        return None
+
     last_item_in_the_list = (
         db.query(TodoCategoryOrder)
         .filter(
@@ -352,6 +588,17 @@ def _get_last_category_id_in_project_except_current(
 def _get_first_category_id_in_project_except_current(
     db: Session, current_category_id: int, project_id: int, user_id: int
 ):
+    if settings.ORDERING_BACKEND == "rank":
+        return db.scalars(
+            select(TodoCategoryOrder.category_id)
+            .where(
+                TodoCategoryOrder.project_id == project_id,
+                TodoCategoryOrder.category_id != current_category_id,
+            )
+            .order_by(TodoCategoryOrder.rank.asc())
+            .limit(1)
+        ).first()
+
     first_item_in_the_list = (
         db.query(TodoCategoryOrder)
         .filter(
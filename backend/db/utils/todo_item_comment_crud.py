@@ -1,12 +1,18 @@
 import builtins
 import typing
 
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 
+from db.models.change_log import ChangedEntity, ChangeOperation
 from db.models.todo_item import TodoItem
 from db.models.todo_item_comments import TodoItemComment
 from db.models.user_project_permission import Permission
+from db.schemas.project_event import ProjectEventType
 from db.schemas.todo_item_comment import TodoCommentCreate, TodoCommentUpdate
+from db.utils.change_log import log_changes_in_categories, log_todo_changes
+from db.utils.project_events import emit_todo_event
+from db.utils.project_versions import bump_todo_project_versions
 from db.utils.shared.permission_query import PermissionsType
 from db.utils.todo_item_crud import validate_todo_item_belongs_to_user
 from error.exceptions import ErrorCode, UserFriendlyError
@@ -19,7 +25,14 @@ def create(db: Session, todo_id: int, comment: TodoCommentCreate, user_id: int):
 
     db_item = TodoItemComment(todo_id=todo_id, **comment.model_dump())
     db.add(db_item)
+    db.flush()
+    _update_comments_count(db, todo_id, 1)
 
+    emit_todo_event(
+        db, ProjectEventType.COMMENT_ADDED, todo_id, {"comment_id": db_item.id}
+    )
+    _log_comment_changes(db, todo_id, db_item.id)
+    bump_todo_project_versions(db, [todo_id])
     db.commit()
     return db_item
 
@@ -49,6 +62,11 @@ def edit(
 
     db_item.message = comment.message
 
+    emit_todo_event(
+        db, ProjectEventType.COMMENT_UPDATED, todo_id, {"comment_id": comment_id}
+    )
+    _log_comment_changes(db, todo_id, comment_id)
+    bump_todo_project_versions(db, [todo_id])
     db.commit()
     return db_item
 
@@ -57,10 +75,37 @@ def delete(db: Session, todo_id: int, comment_id: int, user_id: int):
     validate_todo_comment_belongs_to_user(
         db, todo_id, comment_id, user_id, [Permission.DELETE_COMMENT]
     )
-    db.query(TodoItemComment).filter(TodoItemComment.id == comment_id).delete()
+    _log_comment_changes(db, todo_id, comment_id, ChangeOperation.DELETE)
+    deleted_count = (
+        db.query(TodoItemComment).filter(TodoItemComment.id == comment_id).delete()
+    )
+    _update_comments_count(db, todo_id, -deleted_count)
+    emit_todo_event(
+        db, ProjectEventType.COMMENT_DELETED, todo_id, {"comment_id": comment_id}
+    )
+    bump_todo_project_versions(db, [todo_id])
     db.commit()
 
 
+def recompute_comments_count(db: Session, todo_ids: builtins.list[int] | None = None):
+    """recomputes the stored comments count of the todo items from their comments
+
+    :param todo_ids: the todo items to repair, all of the todo items are repaired if it's None
+    this does not commit the changes, caller needs to commit the changes
+    """
+
+    statement = update(TodoItem).values(
+        comments_count=select(func.count(TodoItemComment.id))
+        .where(TodoItemComment.todo_id == TodoItem.id)
+        .scalar_subquery()
+    )
+
+    if todo_ids is not None:
+        statement = statement.where(TodoItem.id.in_(todo_ids))
+
+    db.execute(statement.execution_options(synchronize_session="fetch"))
+
+
 def validate_todo_comment_belongs_to_user(
     db: Session,
     todo_id: int,
@@ -86,3 +131,30 @@ def validate_todo_comment_belongs_to_user(
         )
     except UserFriendlyError:
         raise
+
+
+def _update_comments_count(db: Session, todo_id: int, delta: int):
+    # the counter is incremented in the database, so concurrent comments don't overwrite each other
+    db.execute(
+        update(TodoItem)
+        .where(TodoItem.id == todo_id)
+        .values(comments_count=TodoItem.comments_count + delta)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def _log_comment_changes(
+    db: Session,
+    todo_id: int,
+    comment_id: int,
+    operation: ChangeOperation = ChangeOperation.UPSERT,
+):
+    todo = db.get(TodoItem, todo_id)
+    if todo is None:
+        return
+
+    log_changes_in_categories(
+        db, ChangedEntity.TODO_ITEM_COMMENT, [comment_id], [todo.category_id], operation
+    )
+    # the todo item is sent with the number of its comments
+    log_todo_changes(db, [todo_id])
@@ -1,33 +1,72 @@
 import datetime
+from collections import Counter
 
-from sqlalchemy.orm import Session
+from sqlalchemy import ColumnElement, and_, or_, select, update
+from sqlalchemy.orm import Query, Session, selectinload
 
+from config import settings
+from db.models.change_log import ChangedEntity, ChangeOperation
 from db.models.project import Project
+from db.models.project_user_association import ProjectUserAssociation
 from db.models.todo_category import TodoCategory
 from db.models.todo_category_action import Action
+from db.models.todo_category_project_association import TodoCategoryProjectAssociation
 from db.models.todo_item import TodoItem
 from db.models.todo_item_dependency import TodoItemDependency
 from db.models.todo_item_order import TodoItemOrder
 from db.models.user import User
 from db.models.user_project_permission import Permission
+from db.schemas.project_event import ProjectEventType
 from db.schemas.todo_item import (
     SearchTodoStatus,
     TodoItemAddDependency,
+    TodoItemBulkUpdateOrder,
     TodoItemCreate,
+    TodoItemSearchFilters,
     TodoItemUpdateItem,
     TodoItemUpdateOrder,
 )
+from db.utils.change_log import (
+    log_category_changes,
+    log_changes,
+    log_changes_in_categories,
+    log_todo_changes,
+)
+from db.utils.order_positions import get_todo_item_positions, with_positions
+from db.utils.project_counters import (
+    add_todos_to_project_counters,
+    update_project_counters,
+)
 from db.utils.project_crud import validate_project_belongs_to_user
+from db.utils.project_events import (
+    emit_category_event,
+    emit_project_event,
+    emit_todo_event,
+    get_category_project_ids,
+)
+from db.utils.project_versions import (
+    bump_category_project_versions,
+    bump_todo_project_versions,
+)
 from db.utils.shared.ordered_item import (
+    apply_moves,
     delete_item_from_sorted_items,
     update_element_order,
 )
-from db.utils.shared.permission_query import (
-    PermissionsType,
-    join_with_permission_query_if_required,
-    validate_item_exists_with_permissions,
+from db.utils.shared.permission_context import PermissionContext
+from db.utils.shared.permission_query import PermissionsType, get_permission_verdicts
+from db.utils.shared.ranked_item import (
+    RankedList,
+    delete_item_from_ranked_items,
+    rank_moved_items,
+    schedule_rebalance,
+    sort_by_links,
+    update_element_rank,
+)
+from db.utils.todo_category_crud import (
+    validate_todo_categories_belong_to_user,
+    validate_todo_category_belongs_to_user,
 )
-from db.utils.todo_category_crud import validate_todo_category_belongs_to_user
 from error.exceptions import ErrorCode, UserFriendlyError
 
 
@@ -37,7 +76,18 @@ def get_todos_for_user(
     category_id: int,
     status: SearchTodoStatus,
     user_id: int,
+    ordered: bool = False,
+    filters: TodoItemSearchFilters | None = None,
+    after_id: int | None = None,
+    limit: int | None = None,
 ):
+    """
+    :param ordered: if True the items are returned in the order of their list with their position
+    :param after_id: returns the items that come after this item (the cursor of the previous page)
+    :param limit: the max number of items to return, all of the items are returned if it's None
+    :returns: the items and the cursor of the next page (None if this is the last page)
+    """
+
     validate_project_belongs_to_user(
         db,
         project_id,
@@ -48,13 +98,48 @@ def get_todos_for_user(
     validate_todo_category_belongs_to_user(db, category_id, user_id, None)
 
     query = db.query(TodoItem)
+    # the items are sorted by this column first (if any) and then by their id (desc)
+    sort_column = None
+    after_sort_value = None
+
+    if ordered:
+        positions = get_todo_item_positions([category_id])
+        sort_column = positions.c.position
+        after_sort_value = (
+            select(positions.c.position)
+            .where(positions.c.item_id == after_id)
+            .scalar_subquery()
+        )
+        query = (
+            query.outerjoin(positions, positions.c.item_id == TodoItem.id)
+            .add_columns(positions.c.position)
+            .order_by(positions.c.position.asc().nulls_last())
+        )
+    elif settings.ORDERING_BACKEND == "rank":
+        sort_column = TodoItemOrder.rank
+        after_sort_value = (
+            select(TodoItemOrder.rank)
+            .where(TodoItemOrder.todo_id == after_id)
+            .scalar_subquery()
+        )
+        query = query.outerjoin(TodoItem.order).order_by(
+            TodoItemOrder.rank.asc().nulls_last()
+        )
 
     if status == SearchTodoStatus.DONE:
         query = query.filter(TodoItem.is_done == True)
     elif status == SearchTodoStatus.PENDING:
         query = query.filter(TodoItem.is_done == False)
 
-    return (
+    if filters is not None:
+        query = _filter_todos(query, filters)
+
+    if after_id is not None:
+        if sort_column is not None:
+            _validate_cursor_is_in_category(db, after_id, category_id)
+        query = query.filter(_after_item(sort_column, after_sort_value, after_id))
+
+    query = (
         query.join(TodoItem.category)
         .filter(TodoCategory.id == category_id)
         .join(TodoCategory.projects)
@@ -62,9 +147,23 @@ def get_todos_for_user(
         .join(Project.users)
         .filter(User.id == user_id)
         .order_by(TodoItem.id.desc())
-        .all()
     )
 
+    if limit is not None:
+        # one more item is fetched to know whether there is a next page
+        query = query.limit(limit + 1)
+
+    if ordered:
+        items = with_positions(query.tuples().all())
+    else:
+        items = query.all()
+
+    if limit is None or len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    return items, items[-1].id
+
 
 def create(db: Session, todo: TodoItemCreate, user_id: int):
     validate_todo_category_belongs_to_user(
@@ -78,8 +177,12 @@ def create(db: Session, todo: TodoItemCreate, user_id: int):
     db_item = TodoItem(**todo.model_dump())
     db.add(db_item)
     db.flush()
+    # new items are pending, marking them as done afterwards updates the counters again
+    add_todos_to_project_counters(db, db_item.category_id, False)
+
+    emit_todo_event(db, ProjectEventType.TODO_ITEM_CREATED, db_item.id)
 
-    update_order(
+    _, category_ids = _update_order(
         db,
         db_item.id,
         TodoItemUpdateOrder.model_validate(
@@ -99,6 +202,8 @@ def create(db: Session, todo: TodoItemCreate, user_id: int):
     if db_item.is_done:
         db_item.marked_as_done_by_user_id = user_id
 
+    # the actions change the item after it is placed, the version is bumped once for both
+    bump_category_project_versions(db, category_ids)
     db.commit()
     return db_item
 
@@ -120,8 +225,9 @@ def update_item(db: Session, todo_id: int, todo: TodoItemUpdateItem, user_id: in
             "todo item doesn't exist or doesn't belong to user",
         )
 
+    category_ids = {db_item.category_id}
     if todo.new_category_id is not None:
-        update_order(
+        _, category_ids = _update_order(
             db,
             todo_id,
             TodoItemUpdateOrder.model_validate(
@@ -154,6 +260,15 @@ def update_item(db: Session, todo_id: int, todo: TodoItemUpdateItem, user_id: in
 
     _perform_actions(db, db_item, db_item.category_id, todo.is_done, user_id)
 
+    emit_todo_event(
+        db,
+        ProjectEventType.TODO_ITEM_UPDATED,
+        todo_id,
+        todo.model_dump(exclude={"new_category_id"}, exclude_none=True, mode="json"),
+    )
+    log_todo_changes(db, [todo_id])
+    # the projects of the category that the item left change as well
+    bump_category_project_versions(db, category_ids)
     db.commit()
     return db_item
 
@@ -161,19 +276,31 @@ def update_item(db: Session, todo_id: int, todo: TodoItemUpdateItem, user_id: in
 def update_order(
     db: Session, todo_id: int, moving_item: TodoItemUpdateOrder, user_id: int
 ):
-    validate_todo_item_belongs_to_user(
-        db, todo_id, user_id, [Permission.UPDATE_TODO_ITEM]
-    )
+    db_item, category_ids = _update_order(db, todo_id, moving_item, user_id)
+    bump_category_project_versions(db, category_ids)
+    db.commit()
+    return db_item
 
-    if moving_item.left_id is not None:
-        validate_todo_item_belongs_to_user(
-            db, moving_item.left_id, user_id, [Permission.UPDATE_TODO_ITEM]
-        )
 
-    if moving_item.right_id is not None:
-        validate_todo_item_belongs_to_user(
-            db, moving_item.right_id, user_id, [Permission.UPDATE_TODO_ITEM]
-        )
+def _update_order(
+    db: Session, todo_id: int, moving_item: TodoItemUpdateOrder, user_id: int
+):
+    """moves the item and returns it with the ids of the categories it left and entered
+
+    this does not commit the changes nor bumps the versions of the projects, caller needs to do
+    both
+    """
+
+    validate_todo_items_belong_to_user(
+        db,
+        [
+            id
+            for id in [todo_id, moving_item.left_id, moving_item.right_id]
+            if id is not None
+        ],
+        user_id,
+        [Permission.UPDATE_TODO_ITEM],
+    )
 
     db_item = (
         db.query(TodoItem)
@@ -187,39 +314,148 @@ def update_order(
             ErrorCode.TODO_NOT_FOUND, "moving item not found or doesn't belong to user"
         )
 
+    old_category_id = db_item.category_id
+
     if db_item.category_id != moving_item.new_category_id:
         _perform_actions(db, db_item, moving_item.new_category_id, None, user_id)
         validate_todo_category_belongs_to_user(
             db, moving_item.new_category_id, user_id, [Permission.UPDATE_TODO_ITEM]
         )
-        delete_item_from_sorted_items(
-            db,
-            TodoItemOrder,
-            db.query(TodoItemOrder),
-            TodoItemOrder.todo_id,
-            db_item.id,
-        )
-        db_item.category_id = moving_item.new_category_id
+        if settings.ORDERING_BACKEND == "linked_list":
+            delete_item_from_sorted_items(
+                db,
+                TodoItemOrder,
+                db.query(TodoItemOrder),
+                TodoItemOrder.todo_id,
+                db_item.id,
+            )
+        _move_to_category(db, db_item, moving_item.new_category_id)
         db.flush()
+        _invalidate_cached_permissions(db, db_item.id)
 
-    def create_order(id: int, left_id: int | None, right_id: int | None):
-        db.add(TodoItemOrder(todo_id=id, left_id=left_id, right_id=right_id))
+    _update_position(db, db_item, moving_item.left_id, moving_item.right_id)
 
-    update_element_order(
+    # the item also leaves the boards of its old category
+    emit_category_event(
         db,
-        TodoItemOrder,
-        db.query(TodoItemOrder),
-        TodoItemOrder.todo_id,
-        {
-            "item_id": todo_id,
-            "left_id": moving_item.left_id,
-            "right_id": moving_item.right_id,
-        },
-        create_order,
+        ProjectEventType.TODO_ITEM_MOVED,
+        {old_category_id, db_item.category_id},
+        db_item.category_id,
+        todo_id,
+        {"left_id": moving_item.left_id, "right_id": moving_item.right_id},
     )
+    # the categories are sent with the order of their items
+    log_changes_in_categories(
+        db,
+        ChangedEntity.TODO_ITEM,
+        [todo_id],
+        {old_category_id, db_item.category_id},
+    )
+    log_category_changes(db, {old_category_id, db_item.category_id})
+    return db_item, {old_category_id, db_item.category_id}
+
+
+def bulk_update_order(db: Session, bulk_order: TodoItemBulkUpdateOrder, user_id: int):
+    moves = bulk_order.moves
 
+    validate_todo_items_belong_to_user(
+        db,
+        list(
+            {
+                id
+                for move in moves
+                for id in [move.todo_id, move.left_id, move.right_id]
+                if id is not None
+            }
+        ),
+        user_id,
+        [Permission.UPDATE_TODO_ITEM],
+    )
+    validate_todo_categories_belong_to_user(
+        db,
+        list({move.new_category_id for move in moves}),
+        user_id,
+        [Permission.UPDATE_TODO_ITEM],
+    )
+
+    moved_ids = {move.todo_id for move in moves}
+    db_items = {
+        item.id: item
+        for item in db.query(TodoItem)
+        .filter(TodoItem.id.in_(moved_ids))
+        .options(selectinload(TodoItem.dependencies))
+        .all()
+    }
+    category_ids = {item.category_id for item in db_items.values()} | {
+        move.new_category_id for move in moves
+    }
+    # the categories are loaded with their actions once, instead of once per move
+    db_categories = {
+        category.id: category
+        for category in db.query(TodoCategory)
+        .filter(TodoCategory.id.in_(category_ids))
+        .options(selectinload(TodoCategory.actions))
+        .all()
+    }
+
+    if settings.ORDERING_BACKEND == "rank":
+        # the lists are locked in the same order by every batch, so two batches can't deadlock
+        for category_id in sorted(category_ids):
+            _get_ranked_list(category_id).lock(db)
+
+    orders, lists = _load_category_lists(db, category_ids)
+    apply_moves(
+        lists,
+        [
+            {
+                "item_id": move.todo_id,
+                "left_id": move.left_id,
+                "right_id": move.right_id,
+                "list_id": move.new_category_id,
+            }
+            for move in moves
+        ],
+    )
+
+    # the counters of the moved items are updated once per category instead of once per move
+    counter_deltas: Counter[tuple[int, bool]] = Counter()
+    for move in moves:
+        db_item = db_items[move.todo_id]
+        if db_item.category_id != move.new_category_id:
+            _perform_category_actions(
+                db, db_item, db_categories[move.new_category_id], None, user_id
+            )
+            is_done = db_item.marked_as_done_by_user_id is not None
+            counter_deltas[db_item.category_id, is_done] -= 1
+            counter_deltas[move.new_category_id, is_done] += 1
+            db_item.category_id = move.new_category_id
+            _invalidate_cached_permissions(db, db_item.id)
+
+    for (category_id, is_done), count in counter_deltas.items():
+        add_todos_to_project_counters(db, category_id, is_done, count)
+
+    if settings.ORDERING_BACKEND == "rank":
+        _write_ranks(db, orders, lists, moved_ids)
+    else:
+        _write_links(db, orders, lists)
+
+    # the projects are queried once, every project that has one of the categories gets all moves
+    project_ids = get_category_project_ids(db, category_ids)
+    for move in moves:
+        emit_project_event(
+            db,
+            ProjectEventType.TODO_ITEM_MOVED,
+            project_ids,
+            move.new_category_id,
+            move.todo_id,
+            {"left_id": move.left_id, "right_id": move.right_id},
+        )
+
+    log_changes(db, ChangedEntity.TODO_ITEM, moved_ids, project_ids)
+    # category_ids has both the old and the new categories of the moved items
+    log_category_changes(db, category_ids)
+    bump_category_project_versions(db, category_ids)
     db.commit()
-    return db_item
 
 
 def remove(db: Session, todo_id: int, user_id: int):
@@ -230,27 +466,37 @@ def remove(db: Session, todo_id: int, user_id: int):
     if not db_item:
         return
 
-    delete_item_from_sorted_items(
-        db,
-        TodoItemOrder,
-        db.query(TodoItemOrder),
-        TodoItemOrder.todo_id,
-        todo_id,
-    )
+    if settings.ORDERING_BACKEND == "rank":
+        delete_item_from_ranked_items(
+            db, db.query(TodoItemOrder), TodoItemOrder.todo_id, todo_id
+        )
+    else:
+        delete_item_from_sorted_items(
+            db,
+            TodoItemOrder,
+            db.query(TodoItemOrder),
+            TodoItemOrder.todo_id,
+            todo_id,
+        )
 
+    add_todos_to_project_counters(
+        db, db_item.category_id, db_item.marked_as_done_by_user_id is not None, -1
+    )
+    emit_todo_event(db, ProjectEventType.TODO_ITEM_DELETED, todo_id)
+    log_todo_changes(db, [todo_id], ChangeOperation.DELETE)
+    log_category_changes(db, [db_item.category_id])
+    bump_todo_project_versions(db, [todo_id])
     db.query(TodoItem).filter(TodoItem.id == todo_id).delete()
     db.commit()
+    _invalidate_cached_permissions(db, todo_id)
 
 
 def add_todo_dependency(
     db: Session, todo_id: int, dependency: TodoItemAddDependency, user_id: int
 ):
-    validate_todo_item_belongs_to_user(
-        db, todo_id, user_id, [Permission.CREATE_TODO_ITEM_DEPENDENCY]
-    )
-    validate_todo_item_belongs_to_user(
+    validate_todo_items_belong_to_user(
         db,
-        dependency.dependant_todo_id,
+        [todo_id, dependency.dependant_todo_id],
         user_id,
         [Permission.CREATE_TODO_ITEM_DEPENDENCY],
     )
@@ -285,6 +531,9 @@ def add_todo_dependency(
     db_item = TodoItemDependency(todo_id=todo.id, **dependency.model_dump())
     db.add(db_item)
 
+    emit_todo_event(db, ProjectEventType.TODO_ITEM_UPDATED, todo_id)
+    log_todo_changes(db, [todo_id])
+    bump_todo_project_versions(db, [todo_id])
     db.commit()
     return db_item
 
@@ -309,6 +558,9 @@ def remove_todo_dependency(
         )
 
     db.delete(db_item)
+    emit_todo_event(db, ProjectEventType.TODO_ITEM_UPDATED, todo_id)
+    log_todo_changes(db, [todo_id])
+    bump_todo_project_versions(db, [todo_id])
     db.commit()
 
 
@@ -318,25 +570,278 @@ def validate_todo_item_belongs_to_user(
     user_id: int,
     permissions: PermissionsType,
 ):
-    query = (
-        db.query(TodoItem)
-        .filter(TodoItem.id == todo_id)
-        .join(TodoItem.category)
-        .join(TodoCategory.projects)
-        .join(Project.users)
-        .filter(User.id == user_id)
-    )
+    validate_todo_items_belong_to_user(db, [todo_id], user_id, permissions)
+
+
+def validate_todo_items_belong_to_user(
+    db: Session,
+    todo_ids: list[int],
+    user_id: int,
+    permissions: PermissionsType,
+):
+    if not all(_get_todo_item_verdicts(db, todo_ids, user_id, permissions).values()):
+        raise UserFriendlyError(
+            ErrorCode.TODO_NOT_FOUND,
+            "todo item doesn't exist or doesn't belong to user or you don't have the permission to perform the requested action",
+        )
 
-    query = join_with_permission_query_if_required(query, permissions)
 
-    validate_item_exists_with_permissions(
-        query,
+def _get_todo_item_verdicts(
+    db: Session,
+    todo_ids: list[int],
+    user_id: int,
+    permissions: PermissionsType,
+):
+    context = PermissionContext.of(db)
+
+    if context is not None:
+        return context.get_todo_item_verdicts(db, todo_ids, user_id, permissions)
+
+    return get_permission_verdicts(
+        db,
+        select(TodoItem.id)
+        .join(
+            TodoCategoryProjectAssociation,
+            TodoCategoryProjectAssociation.category_id == TodoItem.category_id,
+        )
+        .join(
+            ProjectUserAssociation,
+            ProjectUserAssociation.project_id
+            == TodoCategoryProjectAssociation.project_id,
+        )
+        .where(ProjectUserAssociation.user_id == user_id),
+        todo_ids,
         permissions,
-        ErrorCode.TODO_NOT_FOUND,
-        "todo item doesn't exist or doesn't belong to user or you don't have the permission to perform the requested action",
     )
 
 
+def _filter_todos(query: Query[TodoItem], filters: TodoItemSearchFilters):
+    if filters.due_date_from is not None:
+        query = query.filter(
+            TodoItem.due_date >= filters.due_date_from.astimezone(datetime.UTC)
+        )
+
+    if filters.due_date_to is not None:
+        query = query.filter(
+            TodoItem.due_date <= filters.due_date_to.astimezone(datetime.UTC)
+        )
+
+    if filters.tag_id is not None:
+        query = query.filter(TodoItem.tags.any(id=filters.tag_id))
+
+    if filters.done_by_user_id is not None:
+        query = query.filter(
+            TodoItem.marked_as_done_by_user_id == filters.done_by_user_id
+        )
+
+    return query
+
+
+def _after_item(
+    sort_column: ColumnElement | None,
+    after_sort_value: ColumnElement | None,
+    after_id: int,
+):
+    # keyset condition of the items that are sorted after the given item, the items are sorted by
+    # `sort_column` (ascending, nulls last) and then by their id (descending)
+    if sort_column is None or after_sort_value is None:
+        return TodoItem.id < after_id
+
+    return or_(
+        and_(
+            after_sort_value != None,
+            or_(
+                sort_column > after_sort_value,
+                and_(sort_column == after_sort_value, TodoItem.id < after_id),
+                sort_column == None,
+            ),
+        ),
+        and_(after_sort_value == None, sort_column == None, TodoItem.id < after_id),
+    )
+
+
+def _validate_cursor_is_in_category(db: Session, after_id: int, category_id: int):
+    # the position (or rank) of an item that was deleted or moved out of the category can't be
+    # compared with the items of the category, so the client has to load the list again
+    if (
+        db.scalar(
+            select(TodoItem.id).where(
+                TodoItem.id == after_id, TodoItem.category_id == category_id
+            )
+        )
+        is None
+    ):
+        raise UserFriendlyError(
+            ErrorCode.INVALID_INPUT,
+            "the item of the cursor isn't in this category anymore, load the items from the start",
+        )
+
+
+def _invalidate_cached_permissions(db: Session, todo_id: int):
+    context = PermissionContext.of(db)
+
+    if context is not None:
+        context.invalidate_todo_items([todo_id])
+
+
+def _update_position(
+    db: Session, db_item: TodoItem, left_id: int | None, right_id: int | None
+):
+    # the validation that the item and its new neighbours belong to user is callers responsibility
+    if settings.ORDERING_BACKEND == "rank":
+        update_element_rank(
+            db,
+            _get_ranked_list(db_item.category_id),
+            TodoItemOrder.todo_id,
+            {"item_id": db_item.id, "left_id": left_id, "right_id": right_id},
+            lambda id, rank: db.add(TodoItemOrder(todo_id=id, rank=rank)),
+        )
+        return
+
+    def create_order(id: int, left_id: int | None, right_id: int | None):
+        db.add(TodoItemOrder(todo_id=id, left_id=left_id, right_id=right_id))
+
+    update_element_order(
+        db,
+        TodoItemOrder,
+        db.query(TodoItemOrder),
+        TodoItemOrder.todo_id,
+        {"item_id": db_item.id, "left_id": left_id, "right_id": right_id},
+        create_order,
+    )
+
+
+def _get_category_orders_query(db: Session, category_id: int):
+    return db.query(TodoItemOrder).filter(
+        TodoItemOrder.todo_id.in_(
+            select(TodoItem.id).where(TodoItem.category_id == category_id)
+        )
+    )
+
+
+def _get_ranked_list(category_id: int):
+    return RankedList(
+        TodoItemOrder,
+        TodoCategory.id,
+        category_id,
+        lambda db: _get_category_orders_query(db, category_id),
+        lambda db: _log_rebalanced_category(db, category_id),
+    )
+
+
+def _log_rebalanced_category(db: Session, category_id: int):
+    # every item of the category is sent with a new rank
+    emit_category_event(
+        db, ProjectEventType.TODO_CATEGORY_UPDATED, [category_id], category_id
+    )
+    log_changes_in_categories(
+        db,
+        ChangedEntity.TODO_ITEM,
+        db.scalars(select(TodoItem.id).where(TodoItem.category_id == category_id)),
+        [category_id],
+    )
+    bump_category_project_versions(db, [category_id])
+
+
+def _load_category_lists(db: Session, category_ids: set[int]):
+    """loads the orders of the items of the given categories and the item ids of each category in order"""
+
+    orders: dict[int, TodoItemOrder] = {}
+    category_orders: dict[int, list[TodoItemOrder]] = {
+        category_id: [] for category_id in category_ids
+    }
+
+    for order, category_id in (
+        db.query(TodoItemOrder, TodoItem.category_id)
+        .join(TodoItemOrder.todo)
+        .filter(TodoItem.category_id.in_(category_ids))
+        .tuples()
+        .all()
+    ):
+        orders[order.todo_id] = order
+        category_orders[category_id].append(order)
+
+    lists: dict[int, list[int]] = {}
+    for category_id, unsorted_orders in category_orders.items():
+        sorted_orders = (
+            sorted(
+                unsorted_orders,
+                key=lambda order: (order.rank is None, order.rank or "", order.todo_id),
+            )
+            if settings.ORDERING_BACKEND == "rank"
+            else sort_by_links(unsorted_orders, lambda order: order.todo_id)
+        )
+        lists[category_id] = [order.todo_id for order in sorted_orders]
+
+    return orders, lists
+
+
+def _write_links(
+    db: Session, orders: dict[int, TodoItemOrder], lists: dict[int, list[int]]
+):
+    changed_links: list[dict[str, int | None]] = []
+
+    for todo_ids in lists.values():
+        for index, todo_id in enumerate(todo_ids):
+            left_id = todo_ids[index - 1] if index > 0 else None
+            right_id = todo_ids[index + 1] if index < len(todo_ids) - 1 else None
+            order = orders.get(todo_id)
+
+            if order is None:
+                db.add(
+                    TodoItemOrder(todo_id=todo_id, left_id=left_id, right_id=right_id)
+                )
+            elif order.left_id != left_id or order.right_id != right_id:
+                changed_links.append(
+                    {"id": order.id, "left_id": left_id, "right_id": right_id}
+                )
+
+    if len(changed_links) == 0:
+        return
+
+    # the links are unique, so the old links are cleared before the new ones are written
+    db.execute(
+        update(TodoItemOrder)
+        .where(TodoItemOrder.id.in_([link["id"] for link in changed_links]))
+        .values(left_id=None, right_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(update(TodoItemOrder), changed_links)
+
+
+def _write_ranks(
+    db: Session,
+    orders: dict[int, TodoItemOrder],
+    lists: dict[int, list[int]],
+    moved_ids: set[int],
+):
+    changed_ranks: list[dict[str, int | str]] = []
+
+    for category_id, todo_ids in lists.items():
+        new_ranks = rank_moved_items(
+            todo_ids,
+            {
+                todo_id: orders[todo_id].rank
+                for todo_id in todo_ids
+                if todo_id in orders
+            },
+            moved_ids,
+        )
+
+        for todo_id, rank in new_ranks.items():
+            order = orders.get(todo_id)
+            if order is None:
+                db.add(TodoItemOrder(todo_id=todo_id, rank=rank))
+            else:
+                changed_ranks.append({"id": order.id, "rank": rank})
+
+        if any(len(rank) > settings.RANK_MAX_LENGTH for rank in new_ranks.values()):
+            schedule_rebalance(db, _get_ranked_list(category_id))
+
+    if len(changed_ranks) > 0:
+        db.execute(update(TodoItemOrder), changed_ranks)
+
+
 def _perform_actions(
     db: Session,
     todo_item: TodoItem,
@@ -345,9 +850,20 @@ def _perform_actions(
     user_id: int,
 ):
     # this does not commit the changes, caller needs to commit the changes
-    new_category = db.query(TodoCategory).filter(TodoCategory.id == category_id).first()
+    new_category = db.get(TodoCategory, category_id)
     if not new_category:
         raise
+    _perform_category_actions(db, todo_item, new_category, new_done_status, user_id)
+
+
+def _perform_category_actions(
+    db: Session,
+    todo_item: TodoItem,
+    new_category: TodoCategory,
+    new_done_status: bool | None,
+    user_id: int,
+):
+    # this does not commit the changes, caller needs to commit the changes
     for action in new_category.actions:
         match action.action:
             case Action.AUTO_MARK_AS_DONE:
@@ -392,8 +908,25 @@ def _update_done_status(
             "you cannot change the status of this todo item because it is already marked as done by another user. Only that user can change the status",
         )
 
+    was_done = todo_item.marked_as_done_by_user_id is not None
     todo_item.marked_as_done_by_user_id = user_id if new_status is True else None
 
+    if was_done != new_status:
+        update_project_counters(
+            db,
+            todo_item.category_id,
+            done=1 if new_status else -1,
+            pending=-1 if new_status else 1,
+        )
+
+
+def _move_to_category(db: Session, todo_item: TodoItem, new_category_id: int):
+    # this does not commit the changes, caller needs to commit the changes
+    is_done = todo_item.marked_as_done_by_user_id is not None
+    add_todos_to_project_counters(db, todo_item.category_id, is_done, -1)
+    todo_item.category_id = new_category_id
+    add_todos_to_project_counters(db, new_category_id, is_done)
+
 
 def _validate_dependencies_are_resolved(
     db: Session,
@@ -401,12 +934,15 @@ def _validate_dependencies_are_resolved(
     user_id: int,
     permissions: PermissionsType,
 ):
+    verdicts = _get_todo_item_verdicts(
+        db,
+        [dependency.dependant_todo_id for dependency in todo.dependencies],
+        user_id,
+        permissions,
+    )
+
     for dependency in todo.dependencies:
-        try:
-            validate_todo_item_belongs_to_user(
-                db, dependency.dependant_todo_id, user_id, permissions
-            )
-        except UserFriendlyError as e:
+        if not verdicts[dependency.dependant_todo_id]:
             raise UserFriendlyError(
                 ErrorCode.TODO_NOT_FOUND,
                 f"One or more dependencies don't belong to you anymore, please consider removing the dependency: #{dependency.todo_id} - {dependency.dependant_todo_title}",
@@ -421,6 +957,10 @@ def _validate_dependencies_are_resolved(
 def _get_last_todo_id_in_category_except_current(
     db: Session, current_todo_id: int, category_id: int
 ):
+    if settings.ORDERING_BACKEND == "rank":
+        # an item without neighbours is placed at the end of the list
+        return None
+
     last_item_in_the_list = (
         db.query(TodoItemOrder)
         .join(TodoItemOrder.todo)
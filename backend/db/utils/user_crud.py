@@ -1,8 +1,9 @@
-from bcrypt import checkpw, gensalt, hashpw
 from sqlalchemy.orm import Session
 
 from db.models.user import User
 from db.schemas.user import UserCreate
+from db.utils.password_hasher import hash_password
+from db.utils.user_principal_cache import invalidate_user
 
 
 def get_user(db: Session, user_id: int):
@@ -17,17 +18,18 @@ def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(User).offset(skip).limit(limit).all()
 
 
-def verify_password(plain_password: str, hashed_password: str):
-    return checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
-
-
-def get_password_hash(password: str):
-    return hashpw(password.encode("utf-8"), gensalt()).decode("utf-8")
-
-
 def create_user(db: Session, user: UserCreate):
-    user.password = get_password_hash(user.password)
+    user.password = hash_password(user.password)
     db_user = User(**user.model_dump())
     db.add(db_user)
     db.commit()
+    invalidate_user(db_user.username)
     return db_user
+
+
+def update_password(db: Session, user: User, password: str):
+    user.password = hash_password(password)
+    db.commit()
+    db.refresh(user)
+    invalidate_user(user.username)
+    return user
@@ -0,0 +1,132 @@
+import base64
+import binascii
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, TypedDict
+
+from config import settings
+from db.schemas.user import UserPrincipal
+
+type _CacheKey = tuple[str, int | None]
+
+
+class _CachedPrincipal(NamedTuple):
+    token: str
+    principal: UserPrincipal
+    expires_at: float
+
+
+class PrincipalCacheStats(TypedDict):
+    hits: int
+    # lookups of tokens that weren't cached, or that expired or were replaced
+    misses: int
+    size: int
+
+
+# keyed by (subject, issued at) of the token, least recently used entries are evicted first
+_cache: OrderedDict[_CacheKey, _CachedPrincipal] = OrderedDict()
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def get_cached_principal(token: str) -> UserPrincipal | None:
+    """returns the user of a token that was verified less than `AUTH_CACHE_TTL_SECONDS` ago
+
+    the signature of the token is not verified again, the token has to be the exact same token that
+    was cached though
+    """
+
+    if not settings.AUTH_CACHE_ENABLED:
+        return None
+
+    global _hits, _misses
+
+    key = _get_cache_key(get_unverified_claims(token))
+    if key is None:
+        return None
+
+    with _lock:
+        cached = _cache.get(key)
+        if cached is None:
+            _misses += 1
+            return None
+
+        if cached.expires_at <= time.monotonic() or not hmac.compare_digest(
+            cached.token, token
+        ):
+            del _cache[key]
+            _misses += 1
+            return None
+
+        _cache.move_to_end(key)
+        _hits += 1
+        return cached.principal
+
+
+def cache_principal(token: str, claims: dict[str, Any], principal: UserPrincipal):
+    """caches the user of a verified token"""
+
+    if not settings.AUTH_CACHE_ENABLED:
+        return
+
+    key = _get_cache_key(claims)
+    if key is None:
+        return
+
+    expires_at = time.monotonic() + settings.AUTH_CACHE_TTL_SECONDS
+    if isinstance(claims.get("exp"), int | float):
+        # the token must not outlive its own expiration in the cache
+        expires_at = min(expires_at, time.monotonic() + claims["exp"] - time.time())
+
+    with _lock:
+        _cache[key] = _CachedPrincipal(token, principal, expires_at)
+        _cache.move_to_end(key)
+
+        while len(_cache) > settings.AUTH_CACHE_MAX_SIZE:
+            _cache.popitem(last=False)
+
+
+def invalidate_user(username: str):
+    """removes every cached token of the user, it must be called when the user changes"""
+
+    with _lock:
+        for key in [key for key in _cache if key[0] == username]:
+            del _cache[key]
+
+
+def clear_principal_cache():
+    with _lock:
+        _cache.clear()
+
+
+def get_principal_cache_stats() -> PrincipalCacheStats:
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "size": len(_cache)}
+
+
+def get_unverified_claims(token: str) -> dict[str, Any] | None:
+    """returns the claims of a token without verifying its signature, so they can't be trusted"""
+
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+
+    try:
+        payload = base64.urlsafe_b64decode(parts[1] + "=" * (-len(parts[1]) % 4))
+        claims = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+    return claims if isinstance(claims, dict) else None
+
+
+def _get_cache_key(claims: dict[str, Any] | None) -> _CacheKey | None:
+    if claims is None or not isinstance(claims.get("sub"), str):
+        return None
+
+    issued_at = claims.get("iat")
+    return (claims["sub"], issued_at if isinstance(issued_at, int) else None)
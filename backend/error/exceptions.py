@@ -25,6 +25,7 @@ class ErrorCode(StrEnum):
     ACTION_PREVENTED_TODO_UPDATE = auto()
     PERMISSION_DENIED = auto()
     USER_DOESNT_HAVE_ACCESS_TO_PROJECT = auto()
+    SERVER_IS_BUSY = auto()
 
 
 class UserFriendlyError(Exception):
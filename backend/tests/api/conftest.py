@@ -3,6 +3,8 @@ from .fixtures.auth import *
 from .fixtures.client import *
 from .fixtures.permissions import *
 from .fixtures.projects import *
+from .fixtures.queries import *
+from .fixtures.sync import *
 from .fixtures.tags import *
 from .fixtures.todo_categories import *
 from .fixtures.todo_comments import *
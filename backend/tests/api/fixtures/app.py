@@ -1,8 +1,9 @@
 import pytest
 
 from api import create_app
-from api.dependencies.db import get_db
-from tests.db.test import SessionLocalTest, init_db
+from api.dependencies.db import get_db, open_async_db
+from config import settings
+from tests.db.test import AsyncSessionLocalTest, SessionLocalTest, init_db
 
 
 @pytest.fixture(scope="session")
@@ -18,5 +19,11 @@ def test_app():
         finally:
             db.close()
 
-    app.dependency_overrides[get_db] = get_test_db
+    async def get_test_async_db():
+        async for db in open_async_db(AsyncSessionLocalTest):
+            yield db
+
+    app.dependency_overrides[get_db] = (
+        get_test_async_db if settings.SQLALCHEMY_ASYNC else get_test_db
+    )
     return app
@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from tests.db.test import async_engine, engine
+
+
+@pytest.fixture(scope="function")
+def count_queries():
+    """returns a context manager which collects the sql statements that are executed inside it"""
+
+    @contextmanager
+    def _count_queries():
+        statements: list[str] = []
+
+        def _collect_statement(connection, cursor, statement, *args):
+            statements.append(statement)
+
+        # the routes query the async engine when the tests run with SQLALCHEMY_ASYNC
+        engines = [engine] + ([async_engine.sync_engine] if async_engine else [])
+        for db_engine in engines:
+            event.listen(db_engine, "before_cursor_execute", _collect_statement)
+        try:
+            yield statements
+        finally:
+            for db_engine in engines:
+                event.remove(db_engine, "before_cursor_execute", _collect_statement)
+
+    return _count_queries
@@ -0,0 +1,34 @@
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from httpx import Response
+
+from db.schemas.sync import SyncChanges
+from tests.api.conftest import UserType
+
+
+@pytest.fixture(scope="function")
+def sync_changes_request(
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+):
+    def _sync_changes(user: UserType, since: int):
+        response = test_client.get(
+            "/sync/",
+            params={"since": since},
+            headers=auth_header_factory(user),
+        )
+        return response
+
+    return _sync_changes
+
+
+@pytest.fixture(scope="function")
+def sync_changes(sync_changes_request: Callable[[UserType, int], Response]):
+    def _sync_changes(user: UserType, since: int):
+        response = sync_changes_request(user, since)
+        assert response.status_code == 200, "syncing the changes failed"
+        return SyncChanges.model_validate(response.json())
+
+    return _sync_changes
@@ -125,7 +125,7 @@ def update_todo_item_order_request(
         right_id: int | None,
         new_category_id: int | None = None,
     ):
-        request = {"right_id": new_category_id, "left_id": left_id}
+        request = {"right_id": right_id, "left_id": left_id}
 
         if new_category_id is not None:
             request["new_category_id"] = new_category_id
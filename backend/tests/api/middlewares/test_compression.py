@@ -0,0 +1,108 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from api.middlewares import compression
+from api.middlewares.compression import CompressionMiddleware, get_compression_stats
+
+_LARGE_BODY = "x" * 4096
+
+
+@pytest.fixture(scope="function")
+def client(monkeypatch: pytest.MonkeyPatch):
+    # the results shouldn't depend on zstandard being installed
+    monkeypatch.setattr(compression, "zstandard", None)
+
+    app = FastAPI()
+
+    @app.get("/large")
+    def large():
+        return {"body": _LARGE_BODY}
+
+    @app.get("/small")
+    def small():
+        return {"body": "x"}
+
+    @app.get("/events")
+    def events():
+        return Response(_LARGE_BODY, media_type="text/event-stream")
+
+    @app.get("/stream")
+    def stream():
+        def chunks():
+            for _ in range(4):
+                yield _LARGE_BODY
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.get("/encoded")
+    def encoded():
+        return PlainTextResponse(
+            gzip.compress(_LARGE_BODY.encode()), headers={"Content-Encoding": "gzip"}
+        )
+
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=1024,
+        media_types=["application/json", "text/plain"],
+        gzip_level=6,
+        zstd_level=3,
+    )
+
+    return TestClient(app)
+
+
+def test_large_response_is_compressed(client: TestClient):
+    stats_before = get_compression_stats()
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(_LARGE_BODY)
+    assert response.json() == {"body": _LARGE_BODY}
+
+    stats_after = get_compression_stats()
+    assert stats_after["responses"] == stats_before["responses"] + 1
+    assert (
+        stats_after["uncompressed_bytes"] - stats_before["uncompressed_bytes"]
+        > stats_after["compressed_bytes"] - stats_before["compressed_bytes"]
+    )
+
+
+def test_streamed_response_is_compressed(client: TestClient):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert response.text == _LARGE_BODY * 4
+
+
+@pytest.mark.parametrize(
+    "path, accept_encoding",
+    [
+        ("/small", "gzip"),
+        ("/events", "gzip"),
+        ("/large", "identity"),
+        ("/large", "gzip;q=0, br"),
+    ],
+)
+def test_response_is_not_compressed(
+    client: TestClient, path: str, accept_encoding: str
+):
+    response = client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+
+
+def test_encoded_response_is_not_compressed_again(client: TestClient):
+    response = client.get("/encoded", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.text == _LARGE_BODY
@@ -0,0 +1,86 @@
+import pstats
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.middlewares.profiling import ProfilingMiddleware
+from api.routes.admin import admin
+from config import settings
+
+_ADMIN_HEADERS = {"Authorization": "Bearer admin-token"}
+
+
+def _slow_sum():
+    return sum(range(10_000))
+
+
+@pytest.fixture(scope="function")
+def client(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "admin-token")
+
+    app = FastAPI()
+    app.include_router(admin.router)
+
+    # a sync route runs in the threadpool, the profile should still have it
+    @app.patch("/items/{item_id}")
+    def update_item(item_id: int):
+        return {"id": item_id, "sum": _slow_sum()}
+
+    app.add_middleware(ProfilingMiddleware)
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "headers, params",
+    [({"X-Profile": "admin-token"}, {}), ({}, {"profile": "admin-token"})],
+)
+def test_request_is_profiled(
+    client: TestClient, tmp_path: Path, headers: dict[str, str], params: dict[str, str]
+):
+    response = client.patch("/items/1", headers=headers, params=params)
+    assert response.status_code == 200
+    assert response.json() == {"id": 1, "sum": sum(range(10_000))}
+    profile_id = response.headers["X-Profile-Id"]
+
+    response = client.get("/admin/profiles", headers=_ADMIN_HEADERS)
+    assert response.status_code == 200
+    [profile] = [x for x in response.json() if x["id"] == profile_id]
+    assert profile["method"] == "PATCH"
+    assert profile["path"] == "/items/1"
+    assert profile["status_code"] == 200
+
+    response = client.get(f"/admin/profiles/{profile_id}", headers=_ADMIN_HEADERS)
+    assert response.status_code == 200
+    profile_path = tmp_path / "profile.pstats"
+    profile_path.write_bytes(response.content)
+    functions = {
+        function_name for _, _, function_name in pstats.Stats(str(profile_path)).stats
+    }
+    assert "_slow_sum" in functions, "the route's functions should be in the profile"
+
+    response = client.get(
+        f"/admin/profiles/{profile_id}",
+        params={"format": "text"},
+        headers=_ADMIN_HEADERS,
+    )
+    assert response.status_code == 200
+    assert "_slow_sum" in response.text
+
+
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_request_is_not_profiled_without_the_token(
+    client: TestClient, token: str | None
+):
+    headers = {"X-Profile": token} if token is not None else {}
+    response = client.patch("/items/1", headers=headers)
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_unknown_profile_is_not_found(client: TestClient):
+    response = client.get("/admin/profiles/unknown", headers=_ADMIN_HEADERS)
+    assert response.status_code == 404
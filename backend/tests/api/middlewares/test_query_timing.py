@@ -0,0 +1,55 @@
+import logging
+import re
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config import settings
+from db.schemas.project import Project
+from tests.api.conftest import UserType
+
+
+def test_request_reports_its_queries(
+    create_project: Callable[[UserType], Project],
+    count_queries: Callable[[], AbstractContextManager[list[str]]],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    user = test_users[0]
+    monkeypatch.setattr(settings, "AUTH_CACHE_ENABLED", False)
+    project = create_project(user)
+    headers = auth_header_factory(user)
+
+    with caplog.at_level(logging.INFO, logger="api.middlewares.query_timing"):
+        with count_queries() as statements:
+            response = test_client.get(f"/projects/{project.id}", headers=headers)
+
+    assert response.status_code == 200, "Failed to get the project"
+
+    server_timing = re.fullmatch(
+        r'db;dur=[\d.]+;desc="(\d+) queries", app;dur=[\d.]+',
+        response.headers["Server-Timing"],
+    )
+    assert (
+        server_timing is not None
+    ), "the timings should be in the Server-Timing header"
+    assert int(server_timing.group(1)) == len(statements)
+
+    [record] = [
+        record
+        for record in caplog.records
+        if getattr(record, "route", None) == "filter_projects"
+    ]
+    assert getattr(record, "status_code") == 200
+    assert getattr(record, "query_count") == len(statements)
+    slowest_queries = getattr(record, "slowest_queries")
+    assert 0 < len(slowest_queries) <= settings.QUERY_TIMING_SLOWEST_COUNT
+    assert all(query["statement"] in statements for query in slowest_queries)
+    assert slowest_queries == sorted(
+        slowest_queries, key=lambda query: query["duration_ms"], reverse=True
+    ), "the slowest query should be first"
@@ -0,0 +1,134 @@
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from config import settings
+from db.models.project import Project as ProjectModel
+from db.schemas.project import Project
+from db.schemas.slow_query import SlowQuery
+from db.schemas.todo_category import TodoCategory
+from db.utils.slow_query_log import _explain
+from tests.api.conftest import UserType
+from tests.db.test import SessionLocalTest
+
+_ADMIN_HEADERS = {"Authorization": "Bearer admin-token"}
+
+
+@pytest.fixture(scope="function")
+def admin_token(monkeypatch: pytest.MonkeyPatch, test_client: TestClient):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "admin-token")
+    response = test_client.delete("/admin/slow-queries", headers=_ADMIN_HEADERS)
+    assert response.status_code == 200, "Failed to clear the slow queries"
+
+
+def _get_slow_queries(test_client: TestClient):
+    response = test_client.get("/admin/slow-queries", headers=_ADMIN_HEADERS)
+    assert response.status_code == 200, "Failed to get the slow queries"
+    return [SlowQuery.model_validate(x) for x in response.json()]
+
+
+def test_slow_queries_are_logged_with_their_plan(
+    admin_token: None,
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    user = test_users[0]
+    project = create_project(user)
+    create_todo_category(user, project.id)
+    headers = auth_header_factory(user)
+
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN", True)
+
+    response = test_client.get(
+        "/todo-categories/", params={"project_id": project.id}, headers=headers
+    )
+    assert response.status_code == 200, "Failed to list the categories"
+
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", None)
+
+    slow_queries = [
+        slow_query
+        for slow_query in _get_slow_queries(test_client)
+        if slow_query.route == "search_todo_categories"
+    ]
+    assert len(slow_queries) > 0, "every query of the route should be slow"
+    assert any(
+        slow_query.caller is not None
+        and slow_query.caller.startswith("db.utils.todo_category_crud.")
+        for slow_query in slow_queries
+    ), "the crud function that executed the query should be known"
+
+    for slow_query in slow_queries:
+        if slow_query.statement.lstrip().upper().startswith("SELECT"):
+            assert slow_query.plan, "the plans of the selects should be captured"
+        else:
+            assert slow_query.plan is None
+
+
+def test_explaining_a_slow_query_keeps_the_transaction():
+    def count_explained_projects():
+        return db.scalar(
+            select(func.count()).where(ProjectModel.title == "explained project")
+        )
+
+    with SessionLocalTest() as db:
+        db.add(ProjectModel(title="explained project", description="description"))
+        db.flush()
+        connection = db.connection()
+
+        assert _explain(connection, "SELECT * FROM project", ())
+        assert _explain(connection, "SELECT * FROM missing_table", ()) is None
+        assert (
+            count_explained_projects() == 1
+        ), "a failed explain shouldn't undo the changes of the transaction"
+
+        db.rollback()
+        assert (
+            count_explained_projects() == 0
+        ), "the savepoint of the explain shouldn't commit the transaction"
+
+
+def test_slow_query_parameters_are_redacted(
+    admin_token: None,
+    test_client: TestClient,
+    test_users: list[UserType],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    user = test_users[0]
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+    monkeypatch.setattr(settings, "AUTH_CACHE_ENABLED", False)
+
+    response = test_client.post(
+        "/oauth/token",
+        data={"username": user["username"], "password": user["password"]},
+    )
+    assert response.status_code == 200, "Failed to login"
+
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", None)
+
+    slow_queries = _get_slow_queries(test_client)
+    assert len(slow_queries) > 0
+    for slow_query in slow_queries:
+        assert user["username"] not in str(slow_query.parameters)
+        assert user["password"] not in str(slow_query.parameters)
+
+
+def test_admin_routes_require_the_token(
+    test_client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    response = test_client.get("/admin/slow-queries", headers=_ADMIN_HEADERS)
+    assert response.status_code == 401, "the admin routes are off without a token"
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "admin-token")
+
+    response = test_client.get(
+        "/admin/slow-queries", headers={"Authorization": "Bearer wrong"}
+    )
+    assert response.status_code == 401
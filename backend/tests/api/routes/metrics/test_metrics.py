@@ -0,0 +1,93 @@
+import re
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config import settings
+from db.schemas.project import Project
+from tests.api.conftest import UserType
+
+
+def _get_samples(text: str, name: str):
+    """the values of the samples of the metric by their labels"""
+
+    return {
+        labels: float(value)
+        for labels, value in re.findall(
+            rf"^{name}(\{{.*\}})? (\S+)$", text, flags=re.MULTILINE
+        )
+    }
+
+
+def test_metrics_count_the_requests_of_each_route(
+    create_project: Callable[[UserType], Project],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+    project = create_project(user)
+    headers = auth_header_factory(user)
+
+    def get_metrics():
+        response = test_client.get("/metrics")
+        assert response.status_code == 200, "Failed to get the metrics"
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        return response.text
+
+    labels = '{route="filter_projects",method="GET"}'
+    before = _get_samples(get_metrics(), "db_queries_total").get(labels, 0)
+
+    for _ in range(2):
+        response = test_client.get(f"/projects/{project.id}", headers=headers)
+        assert response.status_code == 200, "Failed to get the project"
+
+    text = get_metrics()
+
+    assert (
+        _get_samples(text, "http_request_duration_seconds_count")[labels] >= 2
+    ), "the requests should be in the latency histogram"
+    buckets = [
+        value
+        for bucket_labels, value in _get_samples(
+            text, "http_request_duration_seconds_bucket"
+        ).items()
+        if bucket_labels.startswith('{route="filter_projects",method="GET",')
+    ]
+    assert buckets == sorted(buckets), "the buckets should be cumulative"
+    assert (
+        buckets[-1] == _get_samples(text, "http_request_duration_seconds_count")[labels]
+    ), "the +Inf bucket should count every request"
+
+    assert (
+        _get_samples(text, "http_responses_total")[
+            '{route="filter_projects",method="GET",status="200"}'
+        ]
+        >= 2
+    )
+    assert _get_samples(text, "db_queries_total")[labels] > before
+
+    for name in [
+        "password_hashing_workers",
+        "password_hashing_queued",
+        "auth_cache_hits_total",
+        "auth_cache_misses_total",
+        "compressed_responses_total",
+    ]:
+        assert "" in _get_samples(text, name), f"{name} should be in the metrics"
+
+
+def test_metrics_require_the_token_when_it_is_set(
+    test_client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 401
+
+    response = test_client.get("/metrics", headers={"Authorization": "Bearer wrong"})
+    assert response.status_code == 401
+
+    response = test_client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
@@ -1,9 +1,17 @@
+from collections.abc import Callable
+from contextlib import AbstractContextManager
 from secrets import choice
 
 import pytest
 from fastapi.testclient import TestClient
 
+from config import settings
+from db.utils.password_hasher import get_password_hashing_stats
+from db.utils.user_crud import get_user_by_username
+from db.utils.user_principal_cache import clear_principal_cache, invalidate_user
+from error.exceptions import ErrorCode
 from tests.api.conftest import UserType
+from tests.db.test import SessionLocalTest
 
 
 @pytest.mark.parametrize("username_case", ["lower", "upper"])
@@ -36,3 +44,125 @@ def test_login(
     assert (
         "access_token" in response.json()
     ), "after a successful login (case-insensitive) we should get an access_token"
+
+
+def _login(test_client: TestClient, username: str, password: str):
+    return test_client.post(
+        "/oauth/token",
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        data={"username": username, "password": password},
+    )
+
+
+def _stored_password_hash(username: str):
+    with SessionLocalTest() as db:
+        user = get_user_by_username(db, username)
+        assert user is not None
+        return user.password
+
+
+def test_login_rehashes_password_when_bcrypt_rounds_change(
+    test_client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    username, password = "rehash_username", "rehash_password"
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    response = test_client.post(
+        "/users/signup",
+        json={
+            "username": username,
+            "password": password,
+            "confirm_password": password,
+        },
+    )
+    assert response.status_code == 200
+    assert _stored_password_hash(username).startswith("$2b$04$")
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    assert _login(test_client, username, password).status_code == 200
+    new_hash = _stored_password_hash(username)
+    assert new_hash.startswith(
+        "$2b$05$"
+    ), "the password should be re-hashed with the new work factor"
+
+    assert _login(test_client, username, password).status_code == 200
+    assert (
+        _stored_password_hash(username) == new_hash
+    ), "an up to date hash shouldn't be re-hashed"
+    assert _login(test_client, username, "wrong_password").status_code == 401
+
+    stats = get_password_hashing_stats()
+    assert stats["queued"] == 0 and stats["running"] == 0
+
+
+def test_login_is_rejected_when_password_hashing_queue_is_full(
+    test_client: TestClient,
+    test_users: list[UserType],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    user = test_users[0]
+    rejected_before = get_password_hashing_stats()["rejected"]
+    monkeypatch.setattr(settings, "PASSWORD_HASHING_MAX_QUEUE", 0)
+
+    response = _login(test_client, user["username"], user["password"])
+
+    assert response.status_code == 400
+    assert response.json()["code"] == ErrorCode.SERVER_IS_BUSY
+    assert get_password_hashing_stats()["rejected"] == rejected_before + 1
+
+
+def _queries_user_by_username(statements: list[str]):
+    return any("user.username = ?" in statement for statement in statements)
+
+
+@pytest.mark.parametrize("is_cache_enabled", [True, False])
+def test_authenticated_user_is_cached_by_token(
+    test_client: TestClient,
+    test_users: list[UserType],
+    access_token_factory: Callable[[UserType], str],
+    count_queries: Callable[[], AbstractContextManager[list[str]]],
+    monkeypatch: pytest.MonkeyPatch,
+    is_cache_enabled: bool,
+):
+    monkeypatch.setattr(settings, "AUTH_CACHE_ENABLED", is_cache_enabled)
+    clear_principal_cache()
+    user = test_users[0]
+    headers = {"Authorization": f"Bearer {access_token_factory(user)}"}
+
+    with count_queries() as statements:
+        response = test_client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == user["id"]
+    assert _queries_user_by_username(statements)
+
+    with count_queries() as statements:
+        response = test_client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == user["id"]
+    assert _queries_user_by_username(statements) != is_cache_enabled
+
+    invalidate_user(user["username"])
+    with count_queries() as statements:
+        assert test_client.get("/users/me", headers=headers).status_code == 200
+    assert _queries_user_by_username(
+        statements
+    ), "an invalidated user should be queried again"
+
+
+def test_cached_token_with_a_different_signature_is_rejected(
+    test_client: TestClient,
+    test_users: list[UserType],
+    access_token_factory: Callable[[UserType], str],
+):
+    token = access_token_factory(test_users[0])
+    response = test_client.get(
+        "/users/me", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+
+    header, payload, signature = token.split(".")
+    forged_signature = ("A" if signature[0] != "A" else "B") + signature[1:]
+    response = test_client.get(
+        "/users/me",
+        headers={"Authorization": f"Bearer {header}.{payload}.{forged_signature}"},
+    )
+    assert response.status_code == 401
@@ -1,12 +1,30 @@
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 
+import pytest
+from fastapi.testclient import TestClient
 from httpx import Response
+from sqlalchemy import event
 
 from api.routes.error import UserFriendlyErrorSchema
 from db.models.user_project_permission import Permission
-from db.schemas.project import PartialUserWithPermission, Project
-from error.exceptions import ErrorCode
+from db.schemas.project import (
+    PartialUserWithPermission,
+    Project,
+    ProjectUpdateUserPermissions,
+)
+from db.schemas.todo_category import TodoCategory
+from db.schemas.todo_item import TodoItem
+from db.utils import project_crud
+from db.utils.shared.permission_context import PermissionContext
+from db.utils.todo_category_crud import validate_todo_category_belongs_to_user
+from db.utils.todo_item_crud import (
+    validate_todo_item_belongs_to_user,
+    validate_todo_items_belong_to_user,
+)
+from error.exceptions import ErrorCode, UserFriendlyError
 from tests.api.conftest import UserType
+from tests.db.test import SessionLocalTest, engine
 
 
 def test_permissions_dont_leak(
@@ -267,3 +285,318 @@ def test_changing_project_owner(
 
     assert user_a_permissions.permissions == [Permission.CREATE_COMMENT]
     assert user_b_permissions.permissions == [Permission.ALL]
+
+
+@pytest.mark.parametrize("with_permission_context", [False, True])
+def test_permission_expressions(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    attach_project_to_user: Callable[[UserType, UserType, int, list[Permission]], None],
+    test_users: list[UserType],
+    with_permission_context: bool,
+):
+    user_a = test_users[0]  # Owner
+    user_b = test_users[1]  # Shared user with one permission per project
+
+    project_one = create_project(user_a)
+    project_two = create_project(user_a)
+    todo_one = create_todo_item(user_a, create_todo_category(user_a, project_one.id).id)
+    todo_two = create_todo_item(user_a, create_todo_category(user_a, project_two.id).id)
+
+    attach_project_to_user(user_a, user_b, project_one.id, [Permission.CREATE_TAG])
+    attach_project_to_user(user_a, user_b, project_two.id, [Permission.UPDATE_TAG])
+
+    # the permission context and the single query must give the same verdicts
+    with SessionLocalTest() as db:
+        if with_permission_context:
+            PermissionContext.bind(db)
+
+        def is_permitted(
+            user: UserType,
+            todo_ids: list[int],
+            permissions: list[Permission | set[Permission]],
+        ):
+            try:
+                validate_todo_items_belong_to_user(
+                    db, todo_ids, user["id"], permissions
+                )
+            except UserFriendlyError as error:
+                assert error.code == ErrorCode.TODO_NOT_FOUND
+                return False
+            return True
+
+        assert not is_permitted(
+            user_b, [todo_one.id], [Permission.CREATE_TAG, Permission.UPDATE_TAG]
+        ), "a user with only one of the required permissions should be denied"
+        assert is_permitted(
+            user_b, [todo_one.id], [{Permission.CREATE_TAG, Permission.UPDATE_TAG}]
+        ), "a user with one of the alternative permissions should be allowed"
+        assert is_permitted(
+            user_a, [todo_one.id], [Permission.CREATE_TAG, Permission.UPDATE_TAG]
+        ), "the owner should satisfy every expression"
+
+        assert is_permitted(user_b, [todo_one.id], [Permission.CREATE_TAG])
+        assert not is_permitted(
+            user_b, [todo_one.id, todo_two.id], [Permission.CREATE_TAG]
+        ), "a batch should be denied if one of its items isn't permitted"
+        assert is_permitted(
+            user_b,
+            [todo_one.id, todo_two.id],
+            [{Permission.CREATE_TAG, Permission.UPDATE_TAG}],
+        )
+        assert not is_permitted(
+            test_users[2], [todo_one.id], None
+        ), "a user without access should be denied even if no permission is required"
+
+
+def test_reorder_categories_with_either_permission(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    attach_project_to_user: Callable[[UserType, UserType, int, list[Permission]], None],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user_a = test_users[0]  # Owner
+    user_b = test_users[1]  # Shared user with one of the permissions
+    user_c = test_users[2]  # Shared user with none of them
+
+    project_one = create_project(user_a)
+    category_ids = [create_todo_category(user_a, project_one.id).id for _ in range(2)]
+
+    attach_project_to_user(
+        user_a, user_b, project_one.id, [Permission.CREATE_TODO_CATEGORY]
+    )
+    attach_project_to_user(
+        user_a,
+        user_c,
+        project_one.id,
+        [Permission.CREATE_TODO_ITEM, Permission.DELETE_TODO_CATEGORY],
+    )
+
+    def move_to_first(user: UserType, category_id: int):
+        return test_client.patch(
+            f"/todo-categories/{category_id}",
+            headers=auth_header_factory(user),
+            json={
+                "order": {
+                    "left_id": None,
+                    "right_id": category_ids[0],
+                    "project_id": project_one.id,
+                }
+            },
+        )
+
+    # reordering needs either UPDATE_TODO_CATEGORY or CREATE_TODO_CATEGORY
+    response = move_to_first(user_c, category_ids[1])
+    assert (
+        response.status_code == 400
+    ), "User C shouldn't be able to reorder the categories"
+
+    response = move_to_first(user_b, category_ids[1])
+    assert (
+        response.status_code == 200
+    ), "User B should be able to reorder the categories"
+
+
+@contextmanager
+def _collect_statements() -> Iterator[list[str]]:
+    statements: list[str] = []
+
+    def _collect_statement(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _collect_statement)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _collect_statement)
+
+
+def test_permission_context_answers_repeated_checks_from_memory(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    attach_project_to_user: Callable[[UserType, UserType, int, list[Permission]], None],
+    test_users: list[UserType],
+):
+    user_a = test_users[0]  # Owner
+    user_b = test_users[1]  # Shared user with permission
+
+    project_one = create_project(user_a)
+    category = create_todo_category(user_a, project_one.id)
+    todo_item = create_todo_item(user_a, category.id)
+    attach_project_to_user(
+        user_a, user_b, project_one.id, [Permission.UPDATE_TODO_ITEM]
+    )
+
+    # a session with a bound context is what every route gets
+    with SessionLocalTest() as db:
+        PermissionContext.bind(db)
+
+        with _collect_statements() as first_check:
+            validate_todo_item_belongs_to_user(
+                db, todo_item.id, user_b["id"], [Permission.UPDATE_TODO_ITEM]
+            )
+        assert len(first_check) > 0
+
+        with _collect_statements() as repeated_checks:
+            validate_todo_item_belongs_to_user(
+                db, todo_item.id, user_b["id"], [Permission.UPDATE_TODO_ITEM]
+            )
+            validate_todo_category_belongs_to_user(
+                db, category.id, user_b["id"], [Permission.UPDATE_TODO_ITEM]
+            )
+            project_crud.validate_project_belongs_to_user(
+                db, project_one.id, user_b["id"], None
+            )
+            with pytest.raises(UserFriendlyError):
+                validate_todo_item_belongs_to_user(
+                    db, todo_item.id, user_b["id"], [Permission.DELETE_TODO_ITEM]
+                )
+        assert (
+            len(repeated_checks) == 0
+        ), "checks of an already loaded project shouldn't query the database"
+
+
+def test_permission_context_sees_permission_changes_of_the_request(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    attach_project_to_user: Callable[[UserType, UserType, int, list[Permission]], None],
+    test_users: list[UserType],
+):
+    user_a = test_users[0]  # Owner
+    user_b = test_users[1]  # Shared user whose permissions change
+    user_c = test_users[2]  # Shared user that gets detached
+
+    project_one = create_project(user_a)
+    todo_item = create_todo_item(
+        user_a, create_todo_category(user_a, project_one.id).id
+    )
+    attach_project_to_user(
+        user_a, user_b, project_one.id, [Permission.UPDATE_TODO_ITEM]
+    )
+    attach_project_to_user(
+        user_a, user_c, project_one.id, [Permission.UPDATE_TODO_ITEM]
+    )
+
+    with SessionLocalTest() as db:
+        PermissionContext.bind(db)
+
+        # both users are cached as permitted before their permissions change
+        for user in [user_b, user_c]:
+            validate_todo_item_belongs_to_user(
+                db, todo_item.id, user["id"], [Permission.UPDATE_TODO_ITEM]
+            )
+
+        project_crud.update_user_permissions(
+            db,
+            project_one.id,
+            ProjectUpdateUserPermissions(
+                user_id=user_b["id"], permissions=[Permission.CREATE_COMMENT]
+            ),
+            user_a["id"],
+        )
+        with pytest.raises(UserFriendlyError):
+            validate_todo_item_belongs_to_user(
+                db, todo_item.id, user_b["id"], [Permission.UPDATE_TODO_ITEM]
+            )
+        validate_todo_item_belongs_to_user(
+            db, todo_item.id, user_b["id"], [Permission.CREATE_COMMENT]
+        )
+
+        project_crud.detach_from_user(db, project_one.id, user_c["id"], user_a["id"])
+        with pytest.raises(UserFriendlyError):
+            validate_todo_item_belongs_to_user(db, todo_item.id, user_c["id"], None)
+        with pytest.raises(UserFriendlyError):
+            project_crud.validate_project_belongs_to_user(
+                db, project_one.id, user_c["id"], None
+            )
+
+
+def test_bulk_reorder_is_rejected_if_one_item_isnt_permitted(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    attach_project_to_user: Callable[[UserType, UserType, int, list[Permission]], None],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user_a = test_users[0]  # Owner
+    user_b = test_users[1]  # Shared user that can only update the items of project one
+
+    project_one = create_project(user_a)
+    project_two = create_project(user_a)
+    category_one = create_todo_category(user_a, project_one.id)
+    category_two = create_todo_category(user_a, project_two.id)
+    ids_one = [create_todo_item(user_a, category_one.id).id for _ in range(2)]
+    ids_two = [create_todo_item(user_a, category_two.id).id for _ in range(2)]
+
+    attach_project_to_user(
+        user_a, user_b, project_one.id, [Permission.UPDATE_TODO_ITEM]
+    )
+    attach_project_to_user(user_a, user_b, project_two.id, [Permission.CREATE_TAG])
+
+    def bulk_move(moves: list[dict[str, int | None]]):
+        return test_client.patch(
+            "/todo-items/order:batch",
+            headers=auth_header_factory(user_b),
+            json={"moves": moves},
+        )
+
+    def listed_ids(project_id: int, category_id: int):
+        response = test_client.get(
+            "/todo-items",
+            params={
+                "project_id": project_id,
+                "category_id": category_id,
+                "ordered": True,
+            },
+            headers=auth_header_factory(user_a),
+        )
+        assert response.status_code == 200, "Failed to list TODOs"
+        return [item["id"] for item in response.json()]
+
+    response = bulk_move(
+        [
+            {
+                "todo_id": ids_one[1],
+                "left_id": None,
+                "right_id": ids_one[0],
+                "new_category_id": category_one.id,
+            },
+            {
+                "todo_id": ids_two[1],
+                "left_id": None,
+                "right_id": ids_two[0],
+                "new_category_id": category_two.id,
+            },
+        ]
+    )
+    assert (
+        response.status_code == 400
+    ), "the batch should be rejected since User B can't update the items of project two"
+    assert (
+        UserFriendlyErrorSchema.model_validate(response.json()).code
+        == ErrorCode.TODO_NOT_FOUND
+    )
+
+    # the permitted move of the rejected batch isn't applied either
+    assert listed_ids(project_one.id, category_one.id) == ids_one
+    assert listed_ids(project_two.id, category_two.id) == ids_two
+
+    response = bulk_move(
+        [
+            {
+                "todo_id": ids_one[1],
+                "left_id": None,
+                "right_id": ids_one[0],
+                "new_category_id": category_one.id,
+            }
+        ]
+    )
+    assert response.status_code == 200, "User B should be able to reorder project one"
+    assert listed_ids(project_one.id, category_one.id) == ids_one[::-1]
@@ -1,12 +1,26 @@
+import asyncio
 from collections.abc import Callable
+from contextlib import AbstractContextManager
+from pathlib import Path
 from typing import cast
 
 import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
 from httpx import Response
 
+import api.dependencies.db
+from api.dependencies.db import LAST_WRITE_COOKIE, LAST_WRITE_HEADER
 from api.routes.error import UserFriendlyErrorSchema
+from api.routes.project.project import _stream_events
+from config import settings
+from db.db import get_db_params, init_database
 from db.models.user_project_permission import Permission
 from db.schemas.project import Project, ProjectAttachAssociationResponse
+from db.schemas.project_event import ProjectEvent, ProjectEventType
+from db.schemas.todo_category import TodoCategory
+from db.schemas.todo_item import TodoItem
+from db.utils.event_broker import EventSubscription, get_event_broker
 from error.exceptions import ErrorCode
 from tests.api.conftest import UserType
 
@@ -243,3 +257,331 @@ def test_attach_with_all_and_other_permissions(
     assert (
         attach_response.status_code == 422
     ), "shouldn't be able to set ALL permission alongside other permissions"
+
+
+def test_project_todo_counters(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    update_todo_item_done_status: Callable[[UserType, int, bool], TodoItem],
+    update_todo_item_order_request: Callable[
+        [UserType, int, int | None, int | None, int | None], Response
+    ],
+    delete_todo_item_request: Callable[[UserType, int], Response],
+    search_project: Callable[[UserType, int], Project],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+
+    project_a = create_project(user)
+    project_b = create_project(user)
+    category = create_todo_category(user, project_a.id)
+    todo_ids = [create_todo_item(user, category.id).id for _ in range(3)]
+
+    def assert_counters(project_id: int, done: int, pending: int):
+        project = search_project(user, project_id)
+        assert (
+            project.done_todos_count,
+            project.pending_todos_count,
+        ) == (done, pending), "project counters are out of sync with its todo items"
+
+    assert_counters(project_a.id, 0, 3)
+
+    update_todo_item_done_status(user, todo_ids[0], True)
+    assert_counters(project_a.id, 1, 2)
+
+    assert delete_todo_item_request(user, todo_ids[1]).status_code == 200
+    assert_counters(project_a.id, 1, 1)
+
+    # attaching a category adds its items to the counters of the project
+    response = test_client.post(
+        f"/todo-categories/{category.id}/projects",
+        headers=auth_header_factory(user),
+        json={"project_id": project_b.id},
+    )
+    assert response.status_code == 200, "Failed to attach the category"
+    assert_counters(project_b.id, 1, 1)
+
+    # moving an item to another category only changes the counters of the other projects
+    other_category = create_todo_category(user, project_a.id)
+    response = update_todo_item_order_request(
+        user, todo_ids[0], None, None, other_category.id
+    )
+    assert response.status_code == 200, "Failed to move the todo item"
+    assert_counters(project_a.id, 1, 1)
+    assert_counters(project_b.id, 0, 1)
+
+    response = test_client.delete(
+        f"/todo-categories/{category.id}/projects/{project_a.id}",
+        headers=auth_header_factory(user),
+    )
+    assert response.status_code == 200, "Failed to detach the category"
+    assert_counters(project_a.id, 1, 0)
+    assert_counters(project_b.id, 0, 1)
+
+
+def test_list_projects_query_count_does_not_grow_with_users(
+    create_project: Callable[[UserType], Project],
+    attach_project_to_user: Callable[[UserType, UserType, int, list[Permission]], None],
+    count_queries: Callable[[], AbstractContextManager[list[str]]],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    owner = test_users[0]
+    # a cached token wouldn't query the user, which would change the number of queries
+    monkeypatch.setattr(settings, "AUTH_CACHE_ENABLED", False)
+
+    def add_shared_projects(count: int):
+        for _ in range(count):
+            project = create_project(owner)
+            attach_project_to_user(
+                owner, test_users[1], project.id, [Permission.CREATE_TAG]
+            )
+            attach_project_to_user(
+                owner,
+                test_users[2],
+                project.id,
+                [Permission.UPDATE_TODO_ITEM, Permission.DELETE_TODO_ITEM],
+            )
+
+    def count_list_queries():
+        with count_queries() as statements:
+            response = test_client.get("/projects/", headers=auth_header_factory(owner))
+        assert response.status_code == 200, "Failed to list projects"
+
+        projects = [Project.model_validate(x, strict=True) for x in response.json()]
+        for project in projects[-2:]:
+            permissions = {user.id: set(user.permissions) for user in project.users}
+            assert permissions == {
+                owner["id"]: {Permission.ALL},
+                test_users[1]["id"]: {Permission.CREATE_TAG},
+                test_users[2]["id"]: {
+                    Permission.UPDATE_TODO_ITEM,
+                    Permission.DELETE_TODO_ITEM,
+                },
+            }, "each user should have their own permissions in the project"
+
+        return len(statements)
+
+    add_shared_projects(2)
+    small_list_queries = count_list_queries()
+
+    add_shared_projects(5)
+    assert (
+        count_list_queries() == small_list_queries
+    ), "the number of queries shouldn't depend on the number of projects or users"
+
+
+def test_list_projects_reads_from_replica_unless_user_wrote_recently(
+    create_project: Callable[[UserType], Project],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+):
+    user = test_users[0]
+    # an empty database stands in for a replica that hasn't caught up yet
+    replica = get_db_params(
+        f"sqlite:///{tmp_path / 'replica.db'}",
+        False,
+        (
+            f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+            if settings.SQLALCHEMY_ASYNC
+            else None
+        ),
+    )
+    init_database(replica["engine"])
+    monkeypatch.setattr(api.dependencies.db, "ReadSessionLocal", replica["session"])
+    monkeypatch.setattr(
+        api.dependencies.db, "ReadAsyncSessionLocal", replica["async_session"]
+    )
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 60)
+    # the client is shared by the tests, the marker of an earlier write would choose the primary
+    test_client.cookies.clear()
+
+    project = create_project(user)
+    last_write_at = test_client.cookies.get(LAST_WRITE_COOKIE)
+    assert last_write_at is not None, "the write should be sent back as a cookie"
+
+    def list_project_ids(headers: dict[str, str] | None = None):
+        response = test_client.get(
+            "/projects/", headers=auth_header_factory(user) | (headers or {})
+        )
+        assert response.status_code == 200
+        assert (
+            LAST_WRITE_HEADER not in response.headers
+        ), "the reads shouldn't refresh the marker"
+        return [item["id"] for item in response.json()]
+
+    assert (
+        project.id in list_project_ids()
+    ), "the user should read their own write from the primary"
+
+    # the marker travels with the client, so it doesn't matter which worker got the write
+    test_client.cookies.clear()
+    assert (
+        list_project_ids() == []
+    ), "a client without the marker should read from the replica"
+    assert project.id in list_project_ids(
+        {LAST_WRITE_HEADER: last_write_at}
+    ), "the marker can be sent back in a header instead of the cookie"
+
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 0)
+    assert (
+        list_project_ids({LAST_WRITE_HEADER: last_write_at}) == []
+    ), "once the window is over the user should read from the replica"
+
+    replica["engine"].dispose()
+    if replica["async_engine"] is not None:
+        replica["async_engine"].sync_engine.dispose()
+
+
+def test_project_events_are_published_after_commit(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    update_todo_item_order_request: Callable[..., Response],
+    attach_tag_to_todo: Callable[[UserType, int, int, str], Response],
+    create_comment: Callable[[UserType, int, str], object],
+    delete_todo_item_request: Callable[[UserType, int], Response],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+    project = create_project(user)
+    other_project = create_project(user)
+    first_category = create_todo_category(user, project.id)
+    second_category = create_todo_category(user, project.id)
+
+    # the subscription belongs to this loop, the events are queued on it from the app's threads
+    loop = asyncio.new_event_loop()
+
+    async def subscribe(project_id: int):
+        return get_event_broker().subscribe(project_id)
+
+    subscription = loop.run_until_complete(subscribe(project.id))
+    other_subscription = loop.run_until_complete(subscribe(other_project.id))
+
+    todo = create_todo_item(user, first_category.id)
+    response = update_todo_item_order_request(
+        user, todo.id, None, None, second_category.id
+    )
+    assert response.status_code == 200
+    response = attach_tag_to_todo(user, project.id, todo.id, "events-tag")
+    assert response.status_code == 200
+    create_comment(user, todo.id, "Test comment")
+    # a rejected mutation shouldn't publish anything
+    response = update_todo_item_order_request(
+        test_users[1], todo.id, None, None, first_category.id
+    )
+    assert response.status_code == 400
+    response = delete_todo_item_request(user, todo.id)
+    assert response.status_code == 200
+
+    async def collect(subscription: EventSubscription):
+        events: list[ProjectEvent] = []
+        while True:
+            try:
+                events.append(await asyncio.wait_for(subscription.get(), 0.2))
+            except TimeoutError:
+                return events
+
+    try:
+        events = loop.run_until_complete(collect(subscription))
+        other_events = loop.run_until_complete(collect(other_subscription))
+    finally:
+        subscription.close()
+        other_subscription.close()
+        loop.close()
+
+    assert [event.type for event in events] == [
+        ProjectEventType.TODO_ITEM_CREATED,
+        ProjectEventType.TODO_ITEM_MOVED,
+        ProjectEventType.TODO_ITEM_MOVED,
+        # the tag is created in the project before it's attached
+        ProjectEventType.PROJECT_UPDATED,
+        ProjectEventType.TAG_ATTACHED,
+        ProjectEventType.COMMENT_ADDED,
+        ProjectEventType.TODO_ITEM_DELETED,
+    ]
+    assert all(event.project_id == project.id for event in events)
+    assert all(
+        event.todo_id == todo.id
+        for event in events
+        if event.type != ProjectEventType.PROJECT_UPDATED
+    )
+    moved_event = events[2]
+    assert moved_event.category_id == second_category.id
+    assert moved_event.data == {"left_id": None, "right_id": None}
+    assert other_events == [], "the events of a project go to its own subscribers"
+
+
+def test_project_events_require_access_to_project(
+    create_project: Callable[[UserType], Project],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    project = create_project(test_users[0])
+
+    response = test_client.get(
+        f"/projects/{project.id}/events", headers=auth_header_factory(test_users[1])
+    )
+
+    assert response.status_code == 400
+    assert response.json()["code"] == ErrorCode.PROJECT_NOT_FOUND
+
+
+def test_project_events_stream_ends_when_user_is_detached(
+    create_and_attach_project: Callable[
+        [UserType, UserType, list[Permission]], Project
+    ],
+    detach_project_from_user: Callable[[UserType, UserType, int], None],
+    test_users: list[UserType],
+):
+    owner = test_users[0]
+    shared_user = test_users[1]
+    project = create_and_attach_project(owner, shared_user, [Permission.ALL])
+
+    class ConnectedRequest:
+        async def is_disconnected(self):
+            return False
+
+    async def read_stream(user: UserType, messages: list[str]):
+        async for message in _stream_events(
+            cast(Request, ConnectedRequest()), project.id, user["id"]
+        ):
+            messages.append(message)
+
+    loop = asyncio.new_event_loop()
+    owner_messages: list[str] = []
+    shared_user_messages: list[str] = []
+    owner_stream = loop.create_task(read_stream(owner, owner_messages))
+    shared_user_stream = loop.create_task(
+        read_stream(shared_user, shared_user_messages)
+    )
+    # lets the streams subscribe before the user is detached
+    loop.run_until_complete(asyncio.sleep(0))
+
+    try:
+        detach_project_from_user(owner, shared_user, project.id)
+
+        loop.run_until_complete(asyncio.wait_for(shared_user_stream, 1))
+        loop.run_until_complete(asyncio.sleep(0.2))
+        assert not owner_stream.done(), "the stream of the owner should stay open"
+    finally:
+        owner_stream.cancel()
+        loop.run_until_complete(asyncio.gather(owner_stream, return_exceptions=True))
+        loop.close()
+
+    assert [message.partition("\n")[0] for message in shared_user_messages] == [
+        f"event: {ProjectEventType.USER_DETACHED}"
+    ], "the detached user shouldn't get the events after they lost the access"
+    assert [message.partition("\n")[0] for message in owner_messages] == [
+        f"event: {ProjectEventType.USER_DETACHED}",
+        f"event: {ProjectEventType.PROJECT_UPDATED}",
+    ]
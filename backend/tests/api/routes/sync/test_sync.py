@@ -0,0 +1,330 @@
+import datetime
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+
+import pytest
+from fastapi.testclient import TestClient
+from httpx import Response
+from sqlalchemy import func, select
+
+from config import settings
+from db.models.change_log import ChangedEntity, ChangeLogEntry, ChangeOperation
+from db.models.user_project_permission import Permission
+from db.schemas.project import Project
+from db.schemas.sync import SyncChanges, SyncDeletedEntity
+from db.schemas.todo_category import TodoCategory
+from db.schemas.todo_item import TodoItem
+from db.schemas.todo_item_comment import TodoComment
+from db.utils.change_log import compact_change_log, log_changes
+from tests.api.conftest import UserType
+from tests.db.test import SessionLocalTest
+
+
+def test_sync_returns_the_changes_since_the_version(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    create_comment: Callable[[UserType, int, str], TodoComment],
+    delete_todo_item_request: Callable[[UserType, int], Response],
+    sync_changes: Callable[[UserType, int], SyncChanges],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+    version = sync_changes(user, 0).version
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    first_todo = create_todo_item(user, category.id)
+
+    changes = sync_changes(user, version)
+    assert changes.reset is False
+    assert [project.id for project in changes.projects] == [project.id]
+    assert changes.projects[0].todo_category_ids == [category.id]
+    assert [category.id for category in changes.todo_categories] == [category.id]
+    assert changes.todo_categories[0].todo_ids == [first_todo.id]
+    assert [todo.id for todo in changes.todo_items] == [first_todo.id]
+    assert changes.deleted == []
+
+    second_todo = create_todo_item(user, category.id)
+    comment = create_comment(user, second_todo.id, "a comment")
+    assert delete_todo_item_request(user, first_todo.id).status_code == 200
+
+    changes = sync_changes(user, changes.version)
+    # only what changed since the last sync is returned
+    assert changes.projects == []
+    assert [category.id for category in changes.todo_categories] == [category.id]
+    assert changes.todo_categories[0].todo_ids == [second_todo.id]
+    assert [todo.id for todo in changes.todo_items] == [second_todo.id]
+    assert changes.todo_items[0].comments_count == 1
+    assert [comment.id for comment in changes.comments] == [comment.id]
+    assert changes.deleted == [
+        SyncDeletedEntity(
+            entity_type=ChangedEntity.TODO_ITEM,
+            id=first_todo.id,
+            project_id=project.id,
+        )
+    ]
+
+    unchanged = sync_changes(user, changes.version)
+    assert unchanged.version == changes.version
+    assert unchanged.todo_items == [] and unchanged.deleted == []
+
+
+def test_sync_deletes_the_projects_of_detached_users(
+    create_project: Callable[[UserType], Project],
+    attach_project_to_user: Callable[[UserType, UserType, int, list[Permission]], None],
+    detach_project_from_user: Callable[[UserType, UserType, int], None],
+    sync_changes: Callable[[UserType, int], SyncChanges],
+    test_users: list[UserType],
+):
+    owner = test_users[0]
+    shared_user = test_users[1]
+    version = sync_changes(shared_user, 0).version
+
+    project = create_project(owner)
+    attach_project_to_user(owner, shared_user, project.id, [Permission.CREATE_TAG])
+
+    changes = sync_changes(shared_user, version)
+    assert [project.id for project in changes.projects] == [project.id]
+
+    owner_version = sync_changes(owner, 0).version
+    detach_project_from_user(owner, shared_user, project.id)
+
+    changes = sync_changes(shared_user, changes.version)
+    assert changes.projects == []
+    assert changes.deleted == [
+        SyncDeletedEntity(
+            entity_type=ChangedEntity.PROJECT, id=project.id, project_id=project.id
+        )
+    ]
+
+    # the owner still has the project, without the detached user
+    owner_changes = sync_changes(owner, owner_version)
+    assert [project.id for project in owner_changes.projects] == [project.id]
+    assert [user.id for user in owner_changes.projects[0].users] == [owner["id"]]
+    assert owner_changes.deleted == []
+
+
+def test_sync_resets_the_clients_that_synced_before_the_compaction(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    update_todo_category_request: Callable[[UserType, int, str], Response],
+    delete_todo_item_request: Callable[[UserType, int], Response],
+    sync_changes: Callable[[UserType, int], SyncChanges],
+    test_users: list[UserType],
+):
+    user = test_users[2]
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    todo = create_todo_item(user, category.id)
+    version = sync_changes(user, 0).version
+
+    assert update_todo_category_request(user, category.id, "title").status_code == 200
+    assert delete_todo_item_request(user, todo.id).status_code == 200
+
+    with SessionLocalTest() as db:
+        compact_change_log(db, datetime.timedelta(0))
+        db.commit()
+
+        # only the latest change of the category is kept
+        assert (
+            db.scalar(
+                select(func.count()).where(
+                    ChangeLogEntry.entity_type == ChangedEntity.TODO_CATEGORY,
+                    ChangeLogEntry.entity_id == category.id,
+                )
+            )
+            == 1
+        )
+
+    # the delete of the todo item is compacted away, the client can't know about it anymore
+    changes = sync_changes(user, version)
+    assert changes.reset is True
+    assert changes.todo_categories == [] and changes.deleted == []
+
+    # the client loads everything again and continues from the version of the reset
+    assert sync_changes(user, changes.version).reset is False
+
+
+@pytest.mark.parametrize("ordering_backend", ["linked_list", "rank"])
+def test_sync_query_count_does_not_grow_with_projects(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    sync_changes: Callable[[UserType, int], SyncChanges],
+    count_queries: Callable[[], AbstractContextManager[list[str]]],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    monkeypatch: pytest.MonkeyPatch,
+    ordering_backend: str,
+):
+    monkeypatch.setattr(settings, "ORDERING_BACKEND", ordering_backend)
+    # a cached token wouldn't query the user, which would change the number of queries
+    monkeypatch.setattr(settings, "AUTH_CACHE_ENABLED", False)
+    user = test_users[0]
+
+    shared_category = create_todo_category(user, create_project(user).id)
+    expected_category_ids: dict[int, list[int]] = {}
+
+    def add_projects(count: int):
+        for _ in range(count):
+            project = create_project(user)
+            category = create_todo_category(user, project.id)
+            # the shared category is placed first, it's in the list of every project
+            response = test_client.post(
+                f"/todo-categories/{shared_category.id}/projects",
+                headers=auth_header_factory(user),
+                json={"project_id": project.id},
+            )
+            assert response.status_code == 200, "Failed to attach the category"
+            expected_category_ids[project.id] = [shared_category.id, category.id]
+
+    def count_sync_queries(since: int):
+        with count_queries() as statements:
+            changes = sync_changes(user, since)
+
+        added = [
+            project
+            for project in changes.projects
+            if project.id in expected_category_ids
+        ]
+        assert len(added) == len(expected_category_ids)
+        assert all(
+            project.todo_category_ids == expected_category_ids[project.id]
+            for project in added
+        ), "the categories of each project should be in their order"
+
+        return len(statements)
+
+    version = sync_changes(user, 0).version
+    add_projects(1)
+    few_projects_queries = count_sync_queries(version)
+
+    add_projects(4)
+    many_projects_queries = count_sync_queries(version)
+
+    assert (
+        few_projects_queries == many_projects_queries
+    ), "the number of queries shouldn't depend on the number of projects"
+
+
+def test_sync_returns_the_todo_items_of_a_deleted_tag(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    attach_tag_to_todo: Callable[[UserType, int, int, str], Response],
+    sync_changes: Callable[[UserType, int], SyncChanges],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user = test_users[1]
+    version = sync_changes(user, 0).version
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    todo = create_todo_item(user, category.id)
+    response = attach_tag_to_todo(user, project.id, todo.id, "deleted-tag")
+    assert response.status_code == 200, "Failed to attach the tag"
+
+    changes = sync_changes(user, version)
+    (tag,) = [tag for tag in changes.tags if tag.name == "deleted-tag"]
+    version = changes.version
+
+    response = test_client.request(
+        "DELETE",
+        "/tags/deleted-tag",
+        headers=auth_header_factory(user),
+        json={"project_id": project.id},
+    )
+    assert response.status_code == 200, "Failed to delete the tag"
+
+    changes = sync_changes(user, version)
+    assert [todo.id for todo in changes.todo_items] == [
+        todo.id
+    ], "the todo items lost the tag, the clients have to get them again"
+    assert changes.todo_items[0].tags == []
+    assert (
+        SyncDeletedEntity(
+            entity_type=ChangedEntity.TAG, id=tag.id, project_id=project.id
+        )
+        in changes.deleted
+    )
+
+
+def test_sync_deletes_the_todo_items_of_a_deleted_category(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    delete_todo_category_request: Callable[[UserType, int, int], Response],
+    sync_changes: Callable[[UserType, int], SyncChanges],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    todos = [create_todo_item(user, category.id) for _ in range(2)]
+    version = sync_changes(user, 0).version
+
+    # the category is deleted along with its items once it's detached from its last project
+    response = delete_todo_category_request(user, category.id, project.id)
+    assert response.status_code == 200, "Failed to delete the category"
+
+    changes = sync_changes(user, version)
+    for todo in todos:
+        assert (
+            SyncDeletedEntity(
+                entity_type=ChangedEntity.TODO_ITEM, id=todo.id, project_id=project.id
+            )
+            in changes.deleted
+        ), "the clients should drop the items of the deleted category"
+    assert (
+        SyncDeletedEntity(
+            entity_type=ChangedEntity.TODO_CATEGORY,
+            id=category.id,
+            project_id=project.id,
+        )
+        in changes.deleted
+    )
+
+
+def test_change_log_versions_follow_the_commit_order(
+    create_project: Callable[[UserType], Project],
+    test_users: list[UserType],
+):
+    project = create_project(test_users[0])
+
+    def get_versions(operation: ChangeOperation):
+        with SessionLocalTest() as db:
+            return db.scalars(
+                select(ChangeLogEntry.version).where(
+                    ChangeLogEntry.project_id == project.id,
+                    ChangeLogEntry.entity_type == ChangedEntity.TAG,
+                    ChangeLogEntry.operation == operation,
+                )
+            ).all()
+
+    with SessionLocalTest() as first_db, SessionLocalTest() as second_db:
+        log_changes(first_db, ChangedEntity.TAG, [1], [project.id])
+        log_changes(
+            second_db, ChangedEntity.TAG, [2], [project.id], ChangeOperation.DELETE
+        )
+        second_db.commit()
+        first_db.commit()
+
+    (first_version,) = get_versions(ChangeOperation.UPSERT)
+    (second_version,) = get_versions(ChangeOperation.DELETE)
+    assert (
+        second_version < first_version
+    ), "the versions are given when the changes are committed"
+
+    with SessionLocalTest() as db:
+        log_changes(db, ChangedEntity.TAG, [3], [project.id])
+        db.rollback()
+
+    assert get_versions(ChangeOperation.UPSERT) == [
+        first_version
+    ], "the changes of a rolled back transaction shouldn't be logged"
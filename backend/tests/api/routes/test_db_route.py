@@ -0,0 +1,117 @@
+from pathlib import Path
+from typing import Annotated
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI, Response
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api.dependencies.db import open_async_db
+from api.routes.db_route import DbRoute
+from config import settings
+from db.db import get_db_params
+
+
+class _Item(BaseModel):
+    id: int
+    title: str
+
+
+class _Row:
+    def __init__(self, id: int, title: str):
+        self.id = id
+        self.title = title
+
+
+def _set_header(response: Response):
+    response.headers["ETag"] = '"1"'
+
+
+def _create_client():
+    router = APIRouter(prefix="/items", route_class=DbRoute)
+
+    @router.get("/", response_model=list[_Item], dependencies=[Depends(_set_header)])
+    def list_items():
+        return [_Row(1, "first"), _Row(2, "ünicode")]
+
+    @router.post("/", response_model=_Item, status_code=201)
+    def create_item(response: Response):
+        response.headers["X-Created"] = "yes"
+        return _Row(3, "created")
+
+    @router.get("/empty", response_model=_Item)
+    def empty():
+        return Response(status_code=204)
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("fast_json_responses", [False, True])
+def test_fast_json_responses_render_the_same_response(
+    fast_json_responses: bool, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", fast_json_responses)
+    client = _create_client()
+    assert all(
+        getattr(route.endpoint, "_renders_json", False) == fast_json_responses
+        for route in client.app.routes  # type: ignore
+        if isinstance(route, DbRoute)
+    )
+
+    response = client.get("/items/")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["ETag"] == '"1"'
+    assert (
+        response.content
+        == '[{"id":1,"title":"first"},{"id":2,"title":"ünicode"}]'.encode()
+    )
+
+    response = client.post("/items/")
+    assert response.status_code == 201
+    assert response.headers["X-Created"] == "yes"
+    assert response.json() == {"id": 3, "title": "created"}
+
+    # the responses returned by the endpoints are sent as they are
+    assert client.get("/items/empty").status_code == 204
+
+
+def test_sync_endpoints_query_the_async_engine_in_async_mode(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    monkeypatch.setattr(settings, "SQLALCHEMY_ASYNC", True)
+    params = get_db_params(
+        f"sqlite:///{tmp_path / 'async.db'}",
+        False,
+        f"sqlite+aiosqlite:///{tmp_path / 'async.db'}",
+    )
+
+    async def get_async_db():
+        async for db in open_async_db(params["async_session"]):
+            yield db
+
+    router = APIRouter(prefix="/items", route_class=DbRoute)
+
+    @router.get("/", response_model=_Item)
+    def read_item(db: Annotated[Session, Depends(get_async_db)]):
+        connection = db.connection().connection.driver_connection
+        return _Row(
+            db.execute(text("SELECT 1")).scalar_one(), type(connection).__module__
+        )
+
+    app = FastAPI()
+    app.include_router(router)
+
+    response = TestClient(app).get("/items/")
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": 1,
+        "title": "aiosqlite.core",
+    }, "the sync endpoint should run its queries on the async driver"
+
+    params["engine"].dispose()
+    params["async_engine"].sync_engine.dispose()  # type: ignore
@@ -1,10 +1,16 @@
 from collections.abc import Callable
+from contextlib import AbstractContextManager
 
+import pytest
+from fastapi.testclient import TestClient
 from httpx import Response
 
+from config import settings
 from db.models.user_project_permission import Permission
 from db.schemas.project import Project
 from db.schemas.todo_category import TodoCategory
+from db.schemas.todo_item import TodoItem
+from db.schemas.todo_item_comment import TodoComment
 from tests.api.conftest import UserType
 
 
@@ -159,3 +165,196 @@ def test_todo_category_delete_no_permission(
     assert (
         response.status_code == 400
     ), "User B should not be able to delete the category without permission"
+
+
+def test_list_todo_categories_in_order(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+
+    project = create_project(user)
+    category_ids = [create_todo_category(user, project.id).id for _ in range(3)]
+    todo_ids = [create_todo_item(user, category_ids[0]).id for _ in range(3)]
+
+    # move the last category to be the first
+    response = test_client.patch(
+        f"/todo-categories/{category_ids[-1]}",
+        headers=auth_header_factory(user),
+        json={
+            "order": {
+                "left_id": None,
+                "right_id": category_ids[0],
+                "project_id": project.id,
+            }
+        },
+    )
+    assert response.status_code == 200, "Failed to reorder categories"
+
+    response = test_client.get(
+        "/todo-categories",
+        params={"project_id": project.id, "ordered": True},
+        headers=auth_header_factory(user),
+    )
+    assert response.status_code == 200, "Failed to list categories"
+
+    categories = [TodoCategory.model_validate(x, strict=True) for x in response.json()]
+    assert [category.id for category in categories] == [
+        category_ids[-1]
+    ] + category_ids[
+        :-1
+    ], "categories should be returned in the order of their linked list"
+    assert [category.position for category in categories] == [0, 1, 2]
+
+    items = categories[1].items
+    assert [item.id for item in items] == todo_ids, "items should be sorted as well"
+    assert [item.position for item in items] == [0, 1, 2]
+
+
+def test_list_todo_categories_query_count_does_not_grow_with_items(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    attach_tag_to_todo: Callable[[UserType, int, int, str], Response],
+    create_comment: Callable[[UserType, int, str], TodoComment],
+    update_todo_item_done_status: Callable[[UserType, int, bool], TodoItem],
+    count_queries: Callable[[], AbstractContextManager[list[str]]],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    user = test_users[0]
+    # a cached token wouldn't query the user, which would change the number of queries
+    monkeypatch.setattr(settings, "AUTH_CACHE_ENABLED", False)
+
+    project = create_project(user)
+    category_ids = [create_todo_category(user, project.id).id for _ in range(2)]
+
+    todo_ids: list[int] = []
+
+    def add_todo_items(count: int):
+        for index in range(count):
+            todo = create_todo_item(user, category_ids[index % 2])
+            response = attach_tag_to_todo(user, project.id, todo.id, f"tag-{index}")
+            assert response.status_code == 200, "Failed to attach the tag"
+            create_comment(user, todo.id, "Test comment")
+
+            # every item depends on the previous one
+            if len(todo_ids) > 0:
+                response = test_client.post(
+                    f"/todo-items/{todo.id}/dependencies",
+                    headers=auth_header_factory(user),
+                    json={"dependant_todo_id": todo_ids[-1]},
+                )
+                assert response.status_code == 200, "Failed to add the dependency"
+
+            update_todo_item_done_status(user, todo.id, True)
+            todo_ids.append(todo.id)
+
+    def count_list_queries(ordered: bool):
+        with count_queries() as statements:
+            response = test_client.get(
+                "/todo-categories",
+                params={"project_id": project.id, "ordered": ordered},
+                headers=auth_header_factory(user),
+            )
+        assert response.status_code == 200, "Failed to list categories"
+
+        categories = [
+            TodoCategory.model_validate(x, strict=True) for x in response.json()
+        ]
+        items = [item for category in categories for item in category.items]
+        assert all(
+            item.comments_count == 1
+            and len(item.tags) == 1
+            and item.marked_as_done_by is not None
+            for item in items
+        ), "the items should be fully loaded"
+        assert (
+            sum(len(item.dependencies) for item in items) == len(todo_ids) - 1
+        ), "the dependencies should be loaded"
+
+        return len(statements)
+
+    add_todo_items(2)
+    small_board_queries = {
+        ordered: count_list_queries(ordered) for ordered in [False, True]
+    }
+
+    add_todo_items(10)
+    large_board_queries = {
+        ordered: count_list_queries(ordered) for ordered in [False, True]
+    }
+
+    assert (
+        small_board_queries == large_board_queries
+    ), "the number of queries shouldn't depend on the number of items"
+    assert all(
+        count <= 15 for count in large_board_queries.values()
+    ), "the board should be loaded with a few queries"
+
+
+def test_list_todo_categories_answers_not_modified_until_the_board_changes(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    create_comment: Callable[[UserType, int, str], TodoComment],
+    attach_project_to_user: Callable[[UserType, UserType, int, list[Permission]], None],
+    count_queries: Callable[[], AbstractContextManager[list[str]]],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    todo = create_todo_item(user, category.id)
+
+    def list_categories(user: UserType, etag: str | None = None):
+        headers = auth_header_factory(user)
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        return test_client.get(
+            "/todo-categories",
+            params={"project_id": project.id},
+            headers=headers,
+        )
+
+    response = list_categories(user)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    with count_queries() as statements:
+        response = list_categories(user, etag)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert not any(
+        "todo_category" in statement for statement in statements
+    ), "the board shouldn't be built for an up to date client"
+
+    def assert_changed(change: Callable[[], object]):
+        nonlocal etag
+        change()
+        response = list_categories(user, etag)
+        assert response.status_code == 200, "the board changed, it should be sent"
+        assert response.headers["ETag"] != etag
+        etag = response.headers["ETag"]
+
+    assert_changed(lambda: create_todo_item(user, category.id))
+    assert_changed(lambda: create_comment(user, todo.id, "Test comment"))
+    assert_changed(
+        lambda: attach_project_to_user(
+            user, test_users[1], project.id, [Permission.ALL]
+        )
+    )
+
+    response = list_categories(test_users[1], etag)
+    assert (
+        response.status_code == 200
+    ), "the etag of a user shouldn't match the board of another user"
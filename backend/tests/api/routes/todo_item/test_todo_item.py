@@ -1,15 +1,24 @@
+import threading
 from collections.abc import Callable
 
 import pytest
+from fastapi.testclient import TestClient
 from httpx import Response
+from sqlalchemy import event
 
 from api.routes.error import UserFriendlyErrorSchema
+from config import settings
+from db.models.todo_category_action import Action
 from db.models.user_project_permission import Permission
 from db.schemas.project import Project
+from db.schemas.sync import SyncChanges
 from db.schemas.todo_category import TodoCategory
 from db.schemas.todo_item import TodoItem
+from db.utils.project_versions import get_project_version
+from db.utils.shared.ranked_item import _rebalancer
 from error.exceptions import ErrorCode
 from tests.api.conftest import UserType
+from tests.db.test import SessionLocalTest, async_engine, engine
 
 
 def test_create_todo_item_in_invalid_category(
@@ -130,6 +139,302 @@ def test_reorder_todos(
     ), "after reorder, oldest todo must be the first one in the list"
 
 
+@pytest.mark.parametrize("number_of_todos_to_create", [5])
+def test_list_todos_in_order(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    number_of_todos_to_create: int,
+):
+    user = test_users[0]
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    ids = [
+        create_todo_item(user, category.id).id for _ in range(number_of_todos_to_create)
+    ]
+
+    # move the last item to be the first
+    response = test_client.patch(
+        f"/todo-items/{ids[-1]}",
+        headers=auth_header_factory(user),
+        json={
+            "order": {
+                "left_id": None,
+                "right_id": ids[0],
+                "new_category_id": category.id,
+            }
+        },
+    )
+    assert response.status_code == 200, "Failed to reorder todos"
+
+    response = test_client.get(
+        "/todo-items",
+        params={
+            "project_id": project.id,
+            "category_id": category.id,
+            "ordered": True,
+        },
+        headers=auth_header_factory(user),
+    )
+    assert response.status_code == 200, "Failed to list TODOs"
+
+    todos = [TodoItem.model_validate(x, strict=True) for x in response.json()]
+    assert [todo.id for todo in todos] == [ids[-1]] + ids[
+        :-1
+    ], "todos should be returned in the order of their linked list"
+    assert [todo.position for todo in todos] == list(
+        range(number_of_todos_to_create)
+    ), "each todo should have its position in the list"
+
+
+def test_bulk_reorder_todos(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+
+    project = create_project(user)
+    category_a = create_todo_category(user, project.id)
+    category_b = create_todo_category(user, project.id)
+    ids = [create_todo_item(user, category_a.id).id for _ in range(5)]
+
+    def bulk_move(moves: list[dict[str, int | None]]):
+        return test_client.patch(
+            "/todo-items/order:batch",
+            headers=auth_header_factory(user),
+            json={"moves": moves},
+        )
+
+    def listed_ids(category_id: int):
+        response = test_client.get(
+            "/todo-items",
+            params={
+                "project_id": project.id,
+                "category_id": category_id,
+                "ordered": True,
+            },
+            headers=auth_header_factory(user),
+        )
+        assert response.status_code == 200, "Failed to list TODOs"
+        return [item["id"] for item in response.json()]
+
+    # move two items to another category and reorder the remaining ones, each move sees the result
+    # of the previous moves
+    response = bulk_move(
+        [
+            {
+                "todo_id": ids[1],
+                "left_id": None,
+                "right_id": None,
+                "new_category_id": category_b.id,
+            },
+            {
+                "todo_id": ids[3],
+                "left_id": None,
+                "right_id": ids[1],
+                "new_category_id": category_b.id,
+            },
+            {
+                "todo_id": ids[4],
+                "left_id": None,
+                "right_id": ids[0],
+                "new_category_id": category_a.id,
+            },
+        ]
+    )
+    assert response.status_code == 200, "Failed to reorder todos"
+    assert listed_ids(category_a.id) == [ids[4], ids[0], ids[2]]
+    assert listed_ids(category_b.id) == [ids[3], ids[1]]
+
+    # the whole batch is rejected if one of its moves is invalid
+    response = bulk_move(
+        [
+            {
+                "todo_id": ids[2],
+                "left_id": ids[3],
+                "right_id": ids[1],
+                "new_category_id": category_b.id,
+            },
+            {
+                "todo_id": ids[0],
+                "left_id": ids[4],
+                "right_id": ids[4],
+                "new_category_id": category_a.id,
+            },
+        ]
+    )
+    assert response.status_code == 400, "the second move creates a cyclic order"
+    parsed_error = UserFriendlyErrorSchema.model_validate(response.json())
+    assert parsed_error.code == ErrorCode.INVALID_INPUT
+    assert listed_ids(category_a.id) == [ids[4], ids[0], ids[2]]
+    assert listed_ids(category_b.id) == [ids[3], ids[1]]
+
+    response = bulk_move(
+        [
+            {
+                "todo_id": ids[3],
+                "left_id": ids[4],
+                "right_id": ids[2],
+                "new_category_id": category_a.id,
+            }
+        ]
+    )
+    assert (
+        response.status_code == 400
+    ), "left and right items must be next to each other"
+
+
+@pytest.mark.parametrize("number_of_todos_to_create", [5])
+def test_reorder_todos_with_rank_ordering(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    list_todo_items: Callable[[UserType, int, int], list[TodoItem]],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    number_of_todos_to_create: int,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(settings, "ORDERING_BACKEND", "rank")
+    user = test_users[0]
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    created_todos = [
+        create_todo_item(user, category.id) for _ in range(number_of_todos_to_create)
+    ]
+
+    def move(todo_id: int, left_id: int | None, right_id: int | None):
+        response = test_client.patch(
+            f"/todo-items/{todo_id}",
+            headers=auth_header_factory(user),
+            json={
+                "order": {
+                    "left_id": left_id,
+                    "right_id": right_id,
+                    "new_category_id": category.id,
+                }
+            },
+        )
+        assert response.status_code == 200, "Failed to reorder todos"
+
+    def listed_ids():
+        todos = list_todo_items(user, project.id, category.id)
+        ranks = [todo.order.rank for todo in todos]
+        assert all(rank is not None for rank in ranks), "every todo must have a rank"
+        assert ranks == sorted(ranks), "todos should be sorted by their rank"
+        return [todo.id for todo in todos]
+
+    ids = [todo.id for todo in created_todos]
+    assert listed_ids() == ids, "new todos should be added to the end of the list"
+
+    # move the last item to be the first
+    move(ids[-1], None, ids[0])
+    ids = [ids[-1]] + ids[:-1]
+    assert listed_ids() == ids
+
+    # move the first item right after the third one
+    move(ids[0], ids[2], None)
+    ids = ids[1:3] + [ids[0]] + ids[3:]
+    assert listed_ids() == ids
+
+    # move an item between two other items
+    move(ids[-1], ids[0], ids[1])
+    ids = [ids[0], ids[-1]] + ids[1:-1]
+    assert listed_ids() == ids
+
+    response = test_client.patch(
+        f"/todo-items/{ids[0]}",
+        headers=auth_header_factory(user),
+        json={
+            "order": {
+                "left_id": ids[2],
+                "right_id": ids[1],
+                "new_category_id": category.id,
+            }
+        },
+    )
+    assert response.status_code == 400, "left item must be placed before the right item"
+    parsed_error = UserFriendlyErrorSchema.model_validate(response.json())
+    assert parsed_error.code == ErrorCode.INVALID_INPUT
+
+
+def test_long_ranks_are_rebalanced(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    list_todo_items: Callable[[UserType, int, int], list[TodoItem]],
+    sync_changes: Callable[[UserType, int], SyncChanges],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(settings, "ORDERING_BACKEND", "rank")
+    monkeypatch.setattr(settings, "RANK_MAX_LENGTH", 2)
+    user = test_users[0]
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    ids = [create_todo_item(user, category.id).id for _ in range(3)]
+
+    # holds the rebalances back until the version after the moves is read
+    moves_done = threading.Event()
+    _rebalancer.submit(moves_done.wait)
+
+    # every move lands right after the first item, so the new ranks get longer each time
+    for _ in range(8):
+        response = test_client.patch(
+            f"/todo-items/{ids[2]}",
+            headers=auth_header_factory(user),
+            json={
+                "order": {
+                    "left_id": ids[0],
+                    "right_id": ids[1],
+                    "new_category_id": category.id,
+                }
+            },
+        )
+        assert response.status_code == 200, "Failed to reorder todos"
+        ids = [ids[0], ids[2], ids[1]]
+
+    try:
+        version = sync_changes(user, 0).version
+        with SessionLocalTest() as db:
+            project_version = get_project_version(db, project.id, user["id"])
+    finally:
+        moves_done.set()
+
+    # the rebalances run one after another, so this waits for the scheduled ones
+    _rebalancer.submit(lambda: None).result()
+
+    with SessionLocalTest() as db:
+        assert (
+            get_project_version(db, project.id, user["id"]) != project_version
+        ), "the cached boards should become stale after a rebalance"
+    changes = sync_changes(user, version)
+    assert sorted(todo.id for todo in changes.todo_items) == sorted(
+        ids
+    ), "the clients should get the new ranks of the items"
+
+    todos = list_todo_items(user, project.id, category.id)
+    ranks = [todo.order.rank for todo in todos]
+    assert [todo.id for todo in todos] == ids, "rebalancing shouldn't change the order"
+    assert ranks == sorted(ranks)
+    assert all(
+        rank is not None and len(rank) <= settings.RANK_MAX_LENGTH for rank in ranks
+    ), "the ranks should be shortened"
+
+
 def test_todo_item_permissions(
     create_project: Callable[[UserType], Project],
     create_todo_category: Callable[[UserType, int], TodoCategory],
@@ -216,3 +521,212 @@ def test_todo_item_done_status_changes(
 
     # now user_a should be able to update it
     update_todo_item_done_status(user_a, todo_item.id, True)
+
+
+def test_creating_in_a_category_with_actions_is_a_single_change(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+
+    response = test_client.patch(
+        f"/todo-categories/{category.id}",
+        headers=auth_header_factory(user),
+        json={"item": {"actions": [Action.AUTO_MARK_AS_DONE]}},
+    )
+    assert response.status_code == 200
+
+    def get_version():
+        with SessionLocalTest() as db:
+            return get_project_version(db, project.id, user["id"])
+
+    commits: list[object] = []
+
+    def _collect_commit(connection):
+        commits.append(connection)
+
+    # the routes query the async engine when the tests run with SQLALCHEMY_ASYNC
+    engines = [engine] + ([async_engine.sync_engine] if async_engine else [])
+    version = get_version()
+    for db_engine in engines:
+        event.listen(db_engine, "commit", _collect_commit)
+    try:
+        todo = create_todo_item(user, category.id)
+    finally:
+        for db_engine in engines:
+            event.remove(db_engine, "commit", _collect_commit)
+
+    assert todo.is_done, "the action of the category should mark the item as done"
+    assert (
+        len(commits) == 1
+    ), "the item shouldn't be visible before the actions of its category run"
+    assert get_version() == version + 1
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_list_todos_with_pagination(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    ordered: bool,
+):
+    user = test_users[0]
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    for _ in range(5):
+        create_todo_item(user, category.id)
+
+    def list_todos(**params):
+        response = test_client.get(
+            "/todo-items",
+            params={
+                "project_id": project.id,
+                "category_id": category.id,
+                "ordered": ordered,
+                **params,
+            },
+            headers=auth_header_factory(user),
+        )
+        assert response.status_code == 200, "Failed to list todo items"
+        return [
+            TodoItem.model_validate(x, strict=True) for x in response.json()
+        ], response.headers.get("X-Next-Cursor")
+
+    all_todos, next_cursor = list_todos()
+    assert next_cursor is None, "there is no next page without a limit"
+
+    pages: list[list[int]] = []
+    while len(pages) == 0 or next_cursor is not None:
+        params = {"limit": 2}
+        if next_cursor is not None:
+            params["after_id"] = int(next_cursor)
+
+        page, next_cursor = list_todos(**params)
+        pages.append([todo.id for todo in page])
+
+    assert pages == [
+        [todo.id for todo in all_todos[index : index + 2]] for index in range(0, 5, 2)
+    ], "the pages should contain all of the items in the same order"
+
+
+@pytest.mark.parametrize(
+    "ordered, ordering_backend, is_rejected",
+    [
+        (True, "linked_list", True),
+        (False, "rank", True),
+        # the unordered linked lists are paged by id only, which doesn't need the cursor item
+        (False, "linked_list", False),
+    ],
+)
+def test_list_todos_after_the_cursor_item_is_deleted(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    delete_todo_item_request: Callable[[UserType, int], Response],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+    monkeypatch: pytest.MonkeyPatch,
+    ordered: bool,
+    ordering_backend: str,
+    is_rejected: bool,
+):
+    monkeypatch.setattr(settings, "ORDERING_BACKEND", ordering_backend)
+    user = test_users[0]
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    for _ in range(4):
+        create_todo_item(user, category.id)
+
+    def list_todos(**params):
+        return test_client.get(
+            "/todo-items",
+            params={
+                "project_id": project.id,
+                "category_id": category.id,
+                "ordered": ordered,
+                **params,
+            },
+            headers=auth_header_factory(user),
+        )
+
+    all_ids = [todo["id"] for todo in list_todos().json()]
+    response = list_todos(limit=2)
+    assert response.status_code == 200, "Failed to list todo items"
+    next_cursor = int(response.headers["X-Next-Cursor"])
+
+    response = delete_todo_item_request(user, next_cursor)
+    assert response.status_code == 200, "Failed to delete the todo item"
+
+    response = list_todos(limit=2, after_id=next_cursor)
+    if is_rejected:
+        assert (
+            response.status_code == 400
+        ), "a stale cursor shouldn't silently skip the rest of the items"
+        assert (
+            UserFriendlyErrorSchema.model_validate(response.json()).code
+            == ErrorCode.INVALID_INPUT
+        )
+    else:
+        assert response.status_code == 200, "Failed to list todo items"
+        assert [todo["id"] for todo in response.json()] == all_ids[2:]
+
+
+def test_list_todos_with_filters(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    update_todo_item_done_status: Callable[[UserType, int, bool], TodoItem],
+    attach_tag_to_todo: Callable[[UserType, int, int, str], Response],
+    test_client: TestClient,
+    auth_header_factory: Callable[[UserType], dict[str, str]],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    todo_ids = [create_todo_item(user, category.id).id for _ in range(4)]
+
+    update_todo_item_done_status(user, todo_ids[0], True)
+    response = attach_tag_to_todo(user, project.id, todo_ids[1], "filter tag")
+    assert response.status_code == 200, "Failed to attach the tag"
+    tag_id = response.json()["id"]
+
+    for todo_id, due_date in [
+        (todo_ids[2], "2024-01-10T00:00:00Z"),
+        (todo_ids[3], "2024-02-10T00:00:00Z"),
+    ]:
+        response = test_client.patch(
+            f"/todo-items/{todo_id}",
+            headers=auth_header_factory(user),
+            json={"item": {"due_date": due_date}},
+        )
+        assert response.status_code == 200, "Failed to set the due date"
+
+    def list_todo_ids(**filters):
+        response = test_client.get(
+            "/todo-items",
+            params={"project_id": project.id, "category_id": category.id, **filters},
+            headers=auth_header_factory(user),
+        )
+        assert response.status_code == 200, "Failed to list todo items"
+        return {todo["id"] for todo in response.json()}
+
+    assert list_todo_ids(done_by_user_id=user["id"]) == {todo_ids[0]}
+    assert list_todo_ids(tag_id=tag_id) == {todo_ids[1]}
+    assert list_todo_ids(
+        due_date_from="2024-01-01T00:00:00Z", due_date_to="2024-01-31T00:00:00Z"
+    ) == {todo_ids[2]}
+    assert list_todo_ids(due_date_from="2024-01-20T00:00:00Z") == {todo_ids[3]}
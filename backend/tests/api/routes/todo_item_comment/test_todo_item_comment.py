@@ -5,6 +5,7 @@ from httpx import Response
 from db.models.user_project_permission import Permission
 from db.schemas.project import Project
 from db.schemas.todo_category import TodoCategory
+from db.schemas.todo_item import TodoItem
 from db.schemas.todo_item_comment import TodoComment
 from tests.api.conftest import UserType
 
@@ -143,3 +144,29 @@ def test_delete_comment_by_owner(
     # Owner deletes the comment
     response = delete_comment_request(test_users[0], todo_item.id, todo_comment.id)
     assert response.status_code == 200, "Owner should be able to delete the comment"
+
+
+def test_comments_count(
+    create_project: Callable[[UserType], Project],
+    create_todo_category: Callable[[UserType, int], TodoCategory],
+    create_todo_item: Callable[[UserType, int], TodoItem],
+    create_comment: Callable[[UserType, int, str], TodoComment],
+    delete_comment_request: Callable[[UserType, int, int], Response],
+    list_todo_items: Callable[[UserType, int, int], list[TodoItem]],
+    test_users: list[UserType],
+):
+    user = test_users[0]
+
+    project = create_project(user)
+    category = create_todo_category(user, project.id)
+    todo_item = create_todo_item(user, category.id)
+    assert todo_item.comments_count == 0, "a new todo item should have no comments"
+
+    comments = [create_comment(user, todo_item.id, "some message") for _ in range(3)]
+    response = delete_comment_request(user, todo_item.id, comments[0].id)
+    assert response.status_code == 200, "Owner should be able to delete the comment"
+
+    [todo_item] = list_todo_items(user, project.id, category.id)
+    assert (
+        todo_item.comments_count == 2
+    ), "comments count should follow the created and deleted comments"
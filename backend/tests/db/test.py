@@ -2,10 +2,21 @@ from config import settings
 from db.db import get_db_params, init_database
 from db.models.base import Base
 
-params = get_db_params(settings.SQLALCHEMY_DATABASE_URL, False)
+params = get_db_params(
+    settings.SQLALCHEMY_DATABASE_URL,
+    False,
+    (
+        settings.SQLALCHEMY_ASYNC_DATABASE_URL or settings.SQLALCHEMY_DATABASE_URL
+        if settings.SQLALCHEMY_ASYNC
+        else None
+    ),
+)
 
 engine = params["engine"]
 SessionLocalTest = params["session"]
+# the routes use these when the tests run with SQLALCHEMY_ASYNC
+async_engine = params["async_engine"]
+AsyncSessionLocalTest = params["async_session"]
 
 
 def init_db():
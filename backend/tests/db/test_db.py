@@ -0,0 +1,33 @@
+from sqlalchemy import text
+
+from db.db import get_db_params
+from tests.db.test import engine
+
+
+def test_sqlite_connections_are_tuned():
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # 1 is NORMAL
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+
+
+def test_connect_listeners_dont_stack_across_engines(tmp_path):
+    def create_engine(name: str):
+        return get_db_params(f"sqlite:///{tmp_path / name}", False)["engine"]
+
+    first_engine = create_engine("first.db")
+    listeners_count = len(first_engine.pool.dispatch.connect)
+
+    other_engines = [create_engine(f"{index}.db") for index in range(3)]
+
+    assert (
+        len(first_engine.pool.dispatch.connect) == listeners_count
+    ), "creating other engines shouldn't add listeners to this engine"
+
+    for db_engine in [first_engine, *other_engines]:
+        with db_engine.connect() as connection:
+            assert connection.execute(text("PRAGMA foreign_keys")).scalar() == 1
+            assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+
+        db_engine.dispose()